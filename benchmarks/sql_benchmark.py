@@ -0,0 +1,166 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+SQL parser benchmark
+
+Parses every statement of the DiVA fixtures, plus generated complex queries (joins, nested subqueries, unions, long
+IN lists and CASE expressions), with the tx2g SQL grammar and reports the statements parsed per second and the
+latency percentiles. With --profile, it also reports the calls, memo hits and time of every grammar rule.
+
+Usage:
+    python -m benchmarks.sql_benchmark
+    python -m benchmarks.sql_benchmark --generated 500 --profile
+"""
+
+import json
+import random
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import List
+
+import click
+import numpy as np
+
+from dgi.tx2graph.utils import RWSetCache, sqlexp
+from dgi.tx2graph.utils.peg import profiling
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+FIXTURES = ("tests/fixtures/daytrader_transaction.json", "tests/fixtures/trading_app_transactions.json")
+PERCENTILES = (50, 90, 99)
+
+
+def fixture_statements(files=FIXTURES) -> List[str]:
+    """Every statement of the DiVA captures, normalized like tx2g does before parsing them"""
+    statements = []
+    for file_name in files:
+        with open(file_name, "r", encoding="utf-8") as file_obj:
+            for entry in json.load(file_obj):
+                for txn in entry["transactions"]:
+                    statements += [
+                        RWSetCache.normalize(operand["sql"])
+                        for operand in txn["transaction"]
+                        if operand["sql"] not in ("BEGIN", "COMMIT", "ROLLBACK")
+                    ]
+    return statements
+
+
+class ComplexQueries:
+    """Made-up queries of the shapes that make the grammar work hardest
+
+    Args:
+        seed (int): Seed for the random number generator, the same seed always gives the same queries
+    """
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    def _table(self) -> str:
+        return f"table{self.rng.randrange(50)}"
+
+    def _condition(self, alias: str, depth: int) -> str:
+        kind = self.rng.randrange(4)
+        if kind == 0 and depth > 0:
+            return f"{alias}.c{self.rng.randrange(9)} in ({self.select(depth - 1)})"
+        if kind == 1:
+            values = ", ".join(str(self.rng.randrange(10 ** 6)) for _ in range(self.rng.randint(5, 100)))
+            return f"{alias}.c{self.rng.randrange(9)} in ({values})"
+        if kind == 2:
+            return f"({alias}.c1 = ? or {alias}.c2 like '%x%') and not ({alias}.c3 is null)"
+        return f"{alias}.c{self.rng.randrange(9)} = ?"
+
+    def select(self, depth: int = 2) -> str:
+        """A SELECT with joins, and, down to `depth` levels, subqueries"""
+        alias = f"t{depth}0"
+        num_tables = self.rng.randint(1, 4)
+        tables = [f"{self._table()} t{depth}{i}" for i in range(num_tables)]
+        joins = tables[0] + "".join(
+            f" left outer join {table} on {alias}.c0 = t{depth}{i + 1}.c0" for i, table in enumerate(tables[1:])
+        )
+        columns = ", ".join(
+            [f"{alias}.c{i}" for i in range(self.rng.randint(1, 8))]
+            + [f"case when {alias}.c1 = 1 then 'a' when {alias}.c1 = 2 then 'b' else {alias}.c2 end as k"]
+        )
+        conditions = " and ".join(self._condition(alias, depth) for _ in range(self.rng.randint(1, 4)))
+        return f"select {columns} from {joins} where {conditions}"
+
+    def query(self) -> str:
+        """A complex statement"""
+        kind = self.rng.randrange(4)
+        if kind == 0:
+            return f"{self.select()} union all {self.select()} order by 1"
+        if kind == 1:
+            return f"with w as ({self.select(1)}) select * from w, {self._table()} x where w.c0 = x.c0"
+        if kind == 2:
+            return f"update {self._table()} set c1 = ?, c2 = c2 + 1 where c0 in ({self.select(1)})"
+        return self.select(self.rng.randint(1, 3))
+
+
+def print_profile(stats: dict, limit: int) -> None:
+    """Print the rules that took the most time of their own"""
+    click.echo(f"\n{'rule':<24} {'calls':>10} {'memo hits':>10} {'seconds':>10} {'own seconds':>12}")
+    for rule_name, (calls, hits, seconds, own_seconds) in sorted(stats.items(), key=lambda item: -item[1][3])[:limit]:
+        click.echo(f"{rule_name:<24} {calls:>10,} {hits:>10,} {seconds:>10.3f} {own_seconds:>12.3f}")
+
+
+@click.command()
+@click.option("--generated", "-g", type=click.IntRange(min=0), default=200, show_default=True,
+              help="Number of generated complex queries added to the fixture statements.")
+@click.option("--distinct", is_flag=True, help="Parse every distinct statement once, like tx2g does with its cache.")
+@click.option("--profile", is_flag=True, help="Also count the calls, memo hits and time of every grammar rule.")
+@click.option("--top", type=click.IntRange(min=1), default=25, show_default=True, help="Number of rules profiled.")
+@click.option("--seed", type=int, default=0, show_default=True, help="Random seed.")
+def main(generated, distinct, profile, top, seed):  # pylint: disable=too-many-arguments,too-many-locals
+    """Benchmark the tx2g SQL parser"""
+    if not all(Path(file_name).exists() for file_name in FIXTURES):
+        raise click.UsageError("Run the benchmark from the root of the repository, next to tests/fixtures.")
+
+    statements = fixture_statements()
+    queries = ComplexQueries(seed)
+    statements += [queries.query() for _ in range(generated)]
+    if distinct:
+        statements = list(dict.fromkeys(statements))
+
+    latencies, failures = [], 0
+    with profiling() if profile else nullcontext() as stats:
+        for sql in statements:
+            start = time.perf_counter()
+            failures += not sqlexp(sql)
+            latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    click.echo(f"statements: {len(statements):,} ({generated:,} generated), not parsed: {failures:,}")
+    click.echo(f"statements/s: {len(statements) / latencies.sum() * 1000:,.0f}")
+    click.echo(
+        "latency (ms): "
+        + ", ".join(f"p{q} {np.percentile(latencies, q):.3f}" for q in PERCENTILES)
+        + f", max {latencies.max():.3f}"
+    )
+    if profile:
+        click.echo("(profiling slows the parser down, the rates above are not comparable to a run without --profile)")
+        print_profile(stats, top)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
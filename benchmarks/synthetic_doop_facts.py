@@ -0,0 +1,185 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Synthetic DOOP facts
+
+Writes the facts files c2g reads (heap, data, call and return dependencies plus method information) for a made-up
+application of any size. Like real DOOP output, a few methods, contexts and heap objects show up in most facts.
+
+Usage:
+    python -m benchmarks.synthetic_doop_facts --output /tmp/facts --rows 1000000
+"""
+
+from pathlib import Path
+from typing import List
+
+import click
+import numpy as np
+import pandas as pd
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+RETURN_TYPES = ["void", "int", "boolean", "java.lang.String", "java.util.List", "java.lang.Object"]
+PARAMETER_TYPES = ["", "int", "java.lang.String", "int,int", "java.util.List", "java.lang.String[]"]
+IMMUTABLE_CONTEXT = "<<immutable-context>>"
+
+
+class SyntheticFacts:
+    """A made-up application and the facts DOOP would derive for it
+
+    Args:
+        num_classes (int): Number of application classes
+        methods_per_class (int): Number of methods in every class
+        context_depth (int): Number of elements in every context
+        seed (int): Seed for the random number generator, the same seed always gives the same facts
+    """
+
+    def __init__(self, num_classes: int = 200, methods_per_class: int = 10, context_depth: int = 2, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.context_depth = context_depth
+        self.classes = [f"com.synthetic.pkg{i % 20}.Class{i}" for i in range(num_classes)]
+        self.methods = pd.DataFrame(
+            [
+                {
+                    "class": class_name,
+                    "name": f"method{j}",
+                    "return_type": RETURN_TYPES[(i + j) % len(RETURN_TYPES)],
+                    "params": PARAMETER_TYPES[(i * j) % len(PARAMETER_TYPES)],
+                }
+                for i, class_name in enumerate(self.classes)
+                for j in range(methods_per_class)
+            ]
+        )
+        self.methods["signature"] = (
+            "<" + self.methods["class"] + ": " + self.methods.return_type + " "
+            + self.methods.name + "(" + self.methods.params + ")>"
+        )
+        self.heap_objects = self._allocations(max(len(self.methods) // 2, 1))
+        self.contexts = self._contexts(max(len(self.methods), 1))
+
+    def _pick(self, size: int, num: int) -> np.ndarray:
+        """Pick `num` indices out of `size`, a few of them far more often than the rest"""
+        return (self.rng.zipf(1.5, num) - 1) % size
+
+    def _allocations(self, num: int) -> List[str]:
+        """Allocation sites, e.g., <com.acme.Main: void main()>/new com.acme.Obj/0"""
+        methods = self.methods.signature.to_numpy()[self._pick(len(self.methods), num)]
+        types = np.array(self.classes)[self.rng.integers(0, len(self.classes), num)]
+        return [f"{method}/new {obj}/{i % 4}" for i, (method, obj) in enumerate(zip(methods, types))]
+
+    def _contexts(self, num: int) -> List[str]:
+        """Contexts, i.e., lists of `context_depth` immutable contexts or allocation sites"""
+        pool = [IMMUTABLE_CONTEXT] + self.heap_objects
+        elements = np.array(pool, dtype=object)[self._pick(len(pool), num * self.context_depth)]
+        return ["[" + ", ".join(elements[i:i + self.context_depth]) + "]" for i in range(0, len(elements), self.context_depth)]
+
+    def _column(self, values: List[str], num: int) -> np.ndarray:
+        return np.array(values, dtype=object)[self._pick(len(values), num)]
+
+    def _method_column(self, num: int) -> np.ndarray:
+        return self._column(self.methods.signature.tolist(), num)
+
+    def method_information(self) -> pd.DataFrame:
+        """MethodInformation.csv: signature, name, parameters, class, return type, descriptor, and a flag"""
+        return pd.DataFrame(
+            {
+                "signature": self.methods.signature,
+                "name": self.methods.name,
+                "params": self.methods.params,
+                "class": self.methods["class"],
+                "return_type": self.methods.return_type,
+                "descriptor": "()V",
+                "flag": 1,
+            }
+        )
+
+    def heap_flows(self, num: int) -> pd.DataFrame:
+        """HeapCarriedDependencyFlows.csv: context, heap object, source and destination methods"""
+        return pd.DataFrame(
+            {
+                "context": self._column(self.contexts, num),
+                "heap_obj": self._column(self.heap_objects, num),
+                "prev": self._method_column(num),
+                "next": self._method_column(num),
+            }
+        )
+
+    def data_flows(self, num: int) -> pd.DataFrame:
+        """DependentInstructionsBetweenMethods.csv: context, source and destination methods"""
+        return pd.DataFrame(
+            {
+                "context": self._column(self.contexts, num),
+                "prev": self._method_column(num),
+                "next": self._method_column(num),
+            }
+        )
+
+    def call_flows(self, num: int) -> pd.DataFrame:
+        """CallDependency.csv and ReturnDependency.csv: context and method of both ends of a call or return"""
+        return pd.DataFrame(
+            {
+                "prev_context": self._column(self.contexts, num),
+                "prev": self._method_column(num),
+                "next_context": self._column(self.contexts, num),
+                "next": self._method_column(num),
+            }
+        )
+
+    def write(self, output: Path, num_rows: int) -> None:
+        """Write all facts files
+
+        Args:
+            output (Path): The facts directory, created if needed
+            num_rows (int): Number of facts in each of the dependency files
+        """
+        output = Path(output)
+        output.mkdir(parents=True, exist_ok=True)
+        files = {
+            "MethodInformation.csv": self.method_information(),
+            "HeapCarriedDependencyFlows.csv": self.heap_flows(num_rows),
+            "DependentInstructionsBetweenMethods.csv": self.data_flows(num_rows),
+            "CallDependency.csv": self.call_flows(num_rows),
+            "ReturnDependency.csv": self.call_flows(num_rows),
+        }
+        for file_name, facts in files.items():
+            facts.to_csv(output.joinpath(file_name), sep="\t", header=False, index=False)
+
+
+@click.command()
+@click.option("--output", "-o", type=click.Path(file_okay=False), required=True, help="Facts directory to write.")
+@click.option("--rows", "-r", type=click.IntRange(min=1), default=10000, show_default=True,
+              help="Number of facts in each dependency file.")
+@click.option("--classes", type=click.IntRange(min=1), default=200, show_default=True, help="Number of classes.")
+@click.option("--methods-per-class", type=click.IntRange(min=1), default=10, show_default=True,
+              help="Number of methods in every class.")
+@click.option("--context-depth", type=click.IntRange(min=1), default=2, show_default=True,
+              help="Number of elements in every context.")
+@click.option("--seed", type=int, default=0, show_default=True, help="Random seed.")
+def main(output, rows, classes, methods_per_class, context_depth, seed):  # pylint: disable=too-many-arguments
+    """Write synthetic DOOP facts"""
+    SyntheticFacts(classes, methods_per_class, context_depth, seed).write(Path(output), rows)
+    click.echo(f"Wrote {rows} facts per dependency file to {output}")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
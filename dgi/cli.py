@@ -23,19 +23,25 @@ import json
 import os
 import sys
 from pathlib import Path
+from typing import Dict
 from py2neo import Graph
 
 import click
 from neomodel import config
-from simple_ddl_parser import parse_from_file
 
 # Import our packages
-from dgi.code2graph import ClassGraphBuilder, MethodGraphBuilder
+from dgi.code2graph import ClassGraphBuilder, FullGraphBuilder, MethodGraphBuilder
 from dgi.code2graph.json_to_neo4j_graph import to_neo4j
 from dgi.partitioning.partition import recommend_partitions
 
 from dgi.schema2graph import schema_loader
-from dgi.tx2graph import ClassTransactionLoader, MethodTransactionLoader
+from dgi.schema2graph.ddl_parser import parse_ddl_file
+from dgi.schema2graph.schema_cache import SchemaCache, default_cache_dir
+from dgi.tx2graph import ClassTransactionLoader, FullTransactionLoader, MethodTransactionLoader
+from dgi.tx2graph.abstract_transaction_loader import DEFAULT_PARSE_SECONDS
+from dgi.tx2graph.utils import ParseBudget, SlowQueryLog
+from dgi.tx2graph.utils.rwset_cache import DEFAULT_RWSET_CACHE_SIZE, RWSetCache
+from dgi.utils.batch_writer import DEFAULT_BATCH_SIZE
 from dgi.utils.parse_config import Config
 
 ######################################################################
@@ -103,8 +109,41 @@ def cli(ctx, validate, quiet, clear, neo4j_bolt):
 @click.option(
     "--output", "-o", required=False, help="The JSON file to write the schema to"
 )
+@click.option(
+    "--batch-size",
+    "-b",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BATCH_SIZE,
+    help="Number of tables or columns written to the graph in one statement",
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes parsing the DDL statements",
+    show_default=True,
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(resolve_path=True, file_okay=False),
+    default=None,
+    help="Keep parsed schemas in this directory and reuse them while the DDL doesn't change "
+    "[default: dgi/s2g in the user cache directory]",
+)
+@click.option("--no-cache", is_flag=True, default=False, help="Parse the DDL even if it was parsed before.")
+@click.option(
+    "--diff",
+    is_flag=True,
+    default=False,
+    help="Only write the tables, columns and foreign keys that differ from the graph, and remove those that are no "
+    "longer in the DDL.",
+)
 @click.pass_context
-def s2g(ctx, input, output):  # pylint: disable=redefined-builtin
+def s2g(  # pylint: disable=redefined-builtin,too-many-arguments
+    ctx, input, output, batch_size, workers, cache_dir, no_cache, diff
+):
     """Schema2Graph parses SQL schema (*.DDL file) into the graph"""
 
     # Read the DDL file
@@ -112,7 +151,8 @@ def s2g(ctx, input, output):  # pylint: disable=redefined-builtin
     click.echo(f"Reading: {input.absolute()}")
     result = None
     try:
-        result = parse_from_file(input, group_by_type=True)
+        cache = None if no_cache else SchemaCache(cache_dir or default_cache_dir())
+        result = parse_ddl_file(input, workers, cache)
     except FileNotFoundError as error:
         raise click.ClickException(error)
 
@@ -132,10 +172,43 @@ def s2g(ctx, input, output):  # pylint: disable=redefined-builtin
         schema_loader.remove_all_nodes()
 
     click.echo("Building Graph..")
-    schema_loader.load_graph(result)
+    if diff:
+        schema_loader.diff_graph(result, batch_size)
+    else:
+        schema_loader.load_graph(result, batch_size)
     click.echo("Graph build complete")
 
 
+def _load_transactions(loader_type: type, input_file: str, clear: bool, force_clear: bool, options: Dict) -> None:
+    """Load a DiVA capture with the SQL cache, parse budget and slow query report tx2g was given
+
+    Args:
+        loader_type (type): The transaction loader, e.g., ClassTransactionLoader
+        input_file (str): The DiVA transaction JSON file
+        clear (bool): Clear the SQL nodes in the graph before loading
+        force_clear (bool): Clear all nodes in the graph before loading
+        options (Dict): The other tx2g options, by name
+    """
+    rwset_cache = RWSetCache(options["sql_cache_size"])
+    if options["sql_cache_file"]:
+        rwset_cache.load(options["sql_cache_file"])
+    slow_queries = SlowQueryLog()
+    loader = loader_type(
+        options["batch_size"],
+        rwset_cache,
+        options["workers"],
+        ParseBudget(options["parse_seconds"], options["parse_steps"]),
+        slow_queries,
+    )
+
+    loader.load_transactions(input_file, clear=clear, force_clear=force_clear)
+
+    if options["sql_cache_file"]:
+        rwset_cache.save(options["sql_cache_file"])
+    if options["slow_query_report"]:
+        slow_queries.save(options["slow_query_report"])
+
+
 ######################################################################
 #  tx2graph - Loads output from DiVA into graph
 ######################################################################
@@ -165,49 +238,77 @@ def s2g(ctx, input, output):  # pylint: disable=redefined-builtin
     show_default=True,
     hidden=True,
 )
+@click.option(
+    "--batch-size",
+    "-b",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BATCH_SIZE,
+    help="Number of nodes or edges written to the graph in one statement",
+    show_default=True,
+)
+@click.option(
+    "--sql-cache-size",
+    type=click.IntRange(min=0),
+    default=DEFAULT_RWSET_CACHE_SIZE,
+    help="Number of distinct SQL statements whose read and write sets are remembered (0 for no limit)",
+    show_default=True,
+)
+@click.option(
+    "--sql-cache-file",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Keep the read and write sets of SQL statements in this file between runs",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes analyzing the transactions",
+    show_default=True,
+)
+@click.option(
+    "--parse-seconds",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_PARSE_SECONDS,
+    help="Time the SQL grammar is given for one statement before its tables are found by a simple scan instead",
+    show_default=True,
+)
+@click.option(
+    "--parse-steps",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of grammar rule evaluations one statement is given before its tables are found by a simple scan",
+)
+@click.option(
+    "--slow-query-report",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the slowest SQL statements, and those that went over the parse budget, to this JSON file",
+)
 @click.pass_context
-def tx2g(ctx, input, abstraction, force_clear):  # pylint: disable=redefined-builtin
+def tx2g(ctx, input, abstraction, force_clear, **options):  # pylint: disable=redefined-builtin
     """Transaction2Graph add edges denoting CRUD operations to the graph."""
 
     if ctx.obj["verbose"]:
         click.echo("Verbose mode: ON")
 
-    class_transaction_loader = ClassTransactionLoader()
-    method_transaction_loader = MethodTransactionLoader()
-
-    if abstraction.lower() == "full":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-
-            sys.exit()
-
-        class_transaction_loader.load_transactions(input, clear=ctx.obj["clear"])
-        # We don't want to clear the table node twice.
-        # Otherwise, we'll lose the table nodes created above
-        method_transaction_loader.load_transactions(input, clear=False)
-
-    elif abstraction.lower() == "class":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-            sys.exit()
-        class_transaction_loader.load_transactions(
-            input, clear=ctx.obj["clear"], force_clear=force_clear
-        )
-
-    elif abstraction.lower() == "method":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-            sys.exit()
-
-        method_transaction_loader.load_transactions(
-            input, clear=ctx.obj["clear"], force_clear=force_clear
-        )
-
-    else:
+    loader_types = {
+        "full": FullTransactionLoader,
+        "class": ClassTransactionLoader,
+        "method": MethodTransactionLoader,
+    }
+    if abstraction.lower() not in loader_types:
         raise click.BadArgumentUsage(
             "Not a valid abstraction level. Valid options are 'class', 'method', 'full'."
         )
 
+    if ctx.obj["validate"]:
+        click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
+        sys.exit()
+
+    _load_transactions(loader_types[abstraction.lower()], input, ctx.obj["clear"], force_clear, options)
+
     click.echo("Transactions populated")
 
 
@@ -239,22 +340,54 @@ def tx2g(ctx, input, abstraction, force_clear):  # pylint: disable=redefined-bui
     help="The level of abstraction to use when building the graph",
     show_default=True,
 )
+@click.option(
+    "--batch-size",
+    "-b",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BATCH_SIZE,
+    help="Number of nodes or edges written to the graph in one statement",
+    show_default=True,
+)
+@click.option(
+    "--node-cache-size",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Maximum number of class/method nodes remembered while building the graph (0 for no limit)",
+    show_default=True,
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Number of DOOP facts read and processed at a time (0 to read whole files)",
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes used to parse the DOOP facts",
+    show_default=True,
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(resolve_path=True, file_okay=False),
+    required=False,
+    help="Keep parsed DOOP facts in this directory and reuse them while the facts don't change.",
+)
 @click.pass_context
-def c2g(ctx, input, doop, doop_input, abstraction):  # pylint: disable=redefined-builtin
+def c2g(  # pylint: disable=redefined-builtin,too-many-locals,too-many-arguments
+    ctx, input, doop, doop_input, abstraction, batch_size, node_cache_size, chunk_size, workers, cache_dir
+):
     """Code2Graph add various program dependencies (i.e., call return, heap, and data) into the graph"""
 
-    if abstraction.lower() == "full":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-            sys.exit()
-    if abstraction.lower() == "class":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-            sys.exit()
-    if abstraction.lower() == "method":
-        if ctx.obj["validate"]:
-            click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
-            sys.exit()
+    if cache_dir and chunk_size:
+        raise click.BadOptionUsage("cache_dir", "--cache-dir can't be used with --chunk-size, streamed facts are not cached")
+
+    if ctx.obj["validate"]:
+        click.echo(f"Validate mode: abstraction level is {abstraction.lower()}")
+        sys.exit()
 
     if not doop:
         with open(input, "r", encoding="utf-8") as partitions_file:
@@ -276,6 +409,11 @@ def c2g(ctx, input, doop, doop_input, abstraction):  # pylint: disable=redefined
 
         # Add the input dir to configuration.
         usr_cfg.set_config(key="GRAPH_FACTS_DIR", val=doop_input)
+        usr_cfg.set_config(key="BATCH_SIZE", val=batch_size)
+        usr_cfg.set_config(key="NODE_CACHE_SIZE", val=node_cache_size)
+        usr_cfg.set_config(key="CHUNK_SIZE", val=chunk_size)
+        usr_cfg.set_config(key="WORKERS", val=workers)
+        usr_cfg.set_config(key="FACTS_CACHE_DIR", val=cache_dir)
 
         # -----------------
         #  Build the graph
@@ -283,21 +421,17 @@ def c2g(ctx, input, doop, doop_input, abstraction):  # pylint: disable=redefined
 
         click.echo("Building Graph.")
 
-        class_g_builder = ClassGraphBuilder(usr_cfg)
-        method_g_builder = MethodGraphBuilder(usr_cfg)
-
         if abstraction.lower() == "full":
             click.echo("Full level abstraction adds both Class and Method nodes.")
-            class_g_builder.build_ddg(clear=ctx.obj["clear"])
-            method_g_builder.build_ddg(clear=ctx.obj["clear"])
+            FullGraphBuilder(usr_cfg).build_ddg(clear=ctx.obj["clear"])
 
         elif abstraction.lower() == "class":
             click.echo("Class level abstraction.")
-            class_g_builder.build_ddg(clear=ctx.obj["clear"])
+            ClassGraphBuilder(usr_cfg).build_ddg(clear=ctx.obj["clear"])
 
         elif abstraction.lower() == "method":
             click.echo("Method level abstraction.")
-            method_g_builder.build_ddg(clear=ctx.obj["clear"])
+            MethodGraphBuilder(usr_cfg).build_ddg(clear=ctx.obj["clear"])
 
         else:
             raise click.BadArgumentUsage(
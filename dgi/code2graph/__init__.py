@@ -2,6 +2,7 @@
 Code 2 Graph package
 """
 from .class_graph_builder import ClassGraphBuilder
+from .full_graph_builder import FullGraphBuilder
 from .method_graph_builder import MethodGraphBuilder
 
-__all__ = ["ClassGraphBuilder", "MethodGraphBuilder"]
+__all__ = ["ClassGraphBuilder", "FullGraphBuilder", "MethodGraphBuilder"]
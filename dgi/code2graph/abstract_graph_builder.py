@@ -20,11 +20,14 @@ Abstract Graph Builder
 This is the abstract base class for all of the graph builders
 """
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import pandas as pd
+from neomodel import StructuredNode, StructuredRel, install_labels
 
-from dgi.code2graph.process_facts import ConsumeFacts
+from dgi.code2graph.node_registry import NodeRegistry
+from dgi.code2graph.process_facts import ConsumeFacts, aggregate_flows
+from dgi.utils.batch_writer import DEFAULT_BATCH_SIZE, batched, write_in_batches
 from dgi.utils.logging import Log
 
 # Author information
@@ -39,9 +42,24 @@ __status__ = "Research Prototype"
 # pylint: disable=too-few-public-methods
 class AbstractGraphBuilder(ABC):
     """Abstract graph builder is a base class that is implemented by method and class graph builders.
+
+    Nodes and edges are not written one fact at a time. The populate passes collect them as rows and send them to
+    Neo4j in batches of `BATCH_SIZE` rows, each batch as a single UNWIND/MERGE statement. Nodes that are already
+    in the graph are remembered in a `NodeRegistry` of at most `NODE_CACHE_SIZE` nodes (no limit when unset).
+    When `CHUNK_SIZE` is set, the facts are read, parsed and written `CHUNK_SIZE` facts at a time instead of all
+    at once, so memory doesn't grow with the size of the facts.
     """
+
+    # The node model and the property that identifies a node. Set by the implementing builders.
+    node_model: StructuredNode = None
+    node_key: str = None
+
     def __init__(self, opt):
         self.opt = opt
+        self.batch_size = getattr(opt, "BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        self.nodes = NodeRegistry.of(self.node_model, self.node_key, getattr(opt, "NODE_CACHE_SIZE", None))
+        self._pending_nodes = {}
+        self._skipped_edges = 0
 
     @staticmethod
     @abstractmethod
@@ -49,14 +67,127 @@ class AbstractGraphBuilder(ABC):
         """Delete all nodes"""
 
     @abstractmethod
-    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict):
-        """_summary_
+    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict) -> Tuple[str, str]:
+        """Register the source and destination nodes of a fact and return their keys
 
         Args:
             prev_df_entry (Dict): A dictionary of method information for source method
             next_df_entry (Dict): A dictionary of method information for destination method
         """
 
+    def _register_node(self, key: str, properties: Dict) -> str:
+        """Queue a node to be written with the next batch of nodes
+
+        Args:
+            key (str): The value of `node_key` for this node
+            properties (Dict): The node properties used if the node has to be created
+
+        Returns:
+            str: The node key
+        """
+        if key not in self._pending_nodes and self.nodes.get(key) is None:
+            self._pending_nodes[key] = self.node_model.deflate(properties, skip_empty=True)
+        return key
+
+    def _write_nodes(self) -> None:
+        """Create all queued nodes that are not in the graph yet and remember their ids"""
+        if not self._pending_nodes:
+            return
+
+        query = (
+            "UNWIND $rows AS row "
+            f"MERGE (n:{self.node_model.__label__} {{{self.node_key}: row.key}}) "
+            "ON CREATE SET n += row.props "
+            "RETURN row.key, id(n)"
+        )
+        rows = [{"key": key, "props": props} for key, props in self._pending_nodes.items()]
+        write_in_batches(
+            query,
+            rows,
+            self.batch_size,
+            on_results=self.nodes.update,
+        )
+        self._pending_nodes = {}
+
+    def _with_node_ids(self, rows: List[Dict]) -> Iterator[Dict]:
+        """Replace the node keys of edge rows with node ids, one batch at a time
+
+        The ids are looked up per batch so that a bounded registry never has to hold more than one batch of nodes.
+        Rows with a node that is not in the graph are skipped and counted in `_skipped_edges`.
+        """
+        for batch in batched(rows, self.batch_size):
+            ids = self.nodes.resolve({row["prev"] for row in batch} | {row["next"] for row in batch})
+            for row in batch:
+                if row["prev"] in ids and row["next"] in ids:
+                    yield {**row, "prev": ids[row["prev"]], "next": ids[row["next"]]}
+                else:
+                    self._skipped_edges += 1
+
+    @staticmethod
+    def _edge_row(rel_model: StructuredRel, prev_key: str, next_key: str, properties: Dict, weight: int = 1) -> Dict:
+        """Build one row for `_write_edges`
+
+        Args:
+            rel_model (StructuredRel): The relationship model, used to serialize the properties like neomodel does
+            prev_key (str): Key of the source node
+            next_key (str): Key of the destination node
+            properties (Dict): Properties that identify the edge
+            weight (int): How many times this edge was observed
+
+        Returns:
+            Dict: The row
+        """
+        props = rel_model.deflate({**properties, "weight": weight}, skip_empty=True)
+        return {"prev": prev_key, "next": next_key, "weight": props.pop("weight"), "props": props}
+
+    def _write_edges(self, rel_type: str, rows: List[Dict]) -> None:
+        """Merge edges from source to destination nodes in batches
+
+        An edge is identified by its end points and properties. Rows for the same edge are summed first so that
+        every edge is written once. New edges start with the weight of the row, edges that already exist have
+        the weight of the row added to theirs.
+
+        Empty properties are left out of the rows (like neomodel does), so rows may have different property names.
+        Rows are written with one MERGE statement per set of property names, so that every property a row has is
+        part of the identity of its edge and no MERGE is given a null property.
+
+        Args:
+            rel_type (str): The relationship type, e.g., HEAP_DEPENDENCY
+            rows (List[Dict]): Rows built by `_edge_row`
+        """
+        edges = {}
+        for row in rows:
+            key = (
+                row["prev"],
+                row["next"],
+                *((prop, tuple(val) if isinstance(val, list) else val) for prop, val in row["props"].items()),
+            )
+            if key in edges:
+                edges[key]["weight"] += row["weight"]
+            else:
+                edges[key] = dict(row)
+
+        self._skipped_edges = 0
+        groups = {}
+        for row in edges.values():
+            groups.setdefault(tuple(row["props"]), []).append(row)
+
+        for props, group in groups.items():
+            merge_props = " {" + ", ".join(f"{prop}: row.props.{prop}" for prop in props) + "}" if props else ""
+            query = (
+                "UNWIND $rows AS row "
+                "MATCH (p) WHERE id(p) = row.prev "
+                "MATCH (n) WHERE id(n) = row.next "
+                f"MERGE (p)-[r:{rel_type}{merge_props}]->(n) "
+                "ON CREATE SET r.weight = row.weight "
+                "ON MATCH SET r.weight = r.weight + row.weight"
+            )
+            write_in_batches(query, self._with_node_ids(group), self.batch_size, total=len(group))
+
+        # Every node was written before its edges, so this only happens if nodes are deleted while building
+        if self._skipped_edges:
+            Log.warn(f"Skipped {self._skipped_edges} {rel_type} edges whose nodes are not in the graph")
+
     @abstractmethod
     def _populate_heap_edges(self, heap_flows: pd.DataFrame) -> None:
         """Populate heap carried dependencies
@@ -78,23 +209,82 @@ class AbstractGraphBuilder(ABC):
             call_ret_flows (pd.DataFrame): Data flows as a pandas dataframe
         """
 
-    def build_ddg(self, clear: bool = True) -> None:
-        """Build the data dependency graph"""
-        consume = ConsumeFacts(conf=self.opt)
+    @staticmethod
+    def read_flows(opt) -> Tuple[Iterable[pd.DataFrame], Iterable[pd.DataFrame], Iterable[pd.DataFrame]]:
+        """Parse the facts into aggregated heap, data and call/return flows
+
+        Args:
+            opt (Config): The configuration, with `GRAPH_FACTS_DIR` and optionally `CHUNK_SIZE`
+
+        Returns:
+            Tuple[Iterable[pd.DataFrame], Iterable[pd.DataFrame], Iterable[pd.DataFrame]]: The heap, data and
+            call/return flows, each as one or more chunks of facts from `aggregate_flows`. Edges that show up in
+            more than one chunk add their weights up in the graph.
+        """
+        consume = ConsumeFacts(conf=opt)
+
+        chunk_size = getattr(opt, "CHUNK_SIZE", None)
+        if chunk_size:
+            return tuple(map(aggregate_flows, chunks) for chunks in consume.stream_facts_data(chunk_size))
+        return tuple([flows] for flows in consume.process_and_get_facts_data(aggregate=True))
 
-        heap_flows, data_flows, call_return_flows = consume.process_and_get_facts_data()
+    def prepare_graph(self, clear: bool = True) -> None:
+        """Get the graph ready for new edges
 
-        # Remove all stray nodes in the graph
+        Args:
+            clear (bool): Delete the nodes that are already in the graph
+        """
+        # Remove all stray nodes in the graph, or learn which ones are there already
         if clear:
             self._clear_all_nodes()
+            self.nodes.clear()
+        else:
+            self.nodes.warm()
+
+        # Index the node keys so that the batched MERGE statements don't scan all nodes
+        install_labels(self.node_model)
+
+    def populate(
+        self,
+        heap_flows: pd.DataFrame = None,
+        data_flows: pd.DataFrame = None,
+        call_return_flows: pd.DataFrame = None,
+    ) -> None:
+        """Add the edges (and nodes) of aggregated flows to the graph
+
+        Args:
+            heap_flows (pd.DataFrame): Heap flows from `aggregate_flows`
+            data_flows (pd.DataFrame): Data flows from `aggregate_flows`
+            call_return_flows (pd.DataFrame): Call/return flows from `aggregate_flows`
+        """
+        if heap_flows is not None:
+            self._populate_heap_edges(heap_flows)
+        if data_flows is not None:
+            self._populate_dataflow_edges(data_flows)
+        if call_return_flows is not None:
+            self._populate_callreturn_edges(call_return_flows)
+
+    def log_summary(self) -> None:
+        """Log how well the node registry did"""
+        Log.info(f"Node cache: {self.nodes.hits} hits, {self.nodes.misses} misses")
+
+    def build_ddg(self, clear: bool = True) -> None:
+        """Build the data dependency graph"""
+        heap_chunks, data_chunks, call_return_chunks = self.read_flows(self.opt)
+
+        self.prepare_graph(clear)
 
         # Process heap flows
-        self._populate_heap_edges(heap_flows)
+        for heap_flows in heap_chunks:
+            self.populate(heap_flows=heap_flows)
 
         # Process Data flows
-        self._populate_dataflow_edges(data_flows)
+        for data_flows in data_chunks:
+            self.populate(data_flows=data_flows)
 
         # Process call return flows
-        self._populate_callreturn_edges(call_return_flows)
+        for call_return_flows in call_return_chunks:
+            self.populate(call_return_flows=call_return_flows)
 
+        self.log_summary()
         Log.info("Populating entrypoints")
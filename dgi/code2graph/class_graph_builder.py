@@ -24,17 +24,18 @@ It is very similar to the method graph builder but with ClassNodes
 """
 
 import logging
-from typing import Dict
+from typing import Dict, Tuple
 
 import pandas as pd
 from neomodel import db
-from neomodel.exceptions import DoesNotExist
-
-
-from tqdm import tqdm
 
 # Import local packages
 from dgi.models import ClassNode
+from dgi.models.relationships import (
+    CallReturnRelationship,
+    DataRelationship,
+    HeapCarriedRelationship,
+)
 from dgi.utils.logging import Log
 from dgi.code2graph.abstract_graph_builder import AbstractGraphBuilder
 
@@ -51,6 +52,9 @@ __status__ = "Research Prototype"
 class ClassGraphBuilder(AbstractGraphBuilder):
     """Build a class level abstraction graph"""
 
+    node_model = ClassNode
+    node_key = "node_short_name"
+
     @staticmethod
     def _clear_all_nodes():
         """Delete all nodes"""
@@ -64,30 +68,22 @@ class ClassGraphBuilder(AbstractGraphBuilder):
         #     node.delete()
         # Log.warn(f"Deleted {count} ClassNodes")
 
-    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict):
+    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict) -> Tuple[str, str]:
         prev_class_name = prev_meth["class"]
         prev_class_short_name = prev_class_name.split(".")[-1]
-
-        try:
-            prev_graph_node = ClassNode.nodes.get(node_short_name=prev_class_short_name)
-        except DoesNotExist:
-            # Method information
-            prev_graph_node = ClassNode(
-                node_class=prev_class_name, node_short_name=prev_class_short_name
-            ).save()
+        self._register_node(
+            prev_class_short_name,
+            {"node_class": prev_class_name, "node_short_name": prev_class_short_name},
+        )
 
         next_class_name = next_meth["class"]
         next_class_short_name = next_class_name.split(".")[-1]
+        self._register_node(
+            next_class_short_name,
+            {"node_class": next_class_name, "node_short_name": next_class_short_name},
+        )
 
-        try:
-            next_graph_node = ClassNode.nodes.get(node_short_name=next_class_short_name)
-        except DoesNotExist:
-            # Method information
-            next_graph_node = ClassNode(
-                node_class=next_class_name, node_short_name=next_class_short_name
-            ).save()
-
-        return prev_graph_node, next_graph_node
+        return prev_class_short_name, next_class_short_name
 
     def _populate_heap_edges(self, heap_flows: pd.DataFrame) -> None:
         """Populate heap carried dependencies
@@ -95,45 +91,33 @@ class ClassGraphBuilder(AbstractGraphBuilder):
             heap_flows (pd.DataFrame): Heap flows as a pandas dataframe
         """
         Log.info("Populating heap carried dependencies edges")
-        rel_id = 0
-
-        for _, row in tqdm(heap_flows.iterrows(), total=heap_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
+        edges = []
 
+        for prev_meth, next_meth, context, heap_obj, weight in zip(
+            heap_flows.prev, heap_flows.next, heap_flows.context, heap_flows.heap_obj, heap_flows.weight
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
             if prev_graph_node != next_graph_node:
-                rel = prev_graph_node.heap_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and (
-                    rel.pmethod,
-                    rel.nmethod,
-                    rel.context,
-                    rel.heap_object,
-                ) == (
-                    prev_meth["name"],
-                    next_meth["name"],
-                    row.context,
-                    row.heap_obj,
-                ):
-                    rel.weight += 1
-                    rel.rel_id = rel_id
-                    rel.save()
-                else:
-                    relationship_property = {
-                        "weight": 1,
-                        "rel_id": rel_id,
-                        "pmethod": prev_meth["name"],
-                        "nmethod": next_meth["name"],
-                        "context": row.context,
-                        "heap_object": row.heap_obj,
-                    }
-                    prev_graph_node.heap_flows.connect(
-                        next_graph_node, relationship_property
+                edges.append(
+                    self._edge_row(
+                        HeapCarriedRelationship,
+                        prev_graph_node,
+                        next_graph_node,
+                        {
+                            "pmethod": prev_meth["name"],
+                            "nmethod": next_meth["name"],
+                            "context": context,
+                            "heap_object": heap_obj,
+                        },
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("HEAP_DEPENDENCY", edges)
 
     def _populate_dataflow_edges(self, data_flows: pd.DataFrame) -> None:
         """Populate data flow dependencies
@@ -141,38 +125,32 @@ class ClassGraphBuilder(AbstractGraphBuilder):
             data_flows (pd.DataFrame): Data flows as a pandas dataframe
         """
         Log.info("Populating dataflow edges")
-        rel_id = 0
-
-        for _, row in tqdm(data_flows.iterrows(), total=data_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
+        edges = []
 
+        for prev_meth, next_meth, context, weight in zip(
+            data_flows.prev, data_flows.next, data_flows.context, data_flows.weight
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
             if prev_graph_node != next_graph_node:
-                rel = prev_graph_node.data_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and (rel.pmethod, rel.nmethod, rel.context) == (
-                    prev_meth["name"],
-                    next_meth["name"],
-                    row.context,
-                ):
-                    rel.rel_id = rel_id
-                    rel.weight += 1
-                    rel.save()
-                else:
-                    next_graph_node.data_flows.connect(
+                edges.append(
+                    self._edge_row(
+                        DataRelationship,
                         prev_graph_node,
+                        next_graph_node,
                         {
-                            "weight": 1,
-                            "rel_id": rel_id,
                             "pmethod": prev_meth["name"],
                             "nmethod": next_meth["name"],
-                            "context": row.context,
+                            "context": context,
                         },
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("DATA_DEPENDENCY", edges)
 
     def _populate_callreturn_edges(self, call_ret_flows: pd.DataFrame) -> None:
         """Populate data flow dependencies
@@ -180,41 +158,34 @@ class ClassGraphBuilder(AbstractGraphBuilder):
             call_ret_flows (pd.DataFrame): Data flows as a pandas dataframe
         """
         logging.info("Populating call-return dependencies edges")
-        rel_id = 0
-        for _, row in tqdm(call_ret_flows.iterrows(), total=call_ret_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
-
+        edges = []
+
+        for prev_meth, next_meth, prev_context, next_context, weight in zip(
+            call_ret_flows.prev,
+            call_ret_flows.next,
+            call_ret_flows.prev_context,
+            call_ret_flows.next_context,
+            call_ret_flows.weight,
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
-            if prev_graph_node.node_class != next_graph_node.node_class:
-                rel = prev_graph_node.call_ret_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and (
-                    rel.pmethod,
-                    rel.nmethod,
-                    rel.pcontext,
-                    rel.ncontext,
-                ) == (
-                    prev_meth["name"],
-                    next_meth["name"],
-                    row.prev_context,
-                    row.next_context,
-                ):
-                    rel.rel_id = rel_id
-                    rel.weight += 1
-                    rel.save()
-                else:
-                    next_graph_node.call_ret_flows.connect(
+            if prev_graph_node != next_graph_node:
+                edges.append(
+                    self._edge_row(
+                        CallReturnRelationship,
                         prev_graph_node,
+                        next_graph_node,
                         {
-                            "weight": 1,
-                            "rel_id": rel_id,
                             "pmethod": prev_meth["name"],
                             "nmethod": next_meth["name"],
-                            "pcontext": row.prev_context,
-                            "ncontext": row.next_context,
+                            "pcontext": prev_context,
+                            "ncontext": next_context,
                         },
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("CALL_RETURN_DEPENDENCY", edges)
@@ -0,0 +1,201 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Facts Cache Module
+
+Keeps parsed and aggregated DOOP facts on disk so that a run over facts that haven't changed since the last run can
+skip parsing.
+
+Every entry is a directory of Arrow IPC files: one per table of flows, holding the `<column>_id` columns of the parsed
+columns and every column that isn't parsed (e.g., `weight`), one per kind of parsed value, holding every value as
+JSON once under its id, and one each for the method information and the contexts. Nothing in an entry is executed
+when it is loaded, so a shared cache directory is safe to read.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from dgi.utils.logging import Log
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+# Bump whenever the parsed facts change shape, so that older cache entries are no longer used.
+CACHE_FORMAT_VERSION = 2
+
+# JSON has no tuples, parsed values that hold one (e.g., the type of some heap objects) get it back from this key
+TUPLE_KEY = "__tuple__"
+
+
+def _to_json(value: Any) -> str:
+    """Serialize a parsed value, keeping its tuples apart from its lists"""
+
+    def encode(item):
+        if isinstance(item, tuple):
+            return {TUPLE_KEY: [encode(element) for element in item]}
+        if isinstance(item, list):
+            return [encode(element) for element in item]
+        if isinstance(item, dict):
+            return {key: encode(element) for key, element in item.items()}
+        return item
+
+    return json.dumps(encode(value))
+
+
+def _from_json(text: str) -> Any:
+    """Deserialize a value serialized by `_to_json`"""
+    return json.loads(text, object_hook=lambda obj: tuple(obj[TUPLE_KEY]) if list(obj) == [TUPLE_KEY] else obj)
+
+
+class FactsCache:
+    """Parsed facts stored under a fingerprint of the files and settings they were parsed from.
+
+    Args:
+        cache_dir (str): The directory to keep the cache entries in. It is created when needed.
+        column_kinds (Dict[str, str]): The kind of value (method, context or heap_obj) in every parsed column. Ids
+                                       are given out per kind, so the columns of one kind share their values.
+    """
+
+    def __init__(self, cache_dir: str, column_kinds: Dict[str, str]) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.column_kinds = column_kinds
+
+    @staticmethod
+    def fingerprint(fact_files: Dict[str, Path], settings: Dict[str, Any]) -> str:
+        """Fingerprint the facts files and the settings that affect parsing
+
+        Args:
+            fact_files (Dict[str, Path]): The facts files by their key in config.yml, e.g., HEAP_DEPENDENCY_FILE
+            settings (Dict[str, Any]): Other settings the parsed facts depend on
+
+        Returns:
+            str: A hex digest that changes whenever a file, the file mapping or a setting changes
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((CACHE_FORMAT_VERSION, sorted(settings.items()))).encode("utf-8"))
+        for key, fact_file in sorted(fact_files.items()):
+            digest.update(f"{key}={fact_file.name}\n".encode("utf-8"))
+            with open(fact_file, "rb") as file_obj:
+                for block in iter(partial(file_obj.read, 1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir.joinpath(f"facts-{key}")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """Load the parsed facts stored under a fingerprint
+
+        Equal values are decoded once and shared by every row (and column) they appear in, like parsing does.
+
+        Args:
+            key (str): The fingerprint
+
+        Returns:
+            Optional[Dict]: The tables of flows by name under "flows", and the "method_info" and "contexts", None if
+            there are none (or they can't be read)
+        """
+        entry = self._entry(key)
+        if not entry.is_dir():
+            return None
+
+        try:
+            with open(entry.joinpath("columns.json"), "r", encoding="utf-8") as file_obj:
+                columns = json.load(file_obj)
+            values = {}
+            for kind in set(self.column_kinds.values()):
+                table = pd.read_feather(entry.joinpath(f"{kind}.arrow"))
+                values[kind] = dict(zip(table["id"].tolist(), map(_from_json, table["value"])))
+            flows = {name: self._rebuild(entry, name, names, values) for name, names in columns.items()}
+            method_info = pd.read_feather(entry.joinpath("method_info.arrow")).set_index("key")
+            contexts = pd.read_feather(entry.joinpath("contexts.arrow"))["context"]
+        except (OSError, ValueError, KeyError) as error:
+            Log.warn(f"Ignoring unreadable facts cache entry {entry}: {error}")
+            return None
+
+        return {
+            "flows": flows,
+            "method_info": method_info.to_dict(orient="index"),
+            "contexts": {context: {"prev": [], "next": []} for context in contexts},
+        }
+
+    def _rebuild(self, entry: Path, name: str, names: list, values: Dict[str, Dict]) -> pd.DataFrame:
+        """Read a table of flows and put the parsed values back next to their ids"""
+        flows = pd.read_feather(entry.joinpath(f"{name}.arrow"))
+        for column in names:
+            if column in self.column_kinds:
+                codes, ids = pd.factorize(flows[f"{column}_id"])
+                shared = np.empty(len(ids), dtype=object)
+                shared[:] = [values[self.column_kinds[column]][value_id] for value_id in ids]
+                flows[column] = shared.take(codes)
+        return flows[names]
+
+    def store(self, key: str, facts: Dict) -> None:
+        """Store parsed facts under a fingerprint
+
+        Args:
+            key (str): The fingerprint
+            facts (Dict): The tables of flows by name under "flows", and the "method_info" and "contexts"
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary directory first so that an interrupted run never leaves a partial entry behind
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir))
+        try:
+            values = {kind: {} for kind in set(self.column_kinds.values())}
+            for name, flows in facts["flows"].items():
+                parsed = [column for column in flows.columns if column in self.column_kinds]
+                for column in parsed:
+                    first = ~flows[f"{column}_id"].duplicated()
+                    kind_values = values[self.column_kinds[column]]
+                    for value_id, value in zip(flows[f"{column}_id"][first], flows[column][first]):
+                        if value_id not in kind_values:
+                            kind_values[value_id] = _to_json(value)
+                flows.drop(columns=parsed).reset_index(drop=True).to_feather(tmp_dir.joinpath(f"{name}.arrow"))
+
+            for kind, kind_values in values.items():
+                table = pd.DataFrame({"id": np.array(list(kind_values), dtype=np.int64), "value": list(kind_values.values())})
+                table.astype({"value": object}).to_feather(tmp_dir.joinpath(f"{kind}.arrow"))
+            method_info = pd.DataFrame.from_dict(
+                facts["method_info"], orient="index", columns=["name", "class", "return_type"]
+            )
+            method_info.rename_axis("key").reset_index().to_feather(tmp_dir.joinpath("method_info.arrow"))
+            contexts = pd.DataFrame({"context": list(facts["contexts"])}, dtype=object)
+            contexts.to_feather(tmp_dir.joinpath("contexts.arrow"))
+            with open(tmp_dir.joinpath("columns.json"), "w", encoding="utf-8") as file_obj:
+                json.dump({name: list(flows.columns) for name, flows in facts["flows"].items()}, file_obj)
+
+            os.replace(tmp_dir, self._entry(key))
+        except OSError:
+            # Another run stored the same entry first
+            if not self._entry(key).is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,74 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Full Graph Builder Module
+
+This module builds both the class and the method level abstraction graphs from a single pass over the facts.
+"""
+
+from dgi.code2graph.abstract_graph_builder import AbstractGraphBuilder
+from dgi.code2graph.class_graph_builder import ClassGraphBuilder
+from dgi.code2graph.method_graph_builder import MethodGraphBuilder
+from dgi.utils.logging import Log
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+
+# pylint: disable=too-few-public-methods
+class FullGraphBuilder:
+    """Build the class and the method level abstraction graphs together
+
+    The facts are parsed and aggregated once, and every chunk of aggregated flows is handed to both builders.
+    The class builder rolls the method level rows up to its classes: rows that end up on the same pair of
+    classes with the same properties are summed into a single edge before they are written.
+    """
+
+    def __init__(self, opt):
+        self.opt = opt
+        self.builders = [ClassGraphBuilder(opt), MethodGraphBuilder(opt)]
+
+    def build_ddg(self, clear: bool = True) -> None:
+        """Build the data dependency graph at both levels of abstraction"""
+        heap_chunks, data_chunks, call_return_chunks = AbstractGraphBuilder.read_flows(self.opt)
+
+        for builder in self.builders:
+            builder.prepare_graph(clear)
+
+        # Process heap flows
+        for heap_flows in heap_chunks:
+            for builder in self.builders:
+                builder.populate(heap_flows=heap_flows)
+
+        # Process Data flows
+        for data_flows in data_chunks:
+            for builder in self.builders:
+                builder.populate(data_flows=data_flows)
+
+        # Process call return flows
+        for call_return_flows in call_return_chunks:
+            for builder in self.builders:
+                builder.populate(call_return_flows=call_return_flows)
+
+        for builder in self.builders:
+            builder.log_summary()
+        Log.info("Populating entrypoints")
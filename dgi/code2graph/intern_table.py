@@ -0,0 +1,119 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Intern Table Module
+
+DOOP repeats the same contexts, heap objects and methods in millions of facts. The intern table parses each
+distinct raw string once and hands the same parsed object, and a small integer id, to every row it appears in.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+DEFAULT_INTERN_TABLE_SIZE = 1000000
+
+
+class InternTable:
+    """Parsed facts keyed on the raw string they were parsed from.
+
+    Args:
+        max_size (int): Maximum number of raw strings to remember. The least recently used string is forgotten
+                        first; if it shows up again it is parsed again and gets a new id. None or 0 means no limit.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_INTERN_TABLE_SIZE) -> None:
+        self.max_size = max_size or None
+        self._entries = OrderedDict()
+        self._next_id = 0
+
+    def __contains__(self, raw: str) -> bool:
+        return raw in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, raw: str) -> Optional[Tuple[int, Any]]:
+        """Get the id and parsed value of a raw string
+
+        Args:
+            raw (str): The raw fact string
+
+        Returns:
+            Optional[Tuple[int, Any]]: The id and the parsed value, None if the string is not in the table
+        """
+        entry = self._entries.get(raw)
+        if entry is not None:
+            self._entries.move_to_end(raw)
+        return entry
+
+    def add(self, raw: str, value: Any) -> int:
+        """Add a parsed value to the table
+
+        Args:
+            raw (str): The raw fact string
+            value (Any): The value parsed from it
+
+        Returns:
+            int: The id of the value
+        """
+        value_id = self._next_id
+        self._next_id += 1
+        self._entries[raw] = (value_id, value)
+        while self.max_size and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value_id
+
+    def intern(self, raw: pd.Series, parse: Callable[[pd.Series], pd.Series]) -> Tuple[pd.Series, np.ndarray]:
+        """Intern a column of raw strings, parsing only the distinct strings that are not in the table yet
+
+        Args:
+            raw (pd.Series): The raw fact strings
+            parse (Callable[[pd.Series], pd.Series]): Parses a column of raw strings
+
+        Returns:
+            Tuple[pd.Series, np.ndarray]: The parsed values (shared between equal strings) and their ids
+        """
+        codes, uniques = pd.factorize(raw)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        values = np.empty(len(uniques), dtype=object)
+
+        missing = []
+        for i, raw_str in enumerate(uniques):
+            entry = self.lookup(raw_str)
+            if entry is None:
+                missing.append(i)
+            else:
+                ids[i], values[i] = entry
+
+        if missing:
+            parsed = parse(pd.Series(uniques[missing], dtype=object))
+            for i, value in zip(missing, parsed):
+                ids[i] = self.add(uniques[i], value)
+                values[i] = value
+
+        return pd.Series(values.take(codes), index=raw.index, dtype=object), ids.take(codes)
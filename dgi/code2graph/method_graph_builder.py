@@ -23,18 +23,21 @@ It is very similar to the class graph builder but with MethodNodes
 """
 
 import logging
-from typing import Dict
+from typing import Dict, Tuple
 
 import pandas as pd
-from tqdm import tqdm
 
 # Neomodel
 from neomodel import db
-from neomodel.exceptions import DoesNotExist
 
 # Import local packages
 
 from dgi.models import MethodNode
+from dgi.models.relationships import (
+    CallReturnRelationship,
+    DataRelationship,
+    HeapCarriedRelationship,
+)
 from dgi.utils.logging import Log
 from dgi.code2graph.abstract_graph_builder import AbstractGraphBuilder
 
@@ -51,6 +54,9 @@ __status__ = "Research Prototype"
 class MethodGraphBuilder(AbstractGraphBuilder):
     """Build a method level abstraction graph"""
 
+    node_model = MethodNode
+    node_key = "node_method"
+
     @staticmethod
     def _clear_all_nodes():
         """Delete all nodes"""
@@ -59,7 +65,7 @@ class MethodGraphBuilder(AbstractGraphBuilder):
         db.cypher_query("MATCH (n)-[r]-(m:MethodNode) DELETE r")
         db.cypher_query("MATCH (n:MethodNode) DELETE n")
 
-    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict):
+    def _create_prev_and_next_nodes(self, prev_meth: Dict, next_meth: Dict) -> Tuple[str, str]:
         """_summary_
 
         Args:
@@ -72,32 +78,35 @@ class MethodGraphBuilder(AbstractGraphBuilder):
             [prev_meth["class"], prev_meth["name"]]
         )  # Method name
 
-        try:
-            prev_graph_node = MethodNode.nodes.get(node_method=prev_method_sig)
-        except DoesNotExist:
-            # Method information
-            prev_graph_node = MethodNode(
-                node_name=prev_method_short_name,
-                node_class=prev_meth["class"],
-                node_class_name=prev_meth["class"].split(".")[-1],
-                node_method=prev_method_sig,
-            ).save()
+        self._register_node(
+            prev_method_sig,
+            {
+                "node_name": prev_method_short_name,
+                "node_class": prev_meth["class"],
+                "node_class_name": prev_meth["class"].split(".")[-1],
+                "node_method": prev_method_sig,
+            },
+        )
 
         next_method_sig = next_meth["class"]
         next_method_short_name = next_method_sig.split(".")[-1]
 
-        try:
-            next_graph_node = MethodNode.nodes.get(node_method=next_method_sig)
-        except DoesNotExist:
-            # Method information
-            next_graph_node = MethodNode(
-                node_name=next_method_short_name,
-                node_class=next_meth["class"],
-                node_class_name=next_meth["class"].split(".")[-1],
-                node_method=next_method_sig,
-            ).save()
+        self._register_node(
+            next_method_sig,
+            {
+                "node_name": next_method_short_name,
+                "node_class": next_meth["class"],
+                "node_class_name": next_meth["class"].split(".")[-1],
+                "node_method": next_method_sig,
+            },
+        )
+
+        return prev_method_sig, next_method_sig
 
-        return prev_graph_node, next_graph_node
+    @staticmethod
+    def _node_names(prev_meth: Dict, next_meth: Dict) -> Tuple[str, str]:
+        """The node_name of the source and destination nodes as set by _create_prev_and_next_nodes"""
+        return prev_meth["name"], next_meth["class"].split(".")[-1]
 
     def _populate_heap_edges(self, heap_flows: pd.DataFrame) -> None:
         """Populate heap carried dependencies
@@ -105,37 +114,29 @@ class MethodGraphBuilder(AbstractGraphBuilder):
             heap_flows (pd.DataFrame): Heap flows as a pandas dataframe
         """
         logging.info("Populating heap carried dependencies edges")
+        edges = []
 
-        rel_id = 0
-
-        for _, row in tqdm(heap_flows.iterrows(), total=heap_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
-
+        for prev_meth, next_meth, context, heap_obj, weight in zip(
+            heap_flows.prev, heap_flows.next, heap_flows.context, heap_flows.heap_obj, heap_flows.weight
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
-            if prev_graph_node.node_name != next_graph_node.node_name:
-                rel = prev_graph_node.heap_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and (rel.context, rel.heap_object) == (
-                    row.context,
-                    row.heap_obj,
-                ):
-                    rel.weight += 1
-                    rel.rel_id = rel_id
-                    rel.save()
-                else:
-                    relationship_property = {
-                        "weight": 1,
-                        "rel_id": rel_id,
-                        "context": row.context,
-                        "heap_object": row.heap_obj,
-                    }
-                    prev_graph_node.heap_flows.connect(
-                        next_graph_node, relationship_property
+            prev_name, next_name = self._node_names(prev_meth, next_meth)
+            if prev_name != next_name:
+                edges.append(
+                    self._edge_row(
+                        HeapCarriedRelationship,
+                        prev_graph_node,
+                        next_graph_node,
+                        {"context": context, "heap_object": heap_obj},
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("HEAP_DEPENDENCY", edges)
 
     def _populate_dataflow_edges(self, data_flows: pd.DataFrame) -> None:
         """Populate data flow dependencies
@@ -143,25 +144,29 @@ class MethodGraphBuilder(AbstractGraphBuilder):
             data_flows (pd.DataFrame): Data flows as a pandas dataframe
         """
         logging.info("Populating dataflow edges")
-        rel_id = 0
-        for _, row in tqdm(data_flows.iterrows(), total=data_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
+        edges = []
 
+        for prev_meth, next_meth, context, weight in zip(
+            data_flows.prev, data_flows.next, data_flows.context, data_flows.weight
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
-            if prev_graph_node.node_name != next_graph_node.node_name:
-                rel = prev_graph_node.data_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and rel.context == row.context:
-                    rel.weight += 1
-                    rel.save()
-                else:
-                    next_graph_node.data_flows.connect(
-                        prev_graph_node, {"weight": 1, "context": row.context}
+            prev_name, next_name = self._node_names(prev_meth, next_meth)
+            if prev_name != next_name:
+                edges.append(
+                    self._edge_row(
+                        DataRelationship,
+                        prev_graph_node,
+                        next_graph_node,
+                        {"context": context},
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("DATA_DEPENDENCY", edges)
 
     def _populate_callreturn_edges(self, call_ret_flows: pd.DataFrame) -> None:
         """Populate data flow dependencies
@@ -169,30 +174,29 @@ class MethodGraphBuilder(AbstractGraphBuilder):
             call_ret_flows (pd.DataFrame): Data flows as a pandas dataframe
         """
         logging.info("Populating call-return dependencies edges")
-        rel_id = 0
-        for _, row in tqdm(call_ret_flows.iterrows(), total=call_ret_flows.shape[0]):
-            prev_meth = row.prev
-            next_meth = row.next
-
+        edges = []
+
+        for prev_meth, next_meth, prev_context, next_context, weight in zip(
+            call_ret_flows.prev,
+            call_ret_flows.next,
+            call_ret_flows.prev_context,
+            call_ret_flows.next_context,
+            call_ret_flows.weight,
+        ):
             prev_graph_node, next_graph_node = self._create_prev_and_next_nodes(
                 prev_meth, next_meth
             )
 
-            if prev_graph_node.node_class != next_graph_node.node_class:
-                rel = prev_graph_node.call_ret_flows.relationship(next_graph_node)
-                rel_id += 1
-                if rel and (rel.pcontext, rel.ncontext) == (
-                    row.prev_context,
-                    row.next_context,
-                ):
-                    rel.weight += 1
-                    rel.save()
-                else:
-                    next_graph_node.call_ret_flows.connect(
+            if prev_meth["class"] != next_meth["class"]:
+                edges.append(
+                    self._edge_row(
+                        CallReturnRelationship,
                         prev_graph_node,
-                        {
-                            "weight": 1,
-                            "pcontext": row.prev_context,
-                            "ncontext": row.next_context,
-                        },
+                        next_graph_node,
+                        {"pcontext": prev_context, "ncontext": next_context},
+                        weight,
                     )
+                )
+
+        self._write_nodes()
+        self._write_edges("CALL_RETURN_DEPENDENCY", edges)
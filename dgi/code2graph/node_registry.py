@@ -0,0 +1,167 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Node Registry Module
+
+Remembers which graph node belongs to which class or method so that the graph builders don't have to ask Neo4j
+every time a class or method shows up in a fact.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from neomodel import StructuredNode, db
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+
+class NodeRegistry:
+    """Maps node keys (class short names, method signatures) to the Neo4j ids of their nodes.
+
+    Args:
+        model (StructuredNode): The node model, e.g., ClassNode
+        key (str): The node property that identifies a node, e.g., node_short_name
+        max_size (int): Maximum number of nodes to remember. The least recently used node is forgotten first.
+                        None or 0 means no limit.
+    """
+
+    _registries = {}
+
+    def __init__(self, model: StructuredNode, key: str, max_size: int = None) -> None:
+        self.model = model
+        self.key = key
+        self.max_size = max_size or None
+        self.hits = 0
+        self.misses = 0
+        self._ids = OrderedDict()
+
+    @classmethod
+    def of(cls, model: StructuredNode, key: str, max_size: int = None) -> "NodeRegistry":
+        """The registry of a node model, shared by everything in this process that builds these nodes
+
+        Args:
+            model (StructuredNode): The node model
+            key (str): The node property that identifies a node
+            max_size (int): Maximum number of nodes to remember
+
+        Returns:
+            NodeRegistry: The registry
+        """
+        registry = cls._registries.get(model.__label__)
+        if registry is None:
+            registry = cls._registries[model.__label__] = cls(model, key, max_size)
+        else:
+            registry.max_size = max_size or None
+            registry._evict()
+        return registry
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, key: str) -> Optional[int]:
+        """Get the id of a node
+
+        Args:
+            key (str): The node key
+
+        Returns:
+            Optional[int]: The Neo4j id of the node, None if the node is not known
+        """
+        node_id = self._ids.get(key)
+        if node_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._ids.move_to_end(key)
+        return node_id
+
+    def put(self, key: str, node_id: int) -> None:
+        """Remember the id of a node
+
+        Args:
+            key (str): The node key
+            node_id (int): The Neo4j id of the node
+        """
+        self._ids[key] = node_id
+        self._ids.move_to_end(key)
+        self._evict()
+
+    def update(self, records: Iterable) -> None:
+        """Remember the ids of several nodes
+
+        Args:
+            records (Iterable): (key, node id) pairs, e.g., the records of a query that returns both
+        """
+        for key, node_id in records:
+            self.put(key, node_id)
+
+    def resolve(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Get the ids of several nodes, fetching the ones not in the registry with a single query
+
+        Args:
+            keys (Iterable[str]): The node keys
+
+        Returns:
+            Dict[str, int]: Node ids by key. Keys without a node in the graph are left out.
+        """
+        ids = {}
+        missing = []
+        for key in keys:
+            node_id = self.get(key)
+            if node_id is None:
+                missing.append(key)
+            else:
+                ids[key] = node_id
+
+        if missing:
+            results, _ = db.cypher_query(
+                f"UNWIND $keys AS key MATCH (n:{self.model.__label__} {{{self.key}: key}}) RETURN key, id(n)",
+                {"keys": missing},
+            )
+            ids.update(results)
+            self.update(results)
+
+        return ids
+
+    def warm(self) -> None:
+        """Load the nodes that are already in the graph with a single query"""
+        self.clear()
+        query = f"MATCH (n:{self.model.__label__}) RETURN n.{self.key}, id(n)"
+        if self.max_size:
+            query += f" LIMIT {self.max_size}"
+        results, _ = db.cypher_query(query)
+        for key, node_id in results:
+            self._ids[key] = node_id
+
+    def clear(self) -> None:
+        """Forget all nodes, e.g., after they were deleted"""
+        self._ids.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self) -> None:
+        while self.max_size and len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
@@ -24,14 +24,56 @@ import errno
 import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from csv import reader
+from itertools import chain, repeat
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterator, List, Tuple
 
+import numpy as np
 import pandas as pd
 
+from dgi.code2graph.facts_cache import FactsCache
+from dgi.code2graph.intern_table import DEFAULT_INTERN_TABLE_SIZE, InternTable
+from dgi.utils.logging import Log
 from dgi.utils.parse_config import Config
 
+# Patterns used to parse whole columns of facts at once. Values that don't match are parsed one at a time.
+# E.g., <com.acme.Main: void main(java.lang.String[])>
+METHOD_PATTERN = re.compile(r"^<(?P<class>[^:\s]+): (?P<return_type>\S+) (?P<name>[^\s(]+)\([^)]*\)>$")
+# E.g., <com.acme.Main: void main(java.lang.String)>/new java.util.ArrayList/0 (after removing [ and ])
+CONTEXT_ELEMENT_PATTERN = re.compile(
+    r"^<(?P<class>[^:]+): (?P<type>\S+) (?P<method>[^\s(]+)\([^)]*\)>/(?P<object>[^/]*)/(?P<instance>\d+)(?:/.*)?$"
+)
+# E.g., com.acme.Main void main(java.lang.String[])/new java.util.ArrayList/0 (after removing <, : and >)
+HEAP_OBJECT_PATTERN = re.compile(
+    r"^(?P<class>[^ /]+) [^ /]+ (?P<method>[^ /]+)/\S+ (?P<object>[^ /]+)[^/]*/(?P<instance>\d+)(?:/.*)?$"
+)
+IMMUTABLE_CONTEXTS = {
+    "<<immutable-context>>",
+    "<<immutable-hcontext>>",
+    "<<string-builder>>",
+    "<<string-buffer>>",
+}
+SPECIAL_HEAP_OBJECTS = {
+    "string-constant",
+    "string-builder",
+    "java.lang.StringMockObject",
+    "null pseudo heap",
+}
+# The kind of value every parsed column holds, ids are given out per kind
+INTERNED_COLUMNS = {
+    "context": "context",
+    "prev_context": "context",
+    "next_context": "context",
+    "prev": "method",
+    "next": "method",
+    "heap_obj": "heap_obj",
+}
+# Fewer new strings than this per worker are parsed in the main process; shipping them to a worker costs more.
+MIN_STRINGS_PER_WORKER = 5000
+
 
 class ConsumeFacts:
     "Synthesize DOOP facts"
@@ -46,6 +88,8 @@ class ConsumeFacts:
         """
         self.conf = conf
         self.method_info = {}
+        self.workers = getattr(conf, "WORKERS", 1) or 1
+        self._pool = None
         self.__setup()
 
     def __setup(self) -> None:
@@ -53,6 +97,26 @@ class ConsumeFacts:
         self.absolute_facts_dir = Path(self.conf.GRAPH_FACTS_DIR)
         self.method_info = {}
         self.contexts = {}
+        table_size = getattr(self.conf, "INTERN_TABLE_SIZE", DEFAULT_INTERN_TABLE_SIZE)
+        self.intern_tables = {
+            "method": InternTable(table_size),
+            "context": InternTable(table_size),
+            "heap_obj": InternTable(table_size),
+        }
+
+    @contextmanager
+    def _worker_pool(self):
+        """Parse with a pool of `WORKERS` processes while in this context (no pool for a single worker)"""
+        if self.workers < 2 or self._pool is not None:
+            yield
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            self._pool = pool
+            try:
+                yield
+            finally:
+                self._pool = None
 
     def _jsonify_method_string(self, raw: str) -> str:
         """Convert doop style method information to a json formatted string
@@ -116,12 +180,7 @@ class ConsumeFacts:
         raw_ctx_lst = raw_str.split(", ")
 
         for i, str_el in enumerate(raw_ctx_lst):
-            if str_el in (
-                "<<immutable-context>>",
-                "<<immutable-hcontext>>",
-                "<<string-builder>>",
-                "<<string-buffer>>",
-            ):
+            if str_el in IMMUTABLE_CONTEXTS:
                 raw_ctx_lst[i] = {
                     "class": None,
                     "method": str_el,
@@ -182,12 +241,7 @@ class ConsumeFacts:
             str: JSON string
         """
         raw_substr = re.sub("[<:>]", "", heapobj_str)
-        if raw_substr in {
-            "string-constant",
-            "string-builder",
-            "java.lang.StringMockObject",
-            "null pseudo heap",
-        }:
+        if raw_substr in SPECIAL_HEAP_OBJECTS:
             heap_obj_dict = {
                 "class": raw_substr,
                 "method": None,
@@ -228,6 +282,174 @@ class ConsumeFacts:
 
         return heap_obj_dict
 
+    def _jsonify_method_strings(self, raw: pd.Series) -> pd.Series:
+        """Vectorized `_jsonify_method_string` for a whole column
+
+        Args:
+            raw (pd.Series): Method information as doop style strings
+
+        Returns:
+            pd.Series: The method information dictionaries
+        """
+        parts = raw.str.extract(METHOD_PATTERN)
+        methods = []
+        for raw_str, class_name, return_type, method_sig in zip(
+            raw, parts["class"], parts["return_type"], parts["name"]
+        ):
+            if not isinstance(method_sig, str):
+                methods.append(self._jsonify_method_string(raw_str))
+                continue
+
+            key = "::".join([class_name, method_sig])
+            method_dict = self.method_info.get(key)
+            if method_dict is None:
+                method_dict = {
+                    "name": method_sig,
+                    "class": class_name,
+                    "return_type": return_type,
+                }
+                self.method_info[key] = method_dict
+            methods.append(method_dict)
+
+        return pd.Series(methods, index=raw.index, dtype=object)
+
+    def _jsonify_contexts(self, raw: pd.Series) -> pd.Series:  # pylint: disable=too-many-locals
+        """Vectorized `_jsonify_context` for a whole column
+
+        Args:
+            raw (pd.Series): Doop format context strings
+
+        Returns:
+            pd.Series: The contexts as lists of dictionaries
+        """
+        elements = raw.str.replace(r"[\[\]]", "", regex=True).str.split(", ")
+        rows = np.repeat(np.arange(len(raw)), elements.str.len().to_numpy())
+        elements = elements.explode()
+        parts = elements.str.extract(CONTEXT_ELEMENT_PATTERN)
+
+        contexts = [[] for _ in range(len(raw))]
+        unparsed = set()
+        for row, str_el, class_name, method_rtype, method_name, object_name, instance_id in zip(
+            rows,
+            elements,
+            parts["class"],
+            parts["type"],
+            parts["method"],
+            parts["object"],
+            parts["instance"],
+        ):
+            if str_el in IMMUTABLE_CONTEXTS:
+                ctx = {"class": None, "method": str_el, "type": None, "object": None, "instance": 0}
+            elif "MockObject" in str_el or not isinstance(method_name, str):
+                unparsed.add(row)
+                continue
+            else:
+                ctx = {
+                    "class": class_name,
+                    "method": method_name,
+                    "type": method_rtype,
+                    "object": object_name,
+                    "instance": int(instance_id),
+                }
+            contexts[row].append(ctx)
+
+        for row, raw_str in enumerate(raw):
+            if row in unparsed:
+                contexts[row] = self._jsonify_context(raw_str)
+            else:
+                self.contexts.update({json.dumps(contexts[row]): {"prev": [], "next": []}})
+
+        return pd.Series(contexts, index=raw.index, dtype=object)
+
+    def _jsonify_heap_objs(self, raw: pd.Series) -> pd.Series:
+        """Vectorized `_jsonify_heap_obj` for a whole column
+
+        Args:
+            raw (pd.Series): Heap objects as strings
+
+        Returns:
+            pd.Series: The heap object dictionaries
+        """
+        stripped = raw.str.replace("[<:>]", "", regex=True)
+        parts = stripped.str.extract(HEAP_OBJECT_PATTERN)
+        heap_objs = []
+        for raw_str, raw_substr, class_name, method_name, object_name, instance_id in zip(
+            raw, stripped, parts["class"], parts["method"], parts["object"], parts["instance"]
+        ):
+            if raw_substr in SPECIAL_HEAP_OBJECTS:
+                heap_objs.append({"class": raw_substr, "method": None, "object": None, "instance": 0})
+            elif "MockObject" in raw_str or not isinstance(method_name, str):
+                heap_objs.append(self._jsonify_heap_obj(raw_str))
+            else:
+                heap_objs.append(
+                    {
+                        "class": class_name,
+                        "method": method_name,
+                        "type": (None,),
+                        "object": object_name,
+                        "instance": int(instance_id),
+                    }
+                )
+
+        return pd.Series(heap_objs, index=raw.index, dtype=object)
+
+    def _parse_strings(self, raw: pd.Series, kind: str) -> pd.Series:
+        """Parse a column of facts with the vectorized parser of its kind
+
+        Args:
+            raw (pd.Series): The raw fact strings
+            kind (str): What the column holds: method, context or heap_obj
+
+        Returns:
+            pd.Series: The parsed values
+        """
+        parse = {
+            "method": self._jsonify_method_strings,
+            "context": self._jsonify_contexts,
+            "heap_obj": self._jsonify_heap_objs,
+        }[kind]
+        return parse(raw)
+
+    def _parse_strings_in_parallel(self, raw: pd.Series, kind: str) -> pd.Series:
+        """Parse a column of facts, splitting it across the worker pool when there is one and the column is large
+
+        The workers parse without the method information and contexts of this process. Their results are merged back
+        in order, so the first parse of a method wins and every context is recorded, just as when parsing serially.
+
+        Args:
+            raw (pd.Series): The raw fact strings
+            kind (str): What the column holds: method, context or heap_obj
+
+        Returns:
+            pd.Series: The parsed values
+        """
+        num_slices = min(self.workers, len(raw) // MIN_STRINGS_PER_WORKER)
+        if self._pool is None or num_slices < 2:
+            return self._parse_strings(raw, kind)
+
+        slices = np.array_split(raw.to_numpy(dtype=object), num_slices)
+        parsed = list(chain.from_iterable(self._pool.map(_parse_strings_in_worker, repeat(self.conf), slices, repeat(kind))))
+
+        if kind == "method":
+            parsed = [self.method_info.setdefault("::".join([meth["class"], meth["name"]]), meth) for meth in parsed]
+        elif kind == "context":
+            for ctx in parsed:
+                self.contexts.update({json.dumps(ctx): {"prev": [], "next": []}})
+
+        return pd.Series(parsed, index=raw.index, dtype=object)
+
+    def _intern_column(self, facts: pd.DataFrame, column: str) -> None:
+        """Parse a column of facts in place and add a `<column>_id` column with the ids of the parsed values
+
+        Args:
+            facts (pd.DataFrame): The facts
+            column (str): The column to parse, one of `INTERNED_COLUMNS`
+        """
+        kind = INTERNED_COLUMNS[column]
+        facts[column], facts[f"{column}_id"] = self.intern_tables[kind].intern(
+            facts[column], lambda raw: self._parse_strings_in_parallel(raw, kind)
+        )
+
     def _process_method_info(self, method_info_file: Path) -> None:
         """Process method information into a dictionary for reference
 
@@ -245,6 +467,67 @@ class ConsumeFacts:
                         "return_type": row[3],
                     }
 
+    @staticmethod
+    def _read_facts(fact_loc: Path, chunk_size: int = None):
+        """Read a DOOP facts file
+
+        Args:
+            fact_loc (Path): Path to the facts file.
+            chunk_size (int): Number of facts to read at a time. None reads the whole file.
+
+        Returns:
+            The facts as a dataframe, or an iterator over dataframes of at most chunk_size facts.
+        """
+        return pd.read_csv(fact_loc, header=None, delimiter="\t", chunksize=chunk_size)
+
+    def _parse_heap_flows(self, heap_flows_df: pd.DataFrame) -> pd.DataFrame:
+        """Parse raw heap carried dependencies
+
+        Args:
+            heap_flows_df (pd.DataFrame): Raw heap carried dependency flows.
+
+        Returns:
+            pd.DataFrame: The dataframe containing processed heap carried dependencies
+        """
+        heap_flows_df.columns = ["context", "heap_obj", "prev", "next"]
+        self._intern_column(heap_flows_df, "context")
+        self._intern_column(heap_flows_df, "prev")
+        self._intern_column(heap_flows_df, "next")
+        self._intern_column(heap_flows_df, "heap_obj")
+        return heap_flows_df
+
+    def _parse_call_return_flows(self, callret_flows_df: pd.DataFrame) -> pd.DataFrame:
+        """Parse raw call-return dependencies
+
+        Args:
+            callret_flows_df (pd.DataFrame): Raw call dependency flows.
+
+        Returns:
+            pd.DataFrame: The dataframe containing processed call-return dependencies
+        """
+        callret_flows_df.columns = [
+            "prev_context", "prev", "next_context", "next"]
+        self._intern_column(callret_flows_df, "prev_context")
+        self._intern_column(callret_flows_df, "next_context")
+        self._intern_column(callret_flows_df, "prev")
+        self._intern_column(callret_flows_df, "next")
+        return callret_flows_df
+
+    def _parse_data_flows(self, data_flows_df: pd.DataFrame) -> pd.DataFrame:
+        """Parse raw data dependent instructions
+
+        Args:
+            data_flows_df (pd.DataFrame): Raw data dependent flows.
+
+        Returns:
+            pd.DataFrame: The dataframe containing processed data dependencies
+        """
+        data_flows_df.columns = ["context", "prev", "next"]
+        self._intern_column(data_flows_df, "context")
+        self._intern_column(data_flows_df, "prev")
+        self._intern_column(data_flows_df, "next")
+        return data_flows_df
+
     def _process_heap_carried_dependencies(self, fact_loc: Path) -> pd.DataFrame:
         """Process heap carried dependencies
 
@@ -254,17 +537,7 @@ class ConsumeFacts:
         Returns:
             pd.DataFrame: The dataframe containing processed heap carried dependencies
         """
-        heap_flows_df = pd.read_csv(fact_loc, header=None, delimiter="\t")
-        heap_flows_df.columns = ["context", "heap_obj", "prev", "next"]
-        heap_flows_df.context = heap_flows_df.context.apply(
-            self._jsonify_context)
-        heap_flows_df.prev = heap_flows_df.prev.apply(
-            self._jsonify_method_string)
-        heap_flows_df.next = heap_flows_df.next.apply(
-            self._jsonify_method_string)
-        heap_flows_df.heap_obj = heap_flows_df.heap_obj.apply(
-            self._jsonify_heap_obj)
-        return heap_flows_df
+        return self._parse_heap_flows(self._read_facts(fact_loc))
 
     def _process_call_return_dependencies(
         self, calls_fact_loc: Path, returns_fact_loc: Path
@@ -278,27 +551,14 @@ class ConsumeFacts:
         Returns:
             pd.DataFrame: The dataframe containing processed call-return dependencies
         """
-        callret_flows_df = pd.read_csv(
-            calls_fact_loc, header=None, delimiter="\t")
+        callret_flows_df = self._read_facts(calls_fact_loc)
         pd.concat(
             [
                 callret_flows_df,
-                pd.read_csv(returns_fact_loc, header=None, delimiter="\t"),
+                self._read_facts(returns_fact_loc),
             ]
         )
-        callret_flows_df.columns = [
-            "prev_context", "prev", "next_context", "next"]
-        callret_flows_df.prev_context = callret_flows_df.prev_context.apply(
-            self._jsonify_context
-        )
-        callret_flows_df.next_context = callret_flows_df.next_context.apply(
-            self._jsonify_context
-        )
-        callret_flows_df.prev = callret_flows_df.prev.apply(
-            self._jsonify_method_string)
-        callret_flows_df.next = callret_flows_df.next.apply(
-            self._jsonify_method_string)
-        return callret_flows_df
+        return self._parse_call_return_flows(callret_flows_df)
 
     def _process_data_dependencies(self, fact_loc: Path) -> pd.DataFrame:
         """Process data dependent instructions
@@ -309,15 +569,42 @@ class ConsumeFacts:
         Returns:
             pd.DataFrame: The dataframe containing processed data dependencies
         """
-        data_flows_df = pd.read_csv(fact_loc, header=None, delimiter="\t")
-        data_flows_df.columns = ["context", "prev", "next"]
-        data_flows_df.context = data_flows_df.context.apply(
-            self._jsonify_context)
-        data_flows_df.prev = data_flows_df.prev.apply(
-            self._jsonify_method_string)
-        data_flows_df.next = data_flows_df.next.apply(
-            self._jsonify_method_string)
-        return data_flows_df
+        return self._parse_data_flows(self._read_facts(fact_loc))
+
+    def _stream_facts(
+        self, fact_loc: Path, chunk_size: int, parse: Callable[[pd.DataFrame], pd.DataFrame]
+    ) -> Iterator[pd.DataFrame]:
+        """Read and parse a facts file one chunk at a time
+
+        Args:
+            fact_loc (Path): Path to the facts file.
+            chunk_size (int): Number of facts to read at a time.
+            parse (Callable[[pd.DataFrame], pd.DataFrame]): Parses a chunk of raw facts.
+
+        Yields:
+            pd.DataFrame: The next chunk of processed facts
+        """
+        with self._worker_pool(), self._read_facts(fact_loc, chunk_size) as chunks:
+            for chunk in chunks:
+                yield parse(chunk)
+
+    def _facts_file(self, file_name: str) -> Path:
+        """Locate a facts file
+
+        Args:
+            file_name (str): Name of the file in the facts folder.
+
+        Returns:
+            Path: Path to the facts file
+        """
+        facts_file = self.absolute_facts_dir.joinpath(file_name)
+
+        if not facts_file.exists():
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), str(facts_file)
+            )
+
+        return facts_file
 
     def get_method_info(self) -> Dict:
         """Method information as a dictionary
@@ -347,81 +634,156 @@ class ConsumeFacts:
         return self.contexts
 
     def process_and_get_facts_data(
-        self,
+        self, aggregate: bool = False
     ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """Process all facts and return the data
 
+        Args:
+            aggregate (bool): Collapse duplicate facts with `aggregate_flows`
+
         Returns:
             Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: Heap flows, data flows, and call/return flows.
+            Equal raw values share one parsed object, and every parsed column comes with a `<column>_id` column
+            holding the id of that object. When `FACTS_CACHE_DIR` is set, the parsed (and aggregated) facts are
+            kept there and reused as long as the facts files don't change.
         """
 
-        # ------------------
-        # Method information
-        # ------------------
-        method_info_file = self.absolute_facts_dir.joinpath(
-            self.conf.METHOD_INFORMATION_FILE
-        )
-
-        if not method_info_file.exists():
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(errno.ENOENT), str(method_info_file)
+        fact_files = {
+            key: self._facts_file(getattr(self.conf, key))
+            for key in (
+                "METHOD_INFORMATION_FILE",
+                "HEAP_DEPENDENCY_FILE",
+                "DATA_DEPENDENCY_FILE",
+                "CALL_DEPENDENCY_FILE",
+                "RETURN_DEPENDENCY_FILE",
+            )
+        }
+
+        # Reuse the facts parsed by an earlier run over the same files
+        cache_dir = getattr(self.conf, "FACTS_CACHE_DIR", None)
+        if cache_dir:
+            cache = FactsCache(cache_dir, INTERNED_COLUMNS)
+            cache_key = cache.fingerprint(
+                fact_files,
+                {
+                    "INTERN_TABLE_SIZE": getattr(self.conf, "INTERN_TABLE_SIZE", DEFAULT_INTERN_TABLE_SIZE),
+                    "AGGREGATE": aggregate,
+                },
+            )
+            cached = cache.load(cache_key)
+            if cached is not None:
+                Log.info(f"Loaded parsed facts from {cache.cache_dir}")
+                self.method_info, self.contexts = cached["method_info"], cached["contexts"]
+                return cached["flows"]["heap_flows"], cached["flows"]["data_flows"], cached["flows"]["call_return_flows"]
+
+        with self._worker_pool():
+            # ------------------
+            # Method information
+            # ------------------
+            self._process_method_info(fact_files["METHOD_INFORMATION_FILE"])
+
+            # -----------------------------
+            # Heap carried dependency flows
+            # -----------------------------
+            heap_flows = self._process_heap_carried_dependencies(fact_files["HEAP_DEPENDENCY_FILE"])
+
+            # ---------------------
+            # Data dependency flows
+            # ---------------------
+            data_flows = self._process_data_dependencies(fact_files["DATA_DEPENDENCY_FILE"])
+
+            # ----------------------------
+            # Call-return dependency flows
+            # ----------------------------
+            call_return_flows = self._process_call_return_dependencies(
+                fact_files["CALL_DEPENDENCY_FILE"], fact_files["RETURN_DEPENDENCY_FILE"]
             )
 
-        self._process_method_info(method_info_file)
+        if aggregate:
+            heap_flows, data_flows, call_return_flows = map(aggregate_flows, (heap_flows, data_flows, call_return_flows))
 
-        # -----------------------------
-        # Heap carried dependency flows
-        # -----------------------------
-        heap_facts_file = self.absolute_facts_dir.joinpath(
-            self.conf.HEAP_DEPENDENCY_FILE
-        )
+        if cache_dir:
+            try:
+                cache.store(
+                    cache_key,
+                    {
+                        "flows": {
+                            "heap_flows": heap_flows,
+                            "data_flows": data_flows,
+                            "call_return_flows": call_return_flows,
+                        },
+                        "method_info": self.method_info,
+                        "contexts": self.contexts,
+                    },
+                )
+            except OSError as error:
+                Log.warn(f"Could not keep the parsed facts in {cache.cache_dir}: {error}")
 
-        if not heap_facts_file.exists():
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(errno.ENOENT), str(heap_facts_file)
-            )
+        return heap_flows, data_flows, call_return_flows
 
-        heap_flows = self._process_heap_carried_dependencies(heap_facts_file)
+    def stream_facts_data(
+        self, chunk_size: int
+    ) -> Tuple[Iterator[pd.DataFrame], Iterator[pd.DataFrame], Iterator[pd.DataFrame]]:
+        """Process the facts a chunk at a time, so that no more than chunk_size raw facts are in memory at once
 
-        # ---------------------
-        # Data dependency flows
-        # ---------------------
-        data_dep_facts_file = self.absolute_facts_dir.joinpath(
-            self.conf.DATA_DEPENDENCY_FILE
+        Args:
+            chunk_size (int): Number of facts to read at a time.
+
+        Returns:
+            Tuple[Iterator[pd.DataFrame], Iterator[pd.DataFrame], Iterator[pd.DataFrame]]: Chunks of heap flows,
+            data flows, and call/return flows, in the same form as `process_and_get_facts_data`. The method
+            information is read and all facts files are located right away; the flows are read as they are consumed.
+            Streamed facts are never kept in `FACTS_CACHE_DIR`.
+        """
+        self._process_method_info(self._facts_file(self.conf.METHOD_INFORMATION_FILE))
+
+        heap_facts_file = self._facts_file(self.conf.HEAP_DEPENDENCY_FILE)
+        data_dep_facts_file = self._facts_file(self.conf.DATA_DEPENDENCY_FILE)
+        call_dep_facts_file = self._facts_file(self.conf.CALL_DEPENDENCY_FILE)
+        # Like process_and_get_facts_data, only the call dependencies make it into the call/return flows
+        self._facts_file(self.conf.RETURN_DEPENDENCY_FILE)
+
+        return (
+            self._stream_facts(heap_facts_file, chunk_size, self._parse_heap_flows),
+            self._stream_facts(data_dep_facts_file, chunk_size, self._parse_data_flows),
+            self._stream_facts(call_dep_facts_file, chunk_size, self._parse_call_return_flows),
         )
 
-        if not data_dep_facts_file.exists():
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(
-                    errno.ENOENT), str(data_dep_facts_file)
-            )
 
-        data_flows = self._process_data_dependencies(data_dep_facts_file)
+def aggregate_flows(flows: pd.DataFrame) -> pd.DataFrame:
+    """Collapse duplicate facts into one row
 
-        # ----------------------------
-        # Call-return dependency flows
-        # ----------------------------
-        call_dep_facts_file = self.absolute_facts_dir.joinpath(
-            self.conf.CALL_DEPENDENCY_FILE
-        )
-        return_dep_facts_file = self.absolute_facts_dir.joinpath(
-            self.conf.RETURN_DEPENDENCY_FILE
-        )
+    Args:
+        flows (pd.DataFrame): Parsed facts, one row per fact
 
-        if not call_dep_facts_file.exists():
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(
-                    errno.ENOENT), str(call_dep_facts_file)
-            )
+    Returns:
+        pd.DataFrame: One row per distinct fact in order of first appearance, with the number of times
+                      it appeared in a `weight` column
+    """
+    # Facts are grouped on the ids given to the parsed values. Without ids, group on the values' JSON text
+    # since dicts and lists can't be grouped on.
+    keys = [column for column in flows.columns if column.endswith("_id")]
+    if keys:
+        hashable = flows[keys]
+    else:
+        keys = list(flows.columns)
+        hashable = pd.DataFrame({key: flows[key].map(json.dumps) for key in keys})
+    codes = hashable.groupby(keys, sort=False).ngroup()
 
-        if not return_dep_facts_file.exists():
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(
-                    errno.ENOENT), str(return_dep_facts_file)
-            )
+    aggregated = flows.loc[~codes.duplicated()].reset_index(drop=True)
+    aggregated["weight"] = codes.value_counts().sort_index().to_numpy()
+    return aggregated
 
-        call_return_flows = self._process_call_return_dependencies(
-            call_dep_facts_file, return_dep_facts_file
-        )
 
-        return heap_flows, data_flows, call_return_flows
+def _parse_strings_in_worker(conf: Config, raw: List[str], kind: str) -> List:
+    """Parse a slice of raw fact strings in a worker process
+
+    Args:
+        conf (Config): The configuration of the ConsumeFacts that sent the slice
+        raw (List[str]): The raw fact strings
+        kind (str): What the strings are: method, context or heap_obj
+
+    Returns:
+        List: The parsed values
+    """
+    return ConsumeFacts(conf)._parse_strings(pd.Series(raw, dtype=object), kind).tolist()  # pylint: disable=W0212
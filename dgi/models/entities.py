@@ -109,7 +109,7 @@ class ClassNode(StructuredNode):
     # Properties of the node
     node_id = UniqueIdProperty()
     node_class = StringProperty(required=True)
-    node_short_name = StringProperty(required=True)
+    node_short_name = StringProperty(required=True, index=True)
     node_is_entrypoint = BooleanProperty(default=False)
     partition_id = IntegerProperty()
 
@@ -0,0 +1,138 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+DDL Parser
+
+Parses a DDL script with simple_ddl_parser, optionally across a pool of worker processes. The script is split into
+statements, the workers parse runs of statements into the parser's raw statement records, and the records are put
+together in this process, in order, so that ALTER and CREATE INDEX statements are attached to their tables exactly
+as if the whole script had been parsed at once.
+
+Parsed files can be kept in a `SchemaCache`, and are then only parsed again when they change.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, List
+
+from simple_ddl_parser import DDLParser
+
+from dgi.schema2graph.schema_cache import SchemaCache
+from dgi.utils.logging import Log
+
+# Fewest statements sent to a worker process at a time, and number of tasks per worker
+MIN_STATEMENTS_PER_TASK = 50
+TASKS_PER_WORKER = 4
+
+
+def split_statements(ddl: str) -> List[str]:
+    """Split a DDL script into statements
+
+    A statement ends with a line ending with a semicolon, like simple_ddl_parser ends them, unless that line is a
+    comment, is inside a block comment or is a SET statement (which the parser finishes on the next line).
+
+    Args:
+        ddl (str): The DDL script
+
+    Returns:
+        List[str]: The statements, with all their lines, comments included
+    """
+    statements, lines, open_comments = [], [], 0
+    for line in ddl.split("\n"):
+        lines.append(line)
+        stripped = line.strip()
+        open_comments = max(open_comments + stripped.count("/*") - stripped.count("*/"), 0)
+        if (
+            stripped.endswith(";")
+            and not open_comments
+            and not stripped.startswith(("--", "#"))
+            and not stripped.upper().startswith("SET")
+        ):
+            statements.append("\n".join(lines))
+            lines = []
+    if any(line.strip() for line in lines):
+        statements.append("\n".join(lines))
+    return statements
+
+
+def parse_ddl(ddl: str, workers: int = 1) -> Dict:
+    """Parse a DDL script
+
+    Args:
+        ddl (str): The DDL script
+        workers (int): Number of processes parsing the statements
+
+    Returns:
+        Dict: The tables, types, sequences, ... of the script, like simple_ddl_parser's group_by_type output
+    """
+    statements = split_statements(ddl) if workers > 1 else []
+    per_task = max(MIN_STATEMENTS_PER_TASK, math.ceil(len(statements) / (workers * TASKS_PER_WORKER)))
+    tasks = ["\n".join(statements[start:start + per_task]) for start in range(0, len(statements), per_task)]
+    if len(tasks) < 2:
+        return DDLParser(ddl).run(group_by_type=True)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        records = list(chain.from_iterable(pool.map(_parse_statements, tasks)))
+
+    # Every run of statements ends with its comments, the whole script has them all at its end
+    comments = list(chain.from_iterable(record["comments"] for record in records if "comments" in record))
+    records = [record for record in records if "comments" not in record]
+    if comments:
+        records.append({"comments": comments})
+    # Format the records with the parser's own output step, as if it had parsed them itself. A subclass would
+    # make PLY build its parse tables for this module, so the instance is given the records instead.
+    parser = DDLParser("")
+    parser.parse_data = lambda: records
+    return parser.run(group_by_type=True, output_mode="sql")
+
+
+def parse_ddl_file(file_path: str, workers: int = 1, cache: SchemaCache = None) -> Dict:
+    """Parse a DDL file
+
+    Args:
+        file_path (str): The DDL file
+        workers (int): Number of processes parsing the statements
+        cache (SchemaCache): Reuse the schema parsed from the same DDL by an earlier run, and keep this one, None to
+                             always parse
+
+    Returns:
+        Dict: The tables, types, sequences, ... of the file, like simple_ddl_parser's group_by_type output
+    """
+    with open(file_path, "r", encoding="utf-8") as file_obj:
+        ddl = file_obj.read()
+
+    if cache is None:
+        return parse_ddl(ddl, workers)
+
+    key = cache.fingerprint(ddl)
+    result = cache.load(key)
+    if result is not None:
+        Log.info(f"Loaded the parsed schema from {cache.cache_dir}")
+        return result
+
+    result = parse_ddl(ddl, workers)
+    try:
+        cache.store(key, result)
+    except OSError as error:
+        Log.warn(f"Could not keep the parsed schema in {cache.cache_dir}: {error}")
+    return result
+
+
+def _parse_statements(ddl: str) -> List[Dict]:
+    """Parse a run of statements in a worker process into simple_ddl_parser's raw statement records"""
+    return DDLParser(ddl).parse_data()
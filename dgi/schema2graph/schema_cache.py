@@ -0,0 +1,111 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Schema Cache Module
+
+Keeps parsed DDL schemas on disk so that loading a DDL that hasn't changed since the last run skips parsing.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Optional
+
+from dgi.utils.logging import Log
+
+# Bump whenever the parsed schemas change shape, so that older cache entries are no longer used.
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_dir() -> Path:
+    """The directory parsed schemas are kept in unless told otherwise: dgi/s2g in the user's cache directory"""
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home().joinpath(".cache")).joinpath("dgi", "s2g")
+
+
+def parser_version() -> str:
+    """The version of simple_ddl_parser, parsed schemas are only reused with the parser that produced them"""
+    try:
+        return metadata.version("simple-ddl-parser")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class SchemaCache:
+    """Parsed schemas stored under a fingerprint of the DDL they were parsed from.
+
+    Entries are the JSON that `s2g --output` writes, so column sizes like (14, 2) come back as lists.
+
+    Args:
+        cache_dir (str): The directory to keep the cache entries in. It is created when needed.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def fingerprint(ddl: str) -> str:
+        """Fingerprint a DDL script and the parser it is parsed with
+
+        Args:
+            ddl (str): The DDL script
+
+        Returns:
+            str: A hex digest that changes whenever the script or the parser version changes
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_FORMAT_VERSION} {parser_version()}\n".encode("utf-8"))
+        digest.update(ddl.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir.joinpath(f"schema-{key}.json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """Load the parsed schema stored under a fingerprint
+
+        Args:
+            key (str): The fingerprint
+
+        Returns:
+            Optional[Dict]: The parsed schema, None if there is none (or it can't be read)
+        """
+        entry = self._entry(key)
+        if not entry.exists():
+            return None
+
+        try:
+            with open(entry, "r", encoding="utf-8") as file_obj:
+                return json.load(file_obj)
+        except (OSError, ValueError) as error:
+            Log.warn(f"Ignoring unreadable schema cache entry {entry}: {error}")
+            return None
+
+    def store(self, key: str, schema: Dict) -> None:
+        """Store a parsed schema under a fingerprint
+
+        Args:
+            key (str): The fingerprint
+            schema (Dict): The parsed schema
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that an interrupted run never leaves a truncated entry behind
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.cache_dir, delete=False) as file_obj:
+            json.dump(schema, file_obj)
+        os.replace(file_obj.name, self._entry(key))
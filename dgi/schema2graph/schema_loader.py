@@ -21,8 +21,11 @@ Schema Loader
 This module is responsible for loading the schema into the GraphDB
 """
 
-from tqdm import tqdm
+from typing import Dict, Iterable, List, Tuple
+
+from neomodel import db, install_labels
 from dgi.models import SQLColumn, SQLTable
+from dgi.utils.batch_writer import DEFAULT_BATCH_SIZE, write_in_batches
 from dgi.utils.logging import Log
 
 
@@ -36,92 +39,292 @@ def remove_all_nodes():
         node.delete()
 
 
-def process_foreign_keys(all_foreign_keys: list):
+# Number of unresolved foreign keys listed in the summary
+MAX_UNRESOLVED_LISTED = 20
+
+
+def find_columns(names: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[Tuple[str, str], int]:
+    """Look up columns that are already in the graph
+
+    Args:
+        names (Iterable[Tuple[str, str]]): The (table, column) names
+        batch_size (int): Number of columns looked up in one statement
+
+    Returns:
+        Dict[Tuple[str, str], int]: (table, column) -> node id, for the columns found
+    """
+    columns = {}
+    write_in_batches(
+        "UNWIND $rows AS row "
+        "MATCH (:SQLTable {name: row.table})-[:CONTAINS]->(c:SQLColumn {name: row.name}) "
+        "RETURN row.table, row.name, id(c)",
+        [{"table": table, "name": name} for table, name in names],
+        batch_size,
+        on_results=lambda results: columns.update(((table, name), node_id) for table, name, node_id in results),
+        progress=False,
+    )
+    return columns
+
+
+def process_foreign_keys(
+    all_foreign_keys: list, columns: Dict[Tuple[str, str], int] = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> None:
     """Processes the foreign key relations into the graph
 
+    Foreign keys are resolved against the index of the columns just loaded. Columns missing from it, e.g., of tables
+    loaded by an earlier run, are looked up in the graph with one batched query. The FOREIGN_KEY edges are then
+    created with one UNWIND statement per batch, and the foreign keys that could not be resolved are logged once.
+
     Args:
-        all_foreign_keys (list): A list of foreign keys from the schema
+        all_foreign_keys (list): A list of foreign keys from the schema, as (table, column, referenced table,
+                                 referenced column)
+        columns (Dict[Tuple[str, str], int]): (table, column) -> node id of the columns loaded
+        batch_size (int): Number of edges written in one statement
     """
     Log.info("Processing foreign keys:")
-    for entry in tqdm(all_foreign_keys, total=len(all_foreign_keys)):
-        my_table_name = entry[0]
-        my_column_name = entry[1]
-        ref_table_name = entry[2]
-        ref_column_name = entry[3]
-        # Log.info(f"Processing foreign key from {my_table_name}.{my_column_name} to {ref_table_name}.{ref_column_name}")
-        my_tab = SQLTable.nodes.get(name=my_table_name)
-        if my_tab:
-            my_col = my_tab.columns.get(name=my_column_name)
-            if my_col:
-                ref_tab = SQLTable.nodes.get(name=ref_table_name)
-                if ref_tab:
-                    ref_col = ref_tab.columns.get(name=ref_column_name)
-                    if ref_col:
-                        # Log.info(f"Connecting {my_tab.name}.{my_col.name} to {ref_tab.name}.{ref_col.name}")
-                        my_col.foreign_key.connect(ref_col)
-                    else:
-                        Log.info(
-                            f"*** Error: Could not find reference column: {ref_column_name}"
-                        )
-                else:
-                    Log.info(
-                        f"*** Error: Could not find reference table: {ref_table_name}"
-                    )
-            else:
-                Log.info(f"*** Error: Could not find self column: {my_column_name}")
+    columns = dict(columns or {})
+    missing = {name for entry in all_foreign_keys for name in (entry[:2], entry[2:]) if name not in columns}
+    if missing:
+        columns.update(find_columns(missing, batch_size))
+
+    edges, unresolved = {}, []
+    for my_table_name, my_column_name, ref_table_name, ref_column_name in all_foreign_keys:
+        start = columns.get((my_table_name, my_column_name))
+        end = columns.get((ref_table_name, ref_column_name))
+        if start is None or end is None:
+            reason = "self column" if start is None else "reference column"
+            unresolved.append(f"{my_table_name}.{my_column_name} -> {ref_table_name}.{ref_column_name} ({reason})")
         else:
-            Log.info(f"*** Error: Could not find self table: {my_table_name}")
+            edges[(start, end)] = {"start": start, "end": end}
 
+    write_in_batches(
+        "UNWIND $rows AS row "
+        "MATCH (s) WHERE id(s) = row.start "
+        "MATCH (e) WHERE id(e) = row.end "
+        "MERGE (s)-[:FOREIGN_KEY]->(e)",
+        list(edges.values()),
+        batch_size,
+    )
 
-def load_graph(result):
-    """Populates the graph from a dictionary"""
-    all_foreign_keys = []
+    if unresolved:
+        Log.warn(
+            f"*** Error: Could not find the columns of {len(unresolved)} of {len(all_foreign_keys)} foreign keys: "
+            + "; ".join(unresolved[:MAX_UNRESOLVED_LISTED])
+            + ("; ..." if len(unresolved) > MAX_UNRESOLVED_LISTED else "")
+        )
 
-    Log.info("Processing schema tables:")
-    for schema in tqdm(result["tables"], total=len(result["tables"])):
-        # Log.info(schema["table_name"])
-        table = SQLTable.nodes.get_or_none(name=schema["table_name"])
-        if table:
-            table.schema = schema["schema"]
-            table.primary_key = schema["primary_key"]
-            table.index = schema["index"]
-            table.save()
-        else:
-            table = SQLTable(
-                name=schema["table_name"],
-                schema=schema["schema"],
-                primary_key=schema["primary_key"],
-                index=schema["index"],
-            ).save()
+
+def schema_rows(result: Dict) -> Tuple[List[Dict], List[Dict], List[Tuple[str, str, str, str]]]:
+    """Flatten a parsed schema into the rows written to the graph
+
+    Args:
+        result (Dict): The schema, as parsed by simple_ddl_parser with group_by_type=True
+
+    Returns:
+        Tuple[List[Dict], List[Dict], List[Tuple[str, str, str, str]]]: The table rows, the column rows (each with
+        the name of its table), and the foreign keys as (table, column, referenced table, referenced column)
+    """
+    tables, columns, foreign_keys = [], [], []
+    for schema in result["tables"]:
+        table_name = schema["table_name"]
+        tables.append(
+            {
+                "name": table_name,
+                "props": SQLTable.deflate(
+                    {"name": table_name, "schema": schema["schema"], "primary_key": schema["primary_key"]}
+                ),
+            }
+        )
         for column in schema["columns"]:
-            name = column["name"]
-            # Log.info(f" - {name}")
-            col = table.columns.get_or_none(name=name)
-            if col:
-                col.datatype = column["type"]
-                if column["name"] in schema["primary_key"]:
-                    col.is_primary = True
-                col.save()
-            else:
-                # col = SQLColumn(name=column["name"], datatype=column["type"], size=column["size"])
-                col = SQLColumn(name=column["name"], datatype=column["type"])
-                if column["name"] in schema["primary_key"]:
-                    col.is_primary = True
-                col.save()
-                table.columns.connect(col)
-
-            # process foreign keys
+            columns.append(
+                {
+                    "table": table_name,
+                    "name": column["name"],
+                    "datatype": column["type"],
+                    "is_primary": column["name"] in schema["primary_key"],
+                }
+            )
             if column["references"]:
-                all_foreign_keys.append(
-                    (
-                        schema["table_name"],
-                        name,
-                        column["references"]["table"],
-                        column["references"]["column"],
-                    )
+                foreign_keys.append(
+                    (table_name, column["name"], column["references"]["table"], column["references"]["column"])
                 )
+    return tables, columns, foreign_keys
+
+
+def _write_tables(tables: List[Dict], batch_size: int) -> None:
+    """Create the tables, or update them in place"""
+    write_in_batches(
+        "UNWIND $rows AS row MERGE (t:SQLTable {name: row.name}) SET t += row.props",
+        tables,
+        batch_size,
+    )
+
+
+def _write_columns(columns: List[Dict], batch_size: int, only_set_primary: bool = True) -> Dict[Tuple[str, str], int]:
+    """Create the columns in their tables, or update them in place
+
+    Args:
+        columns (List[Dict]): The column rows
+        batch_size (int): Number of rows written in one statement
+        only_set_primary (bool): A column that is a primary key stays one, even if it no longer is in the schema
+
+    Returns:
+        Dict[Tuple[str, str], int]: (table, column) -> node id of the columns written
+    """
+    is_primary = "coalesce(c.is_primary, false) OR row.is_primary" if only_set_primary else "row.is_primary"
+    column_ids = {}
+    write_in_batches(
+        "UNWIND $rows AS row "
+        "MATCH (t:SQLTable {name: row.table}) "
+        "MERGE (t)-[:CONTAINS]->(c:SQLColumn {name: row.name}) "
+        f"SET c.datatype = row.datatype, c.is_primary = {is_primary} "
+        "RETURN row.table, row.name, id(c)",
+        columns,
+        batch_size,
+        on_results=lambda results: column_ids.update(((table, name), node_id) for table, name, node_id in results),
+    )
+    return column_ids
+
+
+def load_graph(result: Dict, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """Populates the graph from a dictionary
+
+    Tables and columns are written with a few batched UNWIND/MERGE statements. Tables that are already in the graph
+    are updated in place, and so are their columns: the data type is overwritten and a column only ever becomes a
+    primary key. Columns are told apart by their table, so two tables may have columns of the same name.
+
+    Args:
+        result (Dict): The schema, as parsed by simple_ddl_parser with group_by_type=True
+        batch_size (int): Number of rows written in one statement
+    """
+    tables, columns, all_foreign_keys = schema_rows(result)
+
+    # Index the table names so that the batched MERGE statements don't scan all tables
+    install_labels(SQLTable)
+
+    Log.info("Processing schema tables:")
+    _write_tables(tables, batch_size)
+
+    # Remember the node of every column so that the foreign keys don't have to look them up
+    Log.info("Processing schema columns:")
+    column_ids = _write_columns(columns, batch_size)
 
     if len(all_foreign_keys) > 0:
-        process_foreign_keys(all_foreign_keys)
+        process_foreign_keys(all_foreign_keys, column_ids, batch_size)
     else:
         Log.warn("No foreign key relationships found.")
+
+
+def read_graph() -> Tuple[Dict[str, Dict], Dict[Tuple[str, str], Dict], Dict[Tuple[str, str, str, str], int]]:
+    """Read the tables, columns and foreign keys that are in the graph, with one query each
+
+    Returns:
+        Tuple[Dict[str, Dict], Dict[Tuple[str, str], Dict], Dict[Tuple[str, str, str, str], int]]: The properties of
+        every table by name, the properties and node id (as "id") of every column by (table, column), and the
+        relationship id of every foreign key by (table, column, referenced table, referenced column)
+    """
+    results, _ = db.cypher_query("MATCH (t:SQLTable) RETURN t.name, t.schema, t.primary_key")
+    tables = {name: {"name": name, "schema": schema, "primary_key": primary_key} for name, schema, primary_key in results}
+
+    results, _ = db.cypher_query(
+        "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn) RETURN t.name, c.name, id(c), c.datatype, c.is_primary"
+    )
+    columns = {
+        (table, name): {"id": node_id, "datatype": datatype, "is_primary": bool(is_primary)}
+        for table, name, node_id, datatype, is_primary in results
+    }
+
+    results, _ = db.cypher_query(
+        "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn)-[r:FOREIGN_KEY]->(rc:SQLColumn)<-[:CONTAINS]-(rt:SQLTable) "
+        "RETURN t.name, c.name, rt.name, rc.name, id(r)"
+    )
+    foreign_keys = {tuple(row[:4]): row[4] for row in results}
+    return tables, columns, foreign_keys
+
+
+def diff_graph(result: Dict, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:  # pylint: disable=too-many-locals
+    """Bring the graph in line with a schema by writing only what changed
+
+    The tables, columns and foreign keys in the graph are read in bulk and compared with the schema. Tables and
+    columns that are new or changed are written, those that are no longer in the schema are deleted along with
+    their edges, and foreign keys are added and removed. Unlike `load_graph`, a column that is no longer a primary
+    key stops being one.
+
+    Only tables with columns are deleted: tables without any were not loaded from a schema but created by tx2g for
+    the tables its transactions touch, and are left alone along with their transaction edges.
+
+    Args:
+        result (Dict): The schema, as parsed by simple_ddl_parser with group_by_type=True
+        batch_size (int): Number of rows written in one statement
+
+    Returns:
+        Dict[str, int]: The number of tables, columns and foreign keys added, changed and removed
+    """
+    tables, columns, all_foreign_keys = schema_rows(result)
+    tables = {row["name"]: row for row in tables}
+    columns = {(row["table"], row["name"]): row for row in columns}
+    all_foreign_keys = set(all_foreign_keys)
+    graph_tables, graph_columns, graph_foreign_keys = read_graph()
+
+    changed_tables = [
+        row for name, row in tables.items() if name in graph_tables and row["props"] != graph_tables[name]
+    ]
+    added_tables = [row for name, row in tables.items() if name not in graph_tables]
+    schema_tables = {table for table, _ in graph_columns}
+    removed_tables = [name for name in graph_tables if name not in tables and name in schema_tables]
+    changed_columns = [
+        row for key, row in columns.items()
+        if key in graph_columns
+        and (row["datatype"], row["is_primary"]) != (graph_columns[key]["datatype"], graph_columns[key]["is_primary"])
+    ]
+    added_columns = [row for key, row in columns.items() if key not in graph_columns]
+    # The columns of removed tables go with their tables
+    removed_columns = [key for key in graph_columns if key not in columns and key[0] in tables]
+    added_foreign_keys = [key for key in all_foreign_keys if key not in graph_foreign_keys]
+    removed_foreign_keys = [
+        key for key in graph_foreign_keys
+        if key not in all_foreign_keys and key[:2] in columns and key[2:] in columns
+    ]
+
+    # Delete first: the ids read above can't have been reused by anything created since
+    write_in_batches(
+        "UNWIND $rows AS row MATCH ()-[r:FOREIGN_KEY]->() WHERE id(r) = row.id DELETE r",
+        [{"id": graph_foreign_keys[key]} for key in removed_foreign_keys],
+        batch_size,
+        progress=False,
+    )
+    write_in_batches(
+        "UNWIND $rows AS row MATCH (c:SQLColumn) WHERE id(c) = row.id DETACH DELETE c",
+        [{"id": graph_columns[key]["id"]} for key in removed_columns],
+        batch_size,
+        progress=False,
+    )
+    write_in_batches(
+        "UNWIND $rows AS row "
+        "MATCH (t:SQLTable {name: row.name}) "
+        "OPTIONAL MATCH (t)-[:CONTAINS]->(c:SQLColumn) "
+        "DETACH DELETE c, t",
+        [{"name": name} for name in removed_tables],
+        batch_size,
+        progress=False,
+    )
+
+    install_labels(SQLTable)
+    _write_tables(added_tables + changed_tables, batch_size)
+    column_ids = {key: column["id"] for key, column in graph_columns.items() if key in columns}
+    column_ids.update(_write_columns(added_columns + changed_columns, batch_size, only_set_primary=False))
+    if added_foreign_keys:
+        process_foreign_keys(sorted(added_foreign_keys), column_ids, batch_size)
+
+    summary = {
+        "tables_added": len(added_tables),
+        "tables_changed": len(changed_tables),
+        "tables_removed": len(removed_tables),
+        "columns_added": len(added_columns),
+        "columns_changed": len(changed_columns),
+        "columns_removed": len(removed_columns),
+        "foreign_keys_added": len(added_foreign_keys),
+        "foreign_keys_removed": len(removed_foreign_keys),
+    }
+    Log.info("Schema diff: " + ", ".join(f"{count} {kind.replace('_', ' ')}" for kind, count in summary.items()))
+    return summary
@@ -3,6 +3,7 @@ Transaction 2 Graph Module
 """
 
 from .class_transaction_loader import ClassTransactionLoader
+from .full_transaction_loader import FullTransactionLoader
 from .method_transaction_loader import MethodTransactionLoader
 
-__all__ = ["ClassTransactionLoader", "MethodTransactionLoader"]
+__all__ = ["ClassTransactionLoader", "FullTransactionLoader", "MethodTransactionLoader"]
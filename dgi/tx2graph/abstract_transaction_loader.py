@@ -21,19 +21,85 @@ Abstract Transaction Loader Module
 import re
 
 import json
-from collections import OrderedDict
+import time
+from collections import OrderedDict, deque
 from abc import ABC, abstractmethod
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 import yaml
 from tqdm import tqdm
-from neomodel import db
-from neomodel import StructuredNode
+from neomodel import db, install_labels
+from neomodel import StructuredNode, StructuredRel
+from dgi.models import SQLTable
+from dgi.utils.batch_writer import DEFAULT_BATCH_SIZE, write_in_batches
 from dgi.utils.logging import Log
-from dgi.tx2graph.utils import sqlexp
-
-
-class AbstractTransactionLoader(ABC):
-    """ABC for tx2graph"""
+from dgi.tx2graph.utils import (
+    ParseBudget,
+    ParseBudgetExceeded,
+    RWSetCache,
+    SlowQueryLog,
+    iter_json_array,
+    scan_rwset,
+    simple_rwset,
+    sqlexp,
+)
+
+# Number of DiVA entries sent to a worker process at a time
+ENTRIES_PER_TASK = 32
+# Time the SQL grammar is given for one statement before the statement is scanned for table names instead
+DEFAULT_PARSE_SECONDS = 5.0
+
+yaml.add_representer(
+    OrderedDict,
+    lambda dumper, data: dumper.represent_mapping("tag:yaml.org,2002:map", list(data.items())),
+)
+
+
+class AbstractTransactionLoader(ABC):  # pylint: disable=too-many-instance-attributes
+    """ABC for tx2graph
+
+    Nodes and edges are not written while the transactions are processed. They are queued, and every `batch_size`
+    edges they are sent to Neo4j as a handful of UNWIND/MERGE statements. Like before, an edge is only created if
+    there is no edge of that type between its nodes yet, and the first node or edge queued sets its properties.
+
+    The read and write sets of SQL statements are kept in a `RWSetCache`, so that every distinct statement is
+    parsed once. With more than one worker, the entries are analyzed by a pool of processes and handed back, in
+    order, to this process which alone writes to the graph.
+
+    A statement that takes the SQL grammar longer than the parse budget allows, or that nests deeper than Python
+    recurses, is scanned for table names by `scan_rwset` instead. The parse times are recorded in a `SlowQueryLog`.
+
+    Args:
+        batch_size (int): Number of queued edges that triggers a write, and number of rows in one statement
+        rwset_cache (RWSetCache): The read/write set cache, a new one of the default size when not given
+        workers (int): Number of processes analyzing the transactions
+        parse_budget (ParseBudget): Limits on the parse of one statement, `DEFAULT_PARSE_SECONDS` when not given
+        slow_queries (SlowQueryLog): The log of the slowest statements, a new one when not given
+    """
+
+    # The program node model and the property that identifies a node. Set by the implementing loaders.
+    node_model: StructuredNode = None
+    node_key: str = None
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        rwset_cache: RWSetCache = None,
+        workers: int = 1,
+        parse_budget: ParseBudget = None,
+        slow_queries: SlowQueryLog = None,
+    ) -> None:
+        self.batch_size = batch_size
+        self.rwset_cache = RWSetCache() if rwset_cache is None else rwset_cache
+        self.workers = workers
+        self.parse_budget = ParseBudget(DEFAULT_PARSE_SECONDS) if parse_budget is None else parse_budget
+        self.slow_queries = SlowQueryLog() if slow_queries is None else slow_queries
+        self._pending_nodes = {}
+        self._pending_edges = {}
+        self._num_pending_edges = 0
+        self._seen_nodes = set()
+        self._seen_edges = set()
 
     @staticmethod
     def _consume_and_process_label(label: str) -> Dict:
@@ -100,10 +166,31 @@ class AbstractTransactionLoader(ABC):
 
     def crud(self, sql):
         """First stage CRUD"""
-        resp = sqlexp(sql.lower())  # pylint: disable=not-callable
-        if resp:
-            return self.crud0(resp[1])
-        return [set(), set()]
+        sql = RWSetCache.normalize(sql)
+        rwset = self.rwset_cache.get(sql)
+        if rwset is not None:
+            return rwset
+
+        # Single table statements don't need the full grammar
+        rwset, exact = simple_rwset(sql), True
+        if rwset is None:
+            rwset, exact = self._parse_rwset(sql)
+        # Scanned read and write sets are reused for the rest of the run, but not saved for the next one
+        self.rwset_cache.put(sql, rwset, persist=exact)
+        return rwset
+
+    def _parse_rwset(self, sql: str) -> Tuple[List[Set[str]], bool]:
+        """The read and write sets of a statement according to the SQL grammar, or to `scan_rwset` when the grammar
+        goes over the parse budget or nests too deep, and whether they came from the grammar"""
+        start = time.perf_counter()
+        try:
+            resp = sqlexp(sql, self.parse_budget)
+        except (ParseBudgetExceeded, RecursionError):
+            self.slow_queries.record(sql, time.perf_counter() - start, over_budget=True)
+            return scan_rwset(sql), False
+
+        self.slow_queries.record(sql, time.perf_counter() - start)
+        return (self.crud0(resp[1]) if resp else [set(), set()]), True
 
     def analyze(self, txn_set):
         """Analyze the transaction set"""
@@ -128,21 +215,99 @@ class AbstractTransactionLoader(ABC):
                     stack[-1][1] |= write_set
         return txn_set
 
-    @abstractmethod
-    def find_or_create_program_node(self, method_signature: str) -> StructuredNode:
-        """Create an node pertaining to a program feature like class, method, etc.
+    def _edge_ends(self, rel_type: str) -> Tuple[Tuple[StructuredNode, str], Tuple[StructuredNode, str]]:
+        """The node models (and their key properties) at the start and the end of an edge type"""
+        program, table = (self.node_model, self.node_key), (SQLTable, "name")
+        return {
+            "TRANSACTION_READ": (table, program),
+            "TRANSACTION_WRITE": (program, table),
+            "TRANSACTIONAL_TRACE": (program, program),
+        }[rel_type]
+
+    def _register_node(self, model: StructuredNode, key_prop: str, key: str, properties: Dict) -> str:
+        """Queue a node to be created if it doesn't exist yet
+
+        Args:
+            model (StructuredNode): The node model
+            key_prop (str): The property that identifies the node
+            key (str): The value of that property
+            properties (Dict): The node properties used if the node has to be created
+
+        Returns:
+            str: The node key
+        """
+        if (model.__label__, key) not in self._seen_nodes:
+            self._seen_nodes.add((model.__label__, key))
+            self._pending_nodes.setdefault((model, key_prop), {})[key] = model.deflate(properties, skip_empty=True)
+        return key
+
+    def _register_edge(self, rel_type: str, rel_model: StructuredRel, start: str, end: str, properties: Dict) -> None:
+        """Queue an edge to be created if there is no edge of this type between its nodes yet
 
         Args:
-            method_signature (_type_): The full method method signature
+            rel_type (str): The relationship type, e.g., TRANSACTION_READ
+            rel_model (StructuredRel): The relationship model, used to serialize the properties like neomodel does
+            start (str): Key of the start node
+            end (str): Key of the end node
+            properties (Dict): The edge properties used if the edge has to be created
         """
+        if (rel_type, start, end) in self._seen_edges:
+            return
+
+        self._seen_edges.add((rel_type, start, end))
+        self._pending_edges.setdefault(rel_type, {})[(start, end)] = rel_model.deflate(properties, skip_empty=True)
+        self._num_pending_edges += 1
+        if self._num_pending_edges >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all queued nodes, then all queued edges"""
+        for (model, key_prop), nodes in self._pending_nodes.items():
+            query = (
+                "UNWIND $rows AS row "
+                f"MERGE (n:{model.__label__} {{{key_prop}: row.key}}) "
+                "ON CREATE SET n += row.props"
+            )
+            rows = [{"key": key, "props": props} for key, props in nodes.items()]
+            write_in_batches(query, rows, self.batch_size, progress=False)
+
+        for rel_type, edges in self._pending_edges.items():
+            (start_model, start_key), (end_model, end_key) = self._edge_ends(rel_type)
+            query = (
+                "UNWIND $rows AS row "
+                f"MATCH (s:{start_model.__label__} {{{start_key}: row.start}}) "
+                f"MATCH (e:{end_model.__label__} {{{end_key}: row.end}}) "
+                f"MERGE (s)-[r:{rel_type}]->(e) "
+                "ON CREATE SET r += row.props"
+            )
+            rows = [{"start": start, "end": end, "props": props} for (start, end), props in edges.items()]
+            write_in_batches(query, rows, self.batch_size, progress=False)
+
+        self._pending_nodes = {}
+        self._pending_edges = {}
+        self._num_pending_edges = 0
 
     @abstractmethod
-    def find_or_create_sql_table_node(self, table_name: str) -> StructuredNode:
-        """Create an nodes pertaining to a SQL Table.
+    def register_program_node(self, method_signature: str) -> str:
+        """Queue a node pertaining to a program feature like class, method, etc.
+
+        Args:
+            method_signature (str): The full method method signature
+
+        Returns:
+            str: The node key
+        """
+
+    def register_sql_table_node(self, table_name: str) -> str:
+        """Queue a node pertaining to a SQL Table.
 
         Args:
             table_name (str): The name of the table
+
+        Returns:
+            str: The node key
         """
+        return self._register_node(SQLTable, "name", table_name, {"name": table_name})
 
     @abstractmethod
     def populate_transaction_read(
@@ -231,28 +396,153 @@ class AbstractTransactionLoader(ABC):
                     label, txid, read, write, each_transaction, action
                 )
 
-    def load_transactions(self, input_file, clear, force_clear=False):
-        """Load transactions data"""
+    def read_transactions(self, input_file) -> Iterator[Tuple[list, str]]:
+        """Read the DiVA entries and analyze their transactions
 
-        yaml.add_representer(
-            OrderedDict,
-            lambda dumper, data: dumper.represent_mapping(
-                "tag:yaml.org,2002:map", list(data.items())
-            ),
-        )
-        # pylint: disable=consider-using-with,unspecified-encoding
-        data = json.load(open(input_file), object_pairs_hook=OrderedDict)
+        Args:
+            input_file (str): The DiVA transaction JSON file
 
+        Yields:
+            Tuple[list, str]: The analyzed transactions of an entry and the label of the entry
+        """
+        # The entries are decoded one at a time, so that large captures don't have to fit in memory
+        with open(input_file, "r", encoding="utf-8") as file_obj:
+            entries = iter_json_array(file_obj, object_pairs_hook=OrderedDict)
+            yield from tqdm(self._analyze_entries(entries), unit=" entries")
+
+    def analyze_entry(self, entry: Dict) -> Tuple[list, str]:
+        """Analyze the transactions of a DiVA entry
+
+        Args:
+            entry (Dict): The DiVA entry, its transactions are removed
+
+        Returns:
+            Tuple[list, str]: The analyzed transactions of the entry and the label of the entry
+        """
+        txn_set = self.analyze(entry["transactions"])
+        del entry["transactions"]
+        label = yaml.dump(entry, default_flow_style=True).strip()
+        return txn_set, label
+
+    def _analyze_entries(self, entries: Iterable[Dict]) -> Iterator[Tuple[list, str]]:
+        """Analyze DiVA entries, in this process or across a pool of `workers` processes
+
+        Entries are sent to the pool `ENTRIES_PER_TASK` at a time, and no more than two tasks per worker are in flight,
+        so that a large capture is never read far ahead of the graph writes. The statements the workers parse are
+        added to the read/write set cache of this process.
+
+        Args:
+            entries (Iterable[Dict]): The DiVA entries
+
+        Yields:
+            Tuple[list, str]: The analyzed transactions and the label of every entry, in order
+        """
+        if self.workers < 2:
+            yield from map(self.analyze_entry, entries)
+            return
+
+        entries = iter(entries)
+        tasks = iter(lambda: list(islice(entries, ENTRIES_PER_TASK)), [])
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(type(self), self.rwset_cache, self.parse_budget),
+        ) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_analyze_in_worker, task))
+                if len(pending) >= 2 * self.workers:
+                    yield from self._merge_worker_results(*pending.popleft().result())
+            while pending:
+                yield from self._merge_worker_results(*pending.popleft().result())
+
+    def _merge_worker_results(
+        self, analyzed: List[Tuple[list, str]], added: Dict, hits: int, misses: int, slow_queries: SlowQueryLog
+    ) -> List[Tuple[list, str]]:
+        """Add what a worker learned about SQL statements to the read/write set cache and the slow query log, and
+        return its entries"""
+        for sql, (rwset, persist) in added.items():
+            self.rwset_cache.put(sql, rwset, persist)
+        self.rwset_cache.hits += hits
+        self.rwset_cache.misses += misses
+        self.slow_queries.merge(slow_queries)
+        return analyzed
+
+    def prepare_graph(self, clear: bool, force_clear: bool = False) -> None:
+        """Get the graph ready for new nodes and edges
+
+        Args:
+            clear (bool): Delete the SQL nodes that are already in the graph
+            force_clear (bool): Delete all nodes that are already in the graph
+        """
         # --------------------------
         # Remove all existing nodes?
         # --------------------------
         if clear:
             self._clear_all_nodes(force_clear)
+        self._seen_nodes.clear()
+        self._seen_edges.clear()
+
+        # Index the node keys so that the batched MERGE statements don't scan all nodes
+        install_labels(self.node_model)
+        install_labels(SQLTable)
+
+    def load_transactions(self, input_file, clear, force_clear=False):
+        """Load transactions data"""
+        self.prepare_graph(clear, force_clear)
 
         Log.info(f"{type(self).__name__}: Populating transactions")
 
-        for _, entry in tqdm(enumerate(data), total=len(data)):
-            txn_set = self.analyze(entry["transactions"])
-            del entry["transactions"]
-            label = yaml.dump(entry, default_flow_style=True).strip()
+        for txn_set, label in self.read_transactions(input_file):
             self.tx2neo4j(txn_set, label)
+
+        self.flush()
+        self.log_summary()
+
+    def log_summary(self) -> None:
+        """Log how well the read/write set cache and the SQL grammar did"""
+        Log.info(f"SQL read/write set cache: {self.rwset_cache.hits} hits, {self.rwset_cache.misses} misses")
+        Log.info(
+            f"SQL grammar: {self.slow_queries.parsed} statements in {self.slow_queries.seconds:.1f}s, "
+            f"{len(self.slow_queries.over_budget)} over budget"
+        )
+        if self.slow_queries.over_budget:
+            Log.warn(
+                f"{len(self.slow_queries.over_budget)} SQL statements took too long to parse, their tables were "
+                "found by a simple scan and may be incomplete"
+            )
+
+
+# The loader analyzing entries in a worker process
+_worker_loader: AbstractTransactionLoader = None  # pylint: disable=invalid-name
+
+
+def _init_worker(loader_type: type, rwset_cache: RWSetCache, parse_budget: ParseBudget) -> None:
+    """Set up a worker process with a copy of the read/write set cache of the main process
+
+    Args:
+        loader_type (type): The type of the loader that started the pool
+        rwset_cache (RWSetCache): The read/write set cache of that loader
+        parse_budget (ParseBudget): The parse budget of that loader
+    """
+    global _worker_loader  # pylint: disable=global-statement
+    rwset_cache.hits = rwset_cache.misses = 0
+    _worker_loader = loader_type(rwset_cache=rwset_cache, parse_budget=parse_budget)
+
+
+def _analyze_in_worker(entries: List[Dict]) -> Tuple[List[Tuple[list, str]], Dict, int, int, SlowQueryLog]:
+    """Analyze DiVA entries in a worker process
+
+    Args:
+        entries (List[Dict]): The DiVA entries
+
+    Returns:
+        Tuple[List[Tuple[list, str]], Dict, int, int, SlowQueryLog]: The analyzed transactions and the label of every
+        entry, the statements parsed for them with their read and write sets, the cache hits and misses, and the
+        parse times
+    """
+    rwset_cache = _worker_loader.rwset_cache
+    rwset_cache.added, rwset_cache.hits, rwset_cache.misses = {}, 0, 0
+    _worker_loader.slow_queries.clear()
+    analyzed = [_worker_loader.analyze_entry(entry) for entry in entries]
+    return analyzed, rwset_cache.added, rwset_cache.hits, rwset_cache.misses, _worker_loader.slow_queries
@@ -19,69 +19,66 @@ Class Transaction Loader Module
 """
 
 import re
-from neomodel import DoesNotExist
 
 from dgi.tx2graph.abstract_transaction_loader import AbstractTransactionLoader
 
 # Import our modules
-from dgi.models import ClassNode, SQLTable
+from dgi.models import ClassNode
+from dgi.models.relationships import TransactionRead, TransactionWrite
 
 
 class ClassTransactionLoader(AbstractTransactionLoader):
     """Transaction edges between classes and DBTables
     """
-    def find_or_create_program_node(self, method_signature):
+
+    node_model = ClassNode
+    node_key = "node_short_name"
+
+    def register_program_node(self, method_signature):
         class_short_name = method_signature.split(".")[-2]
         class_name = ".".join(method_signature.split(".")[:-1])
-        try:
-            node = ClassNode.nodes.get(node_short_name=class_short_name)
-        except DoesNotExist:
-            node = ClassNode(
-                node_class=class_name, node_short_name=class_short_name
-            ).save()
-        return node
-
-    def find_or_create_sql_table_node(self, table_name):
-        try:
-            node = SQLTable.nodes.get(name=table_name)
-        except DoesNotExist:
-            node = SQLTable(name=table_name).save()
-
-        return node
+        return self._register_node(
+            ClassNode,
+            "node_short_name",
+            class_short_name,
+            {"node_class": class_name, "node_short_name": class_short_name},
+        )
 
     def populate_transaction_read(
         self, method_signature, txid, table, action, the_sql_query
     ) -> None:
-        class_node = self.find_or_create_program_node(method_signature)
-        table_node = self.find_or_create_sql_table_node(table)
-        rel = class_node.transaction_read.relationship(table_node)
-        if not rel:
-            class_node.transaction_read.connect(
-                table_node,
-                {
-                    "txid": txid,
-                    "tx_meth": method_signature.split(".")[-1],
-                    "action": action,
-                    "sql_query": the_sql_query,
-                },
-            )
+        class_node = self.register_program_node(method_signature)
+        table_node = self.register_sql_table_node(table)
+        self._register_edge(
+            "TRANSACTION_READ",
+            TransactionRead,
+            table_node,
+            class_node,
+            {
+                "txid": txid,
+                "tx_meth": method_signature.split(".")[-1],
+                "action": action,
+                "sql_query": the_sql_query,
+            },
+        )
 
     def populate_transaction_write(
         self, method_signature, txid, table, action, the_sql_query
     ):
-        class_node = self.find_or_create_program_node(method_signature)
-        table_node = self.find_or_create_sql_table_node(table)
-        rel = class_node.transaction_write.relationship(table_node)
-        if not rel:
-            class_node.transaction_write.connect(
-                table_node,
-                {
-                    "txid": txid,
-                    "tx_meth": method_signature.split(".")[-1],
-                    "action": action,
-                    "sql_query": the_sql_query,
-                },
-            )
+        class_node = self.register_program_node(method_signature)
+        table_node = self.register_sql_table_node(table)
+        self._register_edge(
+            "TRANSACTION_WRITE",
+            TransactionWrite,
+            class_node,
+            table_node,
+            {
+                "txid": txid,
+                "tx_meth": method_signature.split(".")[-1],
+                "action": action,
+                "sql_query": the_sql_query,
+            },
+        )
 
     def populate_transaction_callgraph(
         self, callstack: dict, tx_id: int, entrypoint: str
@@ -0,0 +1,73 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Full Transaction Loader Module
+"""
+
+from dgi.tx2graph.class_transaction_loader import ClassTransactionLoader
+from dgi.tx2graph.method_transaction_loader import MethodTransactionLoader
+from dgi.tx2graph.utils import ParseBudget, RWSetCache, SlowQueryLog
+from dgi.utils.batch_writer import DEFAULT_BATCH_SIZE
+from dgi.utils.logging import Log
+
+
+# pylint: disable=too-few-public-methods
+class FullTransactionLoader:
+    """Transaction edges at both the class and the method level
+
+    The DiVA entries are read, and their SQL statements parsed and analyzed, once. Every analyzed entry is then
+    handed to a class and a method level loader.
+
+    Args:
+        batch_size (int): Number of queued edges that triggers a write, and number of rows in one statement
+        rwset_cache (RWSetCache): The read/write set cache, a new one of the default size when not given
+        workers (int): Number of processes analyzing the transactions
+        parse_budget (ParseBudget): Limits on the parse of one statement, the loaders' default when not given
+        slow_queries (SlowQueryLog): The log of the slowest statements, a new one when not given
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        rwset_cache: RWSetCache = None,
+        workers: int = 1,
+        parse_budget: ParseBudget = None,
+        slow_queries: SlowQueryLog = None,
+    ) -> None:
+        rwset_cache = RWSetCache() if rwset_cache is None else rwset_cache
+        slow_queries = SlowQueryLog() if slow_queries is None else slow_queries
+        self.loaders = [
+            ClassTransactionLoader(batch_size, rwset_cache, workers, parse_budget, slow_queries),
+            MethodTransactionLoader(batch_size, rwset_cache, workers, parse_budget, slow_queries),
+        ]
+
+    def load_transactions(self, input_file, clear, force_clear=False):
+        """Load transactions data"""
+        # Both loaders clear the same SQL nodes, so clear them only once
+        self.loaders[0].prepare_graph(clear, force_clear)
+        for loader in self.loaders[1:]:
+            loader.prepare_graph(clear=False)
+
+        Log.info(f"{type(self).__name__}: Populating transactions")
+
+        for txn_set, label in self.loaders[0].read_transactions(input_file):
+            for loader in self.loaders:
+                loader.tx2neo4j(txn_set, label)
+
+        for loader in self.loaders:
+            loader.flush()
+        self.loaders[0].log_summary()
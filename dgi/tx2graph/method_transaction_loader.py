@@ -20,10 +20,9 @@ Method Transaction Loader Module
 
 import re
 
-from neomodel import DoesNotExist
-
 # Import our modules
-from dgi.models import SQLTable, MethodNode
+from dgi.models import MethodNode
+from dgi.models.relationships import TransactionCallTrace, TransactionRead, TransactionWrite
 from dgi.tx2graph.abstract_transaction_loader import AbstractTransactionLoader
 
 
@@ -31,66 +30,62 @@ class MethodTransactionLoader(AbstractTransactionLoader):
     """CRUD operation at a method level.
     """
 
-    def find_or_create_program_node(self, method_signature: str, is_entrypoint=False) -> MethodNode:
+    node_model = MethodNode
+    node_key = "node_method"
+
+    def register_program_node(self, method_signature: str, is_entrypoint=False) -> str:
         method_name = method_signature.split(".")[-1]
         class_short_name = method_signature.split(".")[-2]
         class_name = ".".join(method_signature.split(".")[:-1])
 
-        try:
-            node = MethodNode.nodes.get(node_method=method_signature)
-        except DoesNotExist:
-            node = MethodNode(
-                node_method=method_signature,
-                node_class=class_name,
-                node_class_name=class_short_name,
-                node_name=method_name,
-                node_short_name=class_short_name,
-                node_is_tx_entry=is_entrypoint,
-            ).save()
-
-        return node
-
-    def find_or_create_sql_table_node(self, table_name) -> SQLTable:
-        try:
-            node = SQLTable.nodes.get(name=table_name)
-        except DoesNotExist:
-            node = SQLTable(name=table_name).save()
-
-        return node
+        return self._register_node(
+            MethodNode,
+            "node_method",
+            method_signature,
+            {
+                "node_method": method_signature,
+                "node_class": class_name,
+                "node_class_name": class_short_name,
+                "node_name": method_name,
+                "node_is_tx_entry": is_entrypoint,
+            },
+        )
 
     def populate_transaction_read(
         self, method_signature, txid, table, action, the_sql_query
     ) -> None:
-        method_node = self.find_or_create_program_node(method_signature)
-        table_node = self.find_or_create_sql_table_node(table)
-        rel = method_node.transaction_read.relationship(table_node)
-        if not rel:
-            method_node.transaction_read.connect(
-                table_node,
-                {
-                    "txid": txid,
-                    "tx_meth": method_signature.split(".")[-1],
-                    "action": action,
-                    "sql_query": the_sql_query,
-                },
-            )
+        method_node = self.register_program_node(method_signature)
+        table_node = self.register_sql_table_node(table)
+        self._register_edge(
+            "TRANSACTION_READ",
+            TransactionRead,
+            table_node,
+            method_node,
+            {
+                "txid": txid,
+                "tx_meth": method_signature.split(".")[-1],
+                "action": action,
+                "sql_query": the_sql_query,
+            },
+        )
 
     def populate_transaction_write(
         self, method_signature, txid, table, action, the_sql_query
     ):
-        method_node = self.find_or_create_program_node(method_signature)
-        table_node = self.find_or_create_sql_table_node(table)
-        rel = method_node.transaction_write.relationship(table_node)
-        if not rel:
-            method_node.transaction_write.connect(
-                table_node,
-                {
-                    "txid": txid,
-                    "tx_meth": method_signature.split(".")[-1],
-                    "action": action,
-                    "sql_query": the_sql_query,
-                },
-            )
+        method_node = self.register_program_node(method_signature)
+        table_node = self.register_sql_table_node(table)
+        self._register_edge(
+            "TRANSACTION_WRITE",
+            TransactionWrite,
+            method_node,
+            table_node,
+            {
+                "txid": txid,
+                "tx_meth": method_signature.split(".")[-1],
+                "action": action,
+                "sql_query": the_sql_query,
+            },
+        )
 
     def populate_transaction_callgraph(
             self, callstack: dict, tx_id: int, entrypoint: str) -> None:
@@ -102,7 +97,7 @@ class MethodTransactionLoader(AbstractTransactionLoader):
             entrypoint (str): The entrypoint that initiated this transaction.
         """
         # Create a method node for this entrypoint
-        self.find_or_create_program_node(entrypoint, is_entrypoint=True)
+        self.register_program_node(entrypoint, is_entrypoint=True)
 
         # Iterate over all the calls in the callstack and build the callgraph.
         for prev_call, next_call in zip(callstack[:-1], callstack[1:]):
@@ -112,18 +107,20 @@ class MethodTransactionLoader(AbstractTransactionLoader):
             # Likewise, we process the method signature as well.
             method_name_prev = prev_call["method"].split(", ")[2].split("(")[0]
             method_signature_prev = ".".join([class_name_prev, method_name_prev])
-            prev_node = self.find_or_create_program_node(method_signature_prev)
+            prev_node = self.register_program_node(method_signature_prev)
 
             class_name_next = re.sub("/", ".", next_call["method"].split(", ")[1][1:])
             method_name_next = next_call["method"].split(", ")[2].split("(")[0]
             method_signature_next = ".".join([class_name_next, method_name_next])
-            next_node = self.find_or_create_program_node(method_signature_next)
-
-            rel = prev_node.transaction_method_call.relationship(next_node)
-            if not rel:
-                prev_node.transaction_method_call.connect(
-                    next_node, {"txid": tx_id, "service_entry": entrypoint}
-                )
+            next_node = self.register_program_node(method_signature_next)
+
+            self._register_edge(
+                "TRANSACTIONAL_TRACE",
+                TransactionCallTrace,
+                prev_node,
+                next_node,
+                {"txid": tx_id, "service_entry": entrypoint},
+            )
 
     def populate_transaction(
         self,
@@ -1,6 +1,14 @@
 """
 Utilities Package
 """
+from .json_stream import iter_json_array
+from .peg import ParseBudget, ParseBudgetExceeded
+from .rwset_cache import RWSetCache
+from .simple_sql import scan_rwset, simple_rwset
+from .slow_queries import SlowQueryLog
 from .sqlparse import sqlexp
 
-__all__ = ['sqlexp']
+__all__ = [
+    'iter_json_array', 'ParseBudget', 'ParseBudgetExceeded', 'RWSetCache', 'scan_rwset', 'simple_rwset',
+    'SlowQueryLog', 'sqlexp'
+]
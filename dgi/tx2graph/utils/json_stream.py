@@ -0,0 +1,116 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+JSON Stream Module
+
+Reads the entries of a top-level JSON array one at a time, so that a DiVA capture never has to fit in memory.
+"""
+
+import json
+from typing import Any, Callable, Iterator, Optional, TextIO, Tuple
+
+DEFAULT_READ_SIZE = 1 << 16
+
+
+def iter_json_array(
+    file_obj: TextIO, object_pairs_hook: Callable = None, read_size: int = DEFAULT_READ_SIZE
+) -> Iterator[Any]:
+    """Decode the entries of the JSON array in a file one at a time
+
+    Only the entry being decoded is kept in memory, along with at most one read of text past it.
+
+    Args:
+        file_obj (TextIO): A file holding a JSON array
+        object_pairs_hook (Callable): Passed on to the JSON decoder, e.g., OrderedDict
+        read_size (int): Number of characters read from the file at a time
+
+    Yields:
+        Any: The next entry of the array
+
+    Raises:
+        json.JSONDecodeError: If the file does not hold a valid JSON array
+    """
+    return iter(_ArrayReader(file_obj, object_pairs_hook, read_size))
+
+
+class _ArrayReader:  # pylint: disable=too-few-public-methods
+    """Reads the entries of the JSON array in a file, keeping a buffer of the text not decoded yet"""
+
+    def __init__(self, file_obj: TextIO, object_pairs_hook: Callable, read_size: int) -> None:
+        self.file_obj = file_obj
+        self.decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+        self.read_size = read_size
+        self.buffer, self.pos, self.eof = "", 0, False
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("[", "Expecting '['")
+        if self._next_char() == "]":
+            return
+
+        while True:
+            yield self._decode()
+            if self._next_char() == "]":
+                return
+            self._expect(",", "Expecting ',' delimiter")
+
+    def _read(self, size: int) -> None:
+        """Drop the text decoded so far and read more"""
+        chunk = self.file_obj.read(size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _next_char(self) -> str:
+        """Skip whitespace and return the next character, an empty string at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._read(self.read_size)
+
+    def _expect(self, char: str, message: str) -> None:
+        """Skip whitespace and the expected character"""
+        if self._next_char() != char:
+            raise json.JSONDecodeError(message, self.buffer, self.pos)
+        self.pos += 1
+
+    def _decode(self) -> Any:
+        """Decode the next entry, reading more (and more at a time) until it is complete"""
+        self._next_char()
+        size = self.read_size
+        while True:
+            entry, end = self._try_decode()
+            if end is not None:
+                self.pos = end
+                return entry
+            self._read(size)
+            size *= 2
+
+    def _try_decode(self) -> Tuple[Any, Optional[int]]:
+        """Decode the next entry from the buffer, the end of the entry is None if more has to be read first"""
+        try:
+            entry, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            if self.eof:
+                raise
+            return None, None
+        # A number cut off by the end of the buffer (e.g., 2.5 read as 2) decodes fine, so only trust an entry
+        # that is followed by something that can follow an entry
+        if self.eof or (end < len(self.buffer) and (self.buffer[end].isspace() or self.buffer[end] in ",]")):
+            return entry, end
+        return None, None
@@ -17,26 +17,207 @@
 
 """
 Peg Module
+
+Rules run over an input that is fixed for the duration of a parse: a string, or any object that can be sliced into
+the text between two positions, e.g., the tokens of a statement. A rule is a function from a position in the input
+to a (position after the match, values) pair, or () when it doesn't match. Nothing is copied while parsing.
+
+Calling a rule on an input outside of a parse parses the input from its start and returns the rest of the input
+instead of a position.
+
+Every rule built with `pegop` is memoized (packrat parsing): within a parse, a rule is evaluated at most once per
+position. Within `profiling()`, the calls, memo hits and time of every such rule are counted.
+
+A parse can be given a `ParseBudget`: once it evaluates more rules or takes longer than the budget allows, it raises
+`ParseBudgetExceeded`.
 """
 
+import time
+from contextlib import contextmanager
+
 # This code needs major cleanup! I am disabling the PyLint messages
 # until we can get someone to fix them properly. This code is an example
 # of how critical it is to use a good linter at the start of a project!
 
+# The parses in progress, innermost last: their ids, the memo tables to put back when they end, their inputs, and
+# what is left of their budgets
+_parses = []
+_num_parses = 0
+
+# Number of rule evaluations between two looks at the clock
+CHECK_INTERVAL = 1000
+
+# Statistics of every rule while profiling, None otherwise: name -> [calls, memo hits, seconds, own seconds]
+_profile = None
+# While profiling, the time spent in the rules called by each rule being evaluated, and how many times each rule is
+# being evaluated, so that the time of a recursive rule is only counted once
+_child_seconds = []
+_active = {}
+
+
+class ParseBudgetExceeded(Exception):
+    """A parse took more time or evaluated more rules than its budget allows"""
+
+
+class ParseBudget:  # pylint: disable=too-few-public-methods
+    """Limits on the time and the number of rule evaluations of a parse
+
+    Args:
+        seconds (float): Maximum time of a parse, None for no limit. The clock is read every `CHECK_INTERVAL` rule
+                         evaluations, so a parse may run a little longer.
+        steps (int): Maximum number of rule evaluations (memo hits are free) of a parse, None for no limit
+    """
+
+    def __init__(self, seconds: float = None, steps: int = None):
+        self.seconds = seconds
+        self.steps = steps
+
+
+class _Allowance:  # pylint: disable=too-few-public-methods
+    """What is left of the budget of a parse in progress"""
+
+    __slots__ = ("countdown", "chunk", "steps", "max_steps", "seconds", "deadline")
+
+    def __init__(self, budget):
+        self.steps = 0
+        self.max_steps = None if budget is None else budget.steps
+        self.seconds = None if budget is None else budget.seconds
+        self.deadline = None if self.seconds is None else time.perf_counter() + self.seconds
+        if self.max_steps is None and self.deadline is None:
+            self.chunk = float("inf")
+        else:
+            self.chunk = CHECK_INTERVAL if self.max_steps is None else min(CHECK_INTERVAL, self.max_steps + 1)
+        # Rule evaluations left until the next check, the first one past the budget included
+        self.countdown = self.chunk
+
+    def check(self):
+        """Raise ParseBudgetExceeded if the parse is over budget, called when the countdown runs out"""
+        self.steps += self.chunk
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise ParseBudgetExceeded(f"More than {self.max_steps} rule evaluations")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise ParseBudgetExceeded(f"More than {self.seconds} seconds")
+        if self.max_steps is not None:
+            self.chunk = min(CHECK_INTERVAL, self.max_steps + 1 - self.steps)
+        self.countdown = self.chunk
+
+
+def parse(e, s, budget=None):
+    """Parse an input with a rule, with memo tables of its own that are dropped at the end of the parse
+
+    Parse another input from within a rule with this function. Such a parse counts against the budget of the parse
+    it is part of.
+
+    Args:
+        e: The rule
+        s: The input
+        budget (ParseBudget): Limits on the parse, None for no limits
+
+    Returns:
+        The rest of the input after the match and the values, or () when the rule doesn't match
+
+    Raises:
+        ParseBudgetExceeded: If the parse goes over budget
+    """
+    global _num_parses  # pylint: disable=global-statement
+    _num_parses += 1
+    replaced = []
+    allowance = _parses[-1][3] if _parses and budget is None else _Allowance(budget)
+    _parses.append((_num_parses, replaced, s, allowance))
+    try:
+        a = e(0)
+    finally:
+        _parses.pop()
+        for memo, previous in reversed(replaced):
+            memo[:] = previous
+    if a == ():
+        return ()
+    return s[a[0]:], a[1]
+
+
+def current_input():
+    """The input of the parse in progress"""
+    return _parses[-1][2]
+
+
+@contextmanager
+def profiling():
+    """Count the calls, memo hits and time of every rule while in this context
+
+    Rules are known by the names given with `name_rules`, others by the name of their combinator (seq, choice, ...).
+    The time of a rule includes the rules it calls (like the cumulative time of cProfile, a rule calling itself
+    doesn't count twice), its own time doesn't.
+
+    Yields:
+        dict: name -> [calls, memo hits, seconds, own seconds], filled in as rules are called
+    """
+    global _profile  # pylint: disable=global-statement
+    _profile = {}
+    try:
+        yield _profile
+    finally:
+        _profile = None
+
+
+def name_rules(namespace):
+    """Name the rules in a namespace, e.g., the globals() of a grammar, after their variables"""
+    for rule_name, rule in namespace.items():
+        if hasattr(rule, "rule_name") and rule.rule_name is None:
+            rule.rule_name = rule_name
+
+
+def _profiled(h, f, args, i, table, v):
+    """Evaluate a rule (unless the memo table has it) and count it"""
+    rule_name = h.rule_name or f.__name__
+    stats = _profile.setdefault(rule_name, [0, 0, 0.0, 0.0])
+    stats[0] += 1
+    if v is not table:
+        stats[1] += 1
+        return v
+
+    _child_seconds.append(0.0)
+    _active[rule_name] = _active.get(rule_name, 0) + 1
+    start = time.perf_counter()
+    try:
+        v = table[i] = f(i, *args)
+    finally:
+        seconds = time.perf_counter() - start
+        _active[rule_name] -= 1
+        if not _active[rule_name]:
+            stats[2] += seconds
+        stats[3] += seconds - _child_seconds.pop()
+        if _child_seconds:
+            _child_seconds[-1] += seconds
+    return v
+
 
 def pegop(f):
     def g(*args):
-        memo = [None] * 64
+        # The id of the parse the rule has a memo table for, and the table: position -> result
+        memo = [None, {}]
+
+        def h(i):
+            if not isinstance(i, int):
+                return parse(h, i)
 
-        def h(s):
-            i = hash(s) % 64
-            if memo[i] and memo[i][0] == s:
-                return memo[i][1]
+            parse_id, replaced, _, allowance = _parses[-1]
+            if memo[0] != parse_id:
+                replaced.append((memo, memo[:]))
+                memo[0], memo[1] = parse_id, {}
 
-            v = f(s, *args)
-            memo[i] = (s, v)
+            table = memo[1]
+            v = table.get(i, table)
+            if v is table:
+                allowance.countdown -= 1
+                if not allowance.countdown:
+                    allowance.check()
+            if _profile is not None:
+                return _profiled(h, f, args, i, table, v)
+            if v is table:
+                v = table[i] = f(i, *args)
             return v
 
+        h.rule_name = None
         return h
 
     return g
@@ -45,73 +226,73 @@ def pegop(f):
 def pegcxt(f):
     def g(e):
         c = []
-        c.append(f(e, lambda s: c[0](s)))
+        c.append(f(e, lambda i: c[0](i)))
         return c[0]
 
     return g
 
 
 @pegop
-def choice(s, *args):
+def choice(i, *args):
     for f in args:
-        a = f(s)
+        a = f(i)
         if a != ():
             return a
     return ()
 
 
 @pegop
-def seq(s, *args):
+def seq(i, *args):
     r = []
     for f in args:
-        a = f(s)
+        a = f(i)
         if a == ():
             return ()
-        s = a[0]
+        i = a[0]
         r += a[1]
-    return s, r
+    return i, r
 
 
 @pegop
-def val(s, x):
-    if s.startswith(x):
-        return s[len(x):], []
+def val(i, x):
+    if current_input().startswith(x, i):
+        return i + len(x), []
     return ()
 
 
 @pegop
-def before(s, *args):
+def before(i, *args):
+    s = current_input()
     t = None
     for a in args:
-        if a is None:
-            t = "" if t is None else t
-        elif a in s and (t is None or (len(s) - s.index(a)) > len(t)):
-            t = s[s.index(a):]
+        j = len(s) if a is None else s.find(a, i)
+        if j >= 0 and (t is None or j < t):
+            t = j
     if t is None:
         return ()
     return t, []
 
 
 @pegop
-def match(s, e, r=None):
-    a = e(s)
+def match(i, e, r=None):
+    a = e(i)
     if a == ():
         return ()
     if r is None:
-        return a[0], a[1] + [s[: len(s) - len(a[0])]]
-    return a[0], r(a[1], s[: len(s) - len(a[0])])
+        return a[0], a[1] + [current_input()[i: a[0]]]
+    return a[0], r(a[1], current_input()[i: a[0]])
 
 
 @pegop
-def debug(s, e):
-    print("debug:", s)
-    return e(s)
+def debug(i, e):
+    print("debug:", current_input()[i:])
+    return e(i)
 
 
-def nil(s):
-    return s, []
+def nil(i):
+    return i, []
 
 
 def star(e):
-    f = choice(seq(e, lambda s: f(s)), nil)
+    f = choice(seq(e, lambda i: f(i)), nil)
     return f
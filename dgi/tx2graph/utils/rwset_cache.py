@@ -0,0 +1,175 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Read/Write Set Cache Module
+
+DiVA captures repeat the same prepared statements many times over. This cache remembers the tables each distinct
+statement reads and writes so that it is parsed only once.
+"""
+
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from importlib import metadata
+from pathlib import Path
+from typing import List, Optional, Set
+
+from dgi.utils.logging import Log
+
+DEFAULT_RWSET_CACHE_SIZE = 100000
+
+# Bump whenever the saved file changes shape or the SQL grammar derives different read and write sets, so that
+# files saved before are no longer used.
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_version() -> str:
+    """The version saved read and write sets are tagged with, they are only reused by the release that saved them"""
+    try:
+        package_version = metadata.version("tackle-dgi")
+    except metadata.PackageNotFoundError:
+        package_version = "unknown"
+    return f"{CACHE_FORMAT_VERSION} {package_version}"
+
+
+class RWSetCache:
+    """Read and write sets of SQL statements keyed on their normalized text
+
+    Statements are normalized with `normalize` wherever the cache is given one, so text that is normalized already
+    can be passed as well as raw text.
+
+    Args:
+        max_size (int): Maximum number of statements to remember. The least recently used statement is forgotten
+                        first. None or 0 means no limit.
+
+    Attributes:
+        added (Optional[Dict]): When set to a dict, every statement put in the cache is also recorded in it, with its
+                                read and write sets and whether to save them, e.g., to send the statements a worker
+                                process parsed back to the main process.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_RWSET_CACHE_SIZE) -> None:
+        self.max_size = max_size or None
+        self.hits = 0
+        self.misses = 0
+        self.added = None
+        self._rwsets = OrderedDict()
+        # Statements that are only remembered for this run, and not saved
+        self._unsaved = set()
+
+    def __contains__(self, sql: str) -> bool:
+        return self.normalize(sql) in self._rwsets
+
+    def __len__(self) -> int:
+        return len(self._rwsets)
+
+    @staticmethod
+    def normalize(sql: str) -> str:
+        """The text a statement is parsed and cached as: lower case, with every run of whitespace as one space
+
+        Args:
+            sql (str): The SQL statement
+
+        Returns:
+            str: The normalized statement
+        """
+        return " ".join(sql.lower().split())
+
+    def get(self, sql: str) -> Optional[List[Set[str]]]:
+        """Get the read and write sets of a statement
+
+        Args:
+            sql (str): The SQL statement
+
+        Returns:
+            Optional[List[Set[str]]]: New read and write sets, None if the statement is not in the cache
+        """
+        sql = self.normalize(sql)
+        rwset = self._rwsets.get(sql)
+        if rwset is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._rwsets.move_to_end(sql)
+        return [set(rwset[0]), set(rwset[1])]
+
+    def put(self, sql: str, rwset: List[Set[str]], persist: bool = True) -> None:
+        """Remember the read and write sets of a statement
+
+        Args:
+            sql (str): The SQL statement
+            rwset (List[Set[str]]): The read and write sets
+            persist (bool): Whether `save` saves the statement, False for read and write sets that are only good
+                            enough for this run, e.g., those found by a scan when the grammar went over budget
+        """
+        sql = self.normalize(sql)
+        self._rwsets[sql] = (frozenset(rwset[0]), frozenset(rwset[1]))
+        self._rwsets.move_to_end(sql)
+        if persist:
+            self._unsaved.discard(sql)
+        else:
+            self._unsaved.add(sql)
+        if self.added is not None:
+            self.added[sql] = (self._rwsets[sql], persist)
+        while self.max_size and len(self._rwsets) > self.max_size:
+            self._unsaved.discard(self._rwsets.popitem(last=False)[0])
+
+    def load(self, path: str) -> None:
+        """Add the statements saved in a file by `save`, if the file exists
+
+        A file that can't be read, or that was saved by another version, is ignored: its statements are parsed
+        again and the file is replaced by the next `save`.
+
+        Args:
+            path (str): The cache file
+        """
+        if not Path(path).exists():
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as file_obj:
+                saved = json.load(file_obj)
+        except (OSError, ValueError) as error:
+            Log.warn(f"Ignoring unreadable SQL cache file {path}: {error}")
+            return
+
+        if not isinstance(saved, dict) or saved.get("version") != cache_version():
+            Log.info(f"Ignoring SQL cache file {path} saved by another version")
+            return
+
+        for sql, (read_set, write_set) in saved["rwsets"].items():
+            self.put(sql, [set(read_set), set(write_set)])
+
+    def save(self, path: str) -> None:
+        """Save the statements to a file, except those put with `persist=False`
+
+        Args:
+            path (str): The cache file
+        """
+        rwsets = {
+            sql: [sorted(read_set), sorted(write_set)]
+            for sql, (read_set, write_set) in self._rwsets.items()
+            if sql not in self._unsaved
+        }
+        directory = Path(path).resolve().parent
+        directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that an interrupted run never leaves a truncated file behind
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as file_obj:
+            json.dump({"version": cache_version(), "rwsets": rwsets}, file_obj)
+        os.replace(file_obj.name, path)
@@ -0,0 +1,107 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Simple SQL Module
+
+Most statements DiVA captures touch a single table: SELECT ... FROM t WHERE ..., INSERT INTO t, UPDATE t SET, and
+DELETE FROM t. Their read and write sets are found here with a few regular expressions. Anything else (joins,
+subqueries, unions, CTEs, ...) is left to the full SQL grammar.
+
+When the grammar takes too long on a statement, `scan_rwset` makes a rougher guess at its read and write sets.
+"""
+
+import re
+from typing import List, Optional, Set
+
+from .sqlparse import reserved
+
+_NAME = r"[a-z_][a-z0-9_]*"
+# A table name, optionally qualified, and an optional alias
+_TABLE = rf"(?P<table>{_NAME}(?:\.{_NAME})*)(?: (?:as )?(?P<alias>{_NAME}))?"
+
+# Words that may bring another table into a statement, when they show up anywhere but before its one table
+_NOT_SIMPLE = re.compile(r"\b(?:select|from|into|join|union|except|intersect|with|values)\b")
+
+_SELECT = re.compile(r"select (?P<columns>.*?) from " + _TABLE + r"(?P<rest> (?:where|group|order|for|fetch)\b.*)?;?")
+_INSERT = re.compile(rf"insert into (?P<table>{_NAME}(?:\.{_NAME})*)(?: ?\((?P<columns>[^()]*)\))? values ?(?P<rest>\(.*\));?")
+_UPDATE = re.compile(r"update " + _TABLE + r" set (?P<rest>.*?);?")
+_DELETE = re.compile(r"delete (?:from )?" + _TABLE + r"(?P<rest> where\b.*)?;?")
+
+# The table a statement writes to, and the lists of tables (with their aliases) after FROM and JOIN
+_TARGET = re.compile(rf"(?:insert into|update|delete from|delete) (?P<table>{_NAME}(?:\.{_NAME})*)")
+_LISTED_TABLE = rf"{_NAME}(?:\.{_NAME})*(?: (?:as )?(?!(?:{'|'.join(reserved)})\b){_NAME})?"
+_FROM = re.compile(rf"\b(?:from|join) (?P<tables>{_LISTED_TABLE}(?: ?, ?{_LISTED_TABLE})*)")
+
+
+def _is_simple(*parts: Optional[str]) -> bool:
+    """Whether none of the parts of a statement around its table may bring in another table"""
+    return not any(part and _NOT_SIMPLE.search(part) for part in parts)
+
+
+def simple_rwset(sql: str) -> Optional[List[Set[str]]]:
+    """The read and write sets of a single table statement
+
+    Args:
+        sql (str): The statement, normalized like `RWSetCache.normalize` does
+
+    Returns:
+        Optional[List[Set[str]]]: The read and write sets, None if the statement is not a simple single table one
+    """
+    match = _SELECT.fullmatch(sql)
+    if match and _is_simple(match["columns"], match["rest"]):
+        rwset = [{match["table"]}, set()]
+    else:
+        match = _INSERT.fullmatch(sql)
+        if match and _is_simple(match["columns"], match["rest"]):
+            rwset = [set(), {match["table"]}]
+        else:
+            match = _UPDATE.fullmatch(sql) or _DELETE.fullmatch(sql)
+            if not match or not _is_simple(match["rest"]):
+                return None
+            rwset = [set(), {match["table"]}]
+
+    # Reserved words are names only in some places, leave those statements to the grammar
+    if any(word in reserved for word in match["table"].split(".")) or match.groupdict().get("alias") in reserved:
+        return None
+    return rwset
+
+
+def scan_rwset(sql: str) -> List[Set[str]]:
+    """Guess the read and write sets of any statement: the tables after FROM and JOIN are read, and the table after
+    INSERT INTO, UPDATE or DELETE (FROM) is written
+
+    Unlike the grammar, this doesn't understand the statement, e.g., a function taking a FROM argument makes its
+    argument look like a table.
+
+    Args:
+        sql (str): The statement, normalized like `RWSetCache.normalize` does
+
+    Returns:
+        List[Set[str]]: The read and write sets
+    """
+    read_set, write_set, start = set(), set(), 0
+    target = _TARGET.match(sql)
+    if target and target["table"] not in reserved:
+        write_set.add(target["table"])
+        start = target.end()
+
+    for tables in _FROM.finditer(sql, start):
+        # The first word of every item of the list is a table, the others its alias
+        read_set.update(
+            table.split()[0] for table in tables["tables"].split(",") if table.split()[0] not in reserved
+        )
+    return [read_set, write_set]
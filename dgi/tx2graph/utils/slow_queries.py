@@ -0,0 +1,118 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Slow Query Log Module
+
+Keeps track of the statements the SQL grammar took the longest on, and of those it gave up on because they went
+over their parse budget, so that they can be reported at the end of a run.
+"""
+
+import heapq
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+DEFAULT_MAX_SLOWEST = 20
+
+
+class SlowQueryLog:
+    """The slowest statements parsed with the SQL grammar, and every statement that went over budget
+
+    Args:
+        max_slowest (int): Number of slowest statements to keep
+
+    Attributes:
+        parsed (int): Number of statements parsed with the grammar
+        seconds (float): Total time spent parsing them
+        over_budget (Dict[str, float]): Statement -> seconds spent on it, for the statements that went over budget
+    """
+
+    def __init__(self, max_slowest: int = DEFAULT_MAX_SLOWEST) -> None:
+        self.max_slowest = max_slowest
+        self.parsed = 0
+        self.seconds = 0.0
+        self.over_budget = {}
+        # A min-heap of (seconds, statement), the fastest of the slowest statements first
+        self._slowest = []
+
+    def record(self, sql: str, seconds: float, over_budget: bool = False) -> None:
+        """Record the time the grammar spent on a statement
+
+        Args:
+            sql (str): The normalized SQL statement
+            seconds (float): The parse time
+            over_budget (bool): Whether the parse was given up on
+        """
+        self.parsed += 1
+        self.seconds += seconds
+        if over_budget:
+            self.over_budget[sql] = seconds
+        self._keep(seconds, sql)
+
+    def merge(self, other: "SlowQueryLog") -> None:
+        """Add the statements recorded by another log, e.g., that of a worker process
+
+        Args:
+            other (SlowQueryLog): The other log
+        """
+        self.parsed += other.parsed
+        self.seconds += other.seconds
+        self.over_budget.update(other.over_budget)
+        for seconds, sql in other._slowest:  # pylint: disable=protected-access
+            self._keep(seconds, sql)
+
+    def _keep(self, seconds: float, sql: str) -> None:
+        """Keep a statement if it is one of the slowest so far"""
+        if len(self._slowest) < self.max_slowest:
+            heapq.heappush(self._slowest, (seconds, sql))
+        elif self._slowest and seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, sql))
+
+    def clear(self) -> None:
+        """Forget every recorded statement"""
+        self.parsed = 0
+        self.seconds = 0.0
+        self.over_budget = {}
+        self._slowest = []
+
+    def report(self) -> Dict:
+        """The report of the run
+
+        Returns:
+            Dict: The number of statements parsed with the grammar and the time spent on them, the slowest
+            statements, slowest first, and the statements that went over budget
+        """
+        return {
+            "parsed": self.parsed,
+            "seconds": self.seconds,
+            "slowest": [{"sql": sql, "seconds": seconds} for seconds, sql in sorted(self._slowest, reverse=True)],
+            "over_budget": [{"sql": sql, "seconds": seconds} for sql, seconds in self.over_budget.items()],
+        }
+
+    def save(self, path: str) -> None:
+        """Save the report to a JSON file
+
+        Args:
+            path (str): The report file
+        """
+        directory = Path(path).resolve().parent
+        directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as file_obj:
+            json.dump(self.report(), file_obj, indent=2)
+        os.replace(file_obj.name, path)
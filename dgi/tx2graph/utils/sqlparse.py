@@ -23,7 +23,7 @@ SQL Parser Module
 # until we can get someone to fix them properly. This code is an example
 # of how critical it is to use a good linter at the start of a project!
 
-from .peg import seq, choice, star, nil, pegop, pegcxt
+from .peg import seq, choice, star, nil, parse, pegop, pegcxt, current_input, name_rules
 from .peg import match as match0
 
 
@@ -138,8 +138,8 @@ operator_tokens = [
 ]
 
 
-def token0(s):  # noqa: C901 pylint: disable=too-many-branches
-    k0 = 0
+def token0(s, k0):  # noqa: C901 pylint: disable=too-many-branches
+    """The start and the end of the first token in s at or after k0, () if there is none"""
     while k0 < len(s):
         if not s[k0].isspace():
             break
@@ -147,9 +147,9 @@ def token0(s):  # noqa: C901 pylint: disable=too-many-branches
     else:
         return ()
     if k0 + 2 <= len(s) and s[k0: k0 + 2] in operator_tokens:
-        return (s[k0 + 2:], [s[k0: k0 + 2]])
+        return k0, k0 + 2
     if k0 + 3 <= len(s) and s[k0: k0 + 3] in operator_tokens:
-        return (s[k0 + 3:], [s[k0: k0 + 3]])
+        return k0, k0 + 3
     k = k0 + 1
     if s[k0].isalpha() or s[k0] == "_" or s[k0] == ":":
         while k < len(s):
@@ -172,71 +172,95 @@ def token0(s):  # noqa: C901 pylint: disable=too-many-branches
                 k += 1
                 break
             k += 1
-    return (s[k:], [s[k0:k]]) if k > k0 else ()
+    return (k0, k) if k > k0 else ()
 
 
-# pylint: disable=consider-using-f-string
-@pegop
-def token1(s):
-    r = token0(s)
-    if r and r[1][0] in reserved_that_can_be_names:
-        r2 = token0(r[0])
-        if not r2 or r2[1][0] in what_only_follow_names:
-            return (r[0], ['"%s"' % r[1][0]])
-    if r and r[1][0] in reserved and r[0] and r[0][0] == ".":
-        return (r[0], ['"%s"' % r[1][0]])
-    return r
+class Tokens:
+    """The tokens of a statement, which the grammar runs over
+
+    Slicing gives the text of the statement between two token positions: from the end of the token before the
+    first position, to the end of the token before the second.
+
+    Attributes:
+        values (list): The tokens, followed by None. Reserved words used as names are quoted.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        spans = []
+        r = token0(text, 0)
+        while r:
+            spans.append(r)
+            r = token0(text, r[1])
+        self.ends = [0] + [end for _, end in spans]
+        self.values = [self._value(text, spans, i) for i in range(len(spans))] + [None]
+
+    @staticmethod
+    def _value(text, spans, i):
+        start, end = spans[i]
+        v = text[start:end]
+        # pylint: disable=consider-using-f-string
+        if v in reserved_that_can_be_names:
+            if i + 1 == len(spans) or text[slice(*spans[i + 1])] in what_only_follow_names:
+                return '"%s"' % v
+        if v in reserved and end < len(text) and text[end] == ".":
+            return '"%s"' % v
+        return v
+
+    def __len__(self):
+        return len(self.values) - 1
 
+    def __getitem__(self, key):
+        start = self.ends[key.start or 0]
+        return self.text[start:] if key.stop is None else self.text[start: self.ends[key.stop]]
 
-token = token1()  # caching tokenization
 
+def tokens():
+    return current_input().values
 
-def name(s):
-    r = token(s)
+
+def name(i):
+    v = tokens()[i]
     return (
-        (r[0], [])
-        if r
-        and r[1][0] not in reserved
-        and (r[1][0][0] == "_" or r[1][0][0].isalpha() or r[1][0][0] == '"')
+        (i + 1, [])
+        if v is not None
+        and v not in reserved
+        and (v[0] == "_" or v[0].isalpha() or v[0] == '"')
         else ()
     )
 
 
-def literal(s):
-    r = token(s)
-    if r and r[1][0][0] == "'":
-        return (r[0], [])
-    if r and r[1][0] == "null":
-        return (r[0], [])
-    if r and (r[1][0][0].isdigit() or r[1][0][0] == "." and len(r[1][0]) > 1):
-        return (r[0], [])
+def literal(i):
+    v = tokens()[i]
+    if v is None:
+        return ()
+    if v[0] == "'" or v == "null":
+        return (i + 1, [])
+    if v[0].isdigit() or v[0] == "." and len(v) > 1:
+        return (i + 1, [])
     return ()
 
 
-def variable(s):
-    r = token(s)
-    if r and r[1][0][0] == ":":
-        return (r[0], [])
-    if r and r[1][0] == "?":
-        return (r[0], [])
+def variable(i):
+    v = tokens()[i]
+    if v is not None and (v[0] == ":" or v == "?"):
+        return (i + 1, [])
     return ()
 
 
-@pegop
-def op(s, v):
-    r = token(s)
-    return (r[0], []) if r and r[1][0] == v else ()
+def op(v):
+    return lambda i: (i + 1, []) if tokens()[i] == v else ()
 
 
 @pegop
-def until(s, *ws):
+def until(i, *ws):
+    values = tokens()
     while 1:
-        r = token(s)
-        if not r:
-            return ("", []) if None in ws else ()
-        if r[1][0] in ws:
-            return (s, [])
-        s = r[0]
+        if values[i] is None:
+            return (i, []) if None in ws else ()
+        if values[i] in ws:
+            return (i, [])
+        i += 1
 
 
 def match(e, r=None):
@@ -245,6 +269,23 @@ def match(e, r=None):
     return match0(e, lambda s, v: r(s, v.strip()))
 
 
+def parse_sql(e, sql, budget=None):
+    """Parse a statement with a rule
+
+    Args:
+        e: The rule
+        sql (str): The statement
+        budget (ParseBudget): Limits on the parse, None for no limits
+
+    Returns:
+        The rest of the statement after the match and the values, or () when the rule doesn't match
+
+    Raises:
+        ParseBudgetExceeded: If the parse goes over budget
+    """
+    return parse(e, Tokens(sql), budget)
+
+
 def split(n):
     if "." not in n:
         return ("", n)
@@ -255,7 +296,7 @@ def split(n):
 qname = seq(name, star(seq(op("."), name)))
 
 paren = seq(
-    op("("), star(seq(until("(", ")"), lambda s: paren(s))), until("(", ")"), op(")")
+    op("("), star(seq(until("(", ")"), lambda i: paren(i))), until("(", ")"), op(")")
 )
 
 # skip until one of strs occurs, ignoring anything inside parenthesis
@@ -296,7 +337,7 @@ callargs = choice(
     comma_sep(
         seq(
             option(choice(op("distinct"), op("all"))),
-            choice(lambda s: colexp(s), match(op("*"), lambda s, v: s + [(v,)])),
+            choice(lambda i: colexp(i), match(op("*"), lambda s, v: s + [(v,)])),
         )
     ),
     nil,
@@ -313,7 +354,7 @@ callexp = choice(
     seq(
         op("cast"),
         op("("),
-        lambda s: colexp(s),
+        lambda i: colexp(i),
         op("as"),
         until_ignoring_paren(")"),
         op(")"),
@@ -323,11 +364,11 @@ callexp = choice(
 
 caseexp = seq(
     op("case"),
-    option(lambda s: colexp(s)),
+    option(lambda i: colexp(i)),
     plus(
-        seq(op("when"), until_ignoring_paren("then"), op("then"), lambda s: colexp(s))
+        seq(op("when"), until_ignoring_paren("then"), op("then"), lambda i: colexp(i))
     ),
-    option(seq(op("else"), lambda s: colexp(s))),
+    option(seq(op("else"), lambda i: colexp(i))),
     op("end"),
 )
 
@@ -337,31 +378,31 @@ colexp0 = choice(
     seq(op("current"), name),
     callexp,
     caseexp,
-    seq(op("("), comma_sep(lambda s: colexp(s)), op(")")),
-    lambda s: nestedexp(s),
+    seq(op("("), comma_sep(lambda i: colexp(i)), op(")")),
+    lambda i: nestedexp(i),
     match(seq(name, op("."), op("*")), lambda s, v: s + [(v,)]),
     seq(
         option(seq(op("nextval"), op("for"))),
         match(qname, lambda s, v: s + [(v,)]),
         option(seq(op("."), op("nextval"))),
     ),
-    seq(op("set"), op("("), lambda s: colexp(s), op(")")),
+    seq(op("set"), op("("), lambda i: colexp(i), op(")")),
 )
 
 binaryexp = seq(
     colexp0,
     choice(op("+"), op("-"), op("*"), op("/"), op("||"), op("concat")),
-    lambda s: colexp(s),
+    lambda i: colexp(i),
 )
 
-naryexp = choice(seq(op("-"), lambda s: colexp(s)), binaryexp)
+naryexp = choice(seq(op("-"), lambda i: colexp(i)), binaryexp)
 
 colexp = choice(naryexp, colexp0)
 
 colexp1 = match(
     ascxt(colexp),
     lambda s, _: [{split(s[0][0])[1]: s[0]}]
-    if len(s) == 1 and isinstance(s[0], tuple) and qname(s[0][0]) == ("", [])
+    if len(s) == 1 and isinstance(s[0], tuple) and parse_sql(qname, s[0][0]) == ("", [])
     else s,
 )
 
@@ -376,12 +417,12 @@ jointype = choice(
     seq(op("inner"), op("join")),
 )
 
-joincond = seq(op("on"), lambda s: condexp(s))
+joincond = seq(op("on"), lambda i: condexp(i))
 
 tblexp = choice(
     seq(match(qname), option(seq(op("partition"), op("("), name, op(")")))),
-    lambda s: nestedexp(s),
-    seq(op("("), lambda s: tblsexp(s), op(")")),
+    lambda i: nestedexp(i),
+    seq(op("("), lambda i: tblsexp(i), op(")")),
 )
 
 
@@ -432,7 +473,7 @@ def withcxt(e, fix):  # pylint: disable=unused-argument
                     name,
                     option(seq(op("("), comma_sep(name), op(")"))),
                     op("as"),
-                    lambda s: nestedexp(s),
+                    lambda i: nestedexp(i),
                 )
             ),
             e,
@@ -445,9 +486,9 @@ colexp1 = choice(seq(qname, op("(+)")), colexp)
 
 condexp = seq(
     choice(
-        seq(op("("), lambda s: condexp(s), op(")")),
-        seq(op("not"), lambda s: condexp(s)),
-        seq(op("exists"), choice(colexp, lambda s: nestedexp(s))),
+        seq(op("("), lambda i: condexp(i), op(")")),
+        seq(op("not"), lambda i: condexp(i)),
+        seq(op("exists"), choice(colexp, lambda i: nestedexp(i))),
         seq(
             colexp1,
             choice(
@@ -469,7 +510,7 @@ condexp = seq(
                 seq(
                     option(op("not")),
                     choice(
-                        seq(op("in"), choice(colexp, lambda s: nestedexp(s))),
+                        seq(op("in"), choice(colexp, lambda i: nestedexp(i))),
                         seq(op("like"), colexp, option(seq(op("escape"), colexp))),
                         seq(op("between"), colexp, op("and"), colexp),
                     ),
@@ -480,13 +521,13 @@ condexp = seq(
         seq(
             choice(op(":_where_and"), op(":_or"), op(":_and")),
             op("("),
-            comma_sep(lambda s: condexp(s)),
+            comma_sep(lambda i: condexp(i)),
             op(")"),
         ),
         seq(op(":_in"), op("("), qname, option(op("=")), variable, op(")")),
         callexp,
     ),
-    option(seq(choice(op("and"), op("or")), lambda s: condexp(s))),
+    option(seq(choice(op("and"), op("or")), lambda i: condexp(i))),
 )
 
 # whrexp = seq(op('where'), until_ignoring_paren(')', 'group', 'order', 'union', None))
@@ -590,7 +631,7 @@ insexp = withcxt(
             )
         ),
         op("values"),
-        choice(lambda s: nestedexp(s), seq(op("("), colsexp, op(")")), colsexp),
+        choice(lambda i: nestedexp(i), seq(op("("), colsexp, op(")")), colsexp),
     )
 )
 delexp = withcxt(
@@ -609,26 +650,48 @@ nestedexp = seq(
     choice(
         match(selexp, lambda s, v: [s]),
         match(valuesexp, lambda s, v: [s]),
-        lambda s: nestedexp(s),
+        lambda i: nestedexp(i),
     ),
     op(")"),
 )
 
-sqlexp = seq(choice(selexp, updexp, insexp, delexp, valuesexp), option(op(";")))
+stmtexp = seq(choice(selexp, updexp, insexp, delexp, valuesexp), option(op(";")))
+
+
+def sqlexp(sql, budget=None):
+    """Parse a SQL statement
+
+    Args:
+        sql (str): The statement
+        budget (ParseBudget): Limits on the parse, None for no limits
+
+    Returns:
+        The rest of the statement after the match and the AST, or () when the statement doesn't parse
+
+    Raises:
+        ParseBudgetExceeded: If the parse goes over budget
+    """
+    return parse_sql(stmtexp, sql, budget)
+
+
+name_rules(globals())
+
 
 if __name__ == "__main__":
-    print(selexp("select a from b t,c where (a = b)"))
-    print(selexp("select a from b t,c"))
+    print(parse_sql(selexp, "select a from b t,c where (a = b)"))
+    print(parse_sql(selexp, "select a from b t,c"))
     print(
-        selexp(
+        parse_sql(
+            selexp,
             "SELECT ACCOUNTID, BALANCE, CREATIONDATE, LASTLOGIN, LOGINCOUNT, "
             "LOGOUTCOUNT, OPENBALANCE, PROFILE_USERID FROM accountejb "
             "WHERE (PROFILE_USERID = ?)".lower()
         )
     )
-    print(updexp("UPDATE accountejb SET LOGOUTCOUNT = ? WHERE (ACCOUNTID = ?)".lower()))
+    print(parse_sql(updexp, "UPDATE accountejb SET LOGOUTCOUNT = ? WHERE (ACCOUNTID = ?)".lower()))
     print(
-        selexp(
+        parse_sql(
+            selexp,
             "SELECT t1.HOLDINGID, t1.PURCHASEDATE, t1.PURCHASEPRICE, t1.QUANTITY, "
             "t1.ACCOUNT_ACCOUNTID, t1.QUOTE_SYMBOL FROM accountejb t0, holdingejb t1 "
             "WHERE ((t0.PROFILE_USERID = ?) AND (t0.ACCOUNTID = t1.ACCOUNT_ACCOUNTID))".lower()
@@ -669,7 +732,7 @@ if __name__ == "__main__":
         sqlexp("select * from ((select * from t) union (select * from d) order by x)")
     )
     print(sqlexp("select * from t for update"))
-    print(condexp("a like '%' || ? ||'%'"))
+    print(parse_sql(condexp, "a like '%' || ? ||'%'"))
     print(
         sqlexp(
             "select t0.x, t1.y, t2.z, t3.w from a t0, (select * from b t1, c t2) as t3"
@@ -679,5 +742,5 @@ if __name__ == "__main__":
     print(
         sqlexp("select t.a, s.a from s, (select * from x union select * from y) as t")
     )
-    print(selexp("select a into b from c"))
-    print(selexp("select set (a) into b from c"))
+    print(parse_sql(selexp, "select a into b from c"))
+    print(parse_sql(selexp, "select set (a) into b from c"))
@@ -0,0 +1,93 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Batch Writer
+
+Send many rows to Neo4j as a handful of parameterized UNWIND statements instead of one round trip per row.
+"""
+
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from neomodel import db
+from tqdm import tqdm
+
+# Author information
+__author__ = "Rahul Krishna"
+__license__ = "Apache 2.0"
+__version__ = "1.0"
+__maintainer__ = "Rahul Krishna"
+__email__ = "rkrsn@ibm.com"
+__status__ = "Research Prototype"
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def batched(rows: Iterable, batch_size: int) -> Iterator[List]:
+    """Split an iterable into lists of at most batch_size items
+
+    Args:
+        rows (Iterable): The rows to split
+        batch_size (int): The maximum number of rows in a batch
+
+    Yields:
+        List: The next batch of rows
+    """
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be a positive integer, got {batch_size}")
+
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def write_in_batches(
+    query: str,
+    rows: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    total: int = None,
+    on_results: Callable[[List], None] = None,
+    progress: bool = True,
+) -> int:
+    """Run an UNWIND query once per batch of rows
+
+    Args:
+        query (str): A cypher query that consumes the batch as `UNWIND $rows AS row`
+        rows (Iterable[Dict]): The parameter maps, one per row
+        batch_size (int): The number of rows sent in one statement
+        total (int): Number of rows (for the progress bar), defaults to len(rows) when available
+        on_results (Callable[[List], None]): Called with the records returned by each batch
+        progress (bool): Show a progress bar
+
+    Returns:
+        int: The number of rows written
+    """
+    if total is None and hasattr(rows, "__len__"):
+        total = len(rows)
+
+    written = 0
+    with tqdm(total=total, disable=not progress) as progress_bar:
+        for batch in batched(rows, batch_size):
+            results, _ = db.cypher_query(query, {"rows": batch})
+            if on_results is not None:
+                on_results(results)
+            written += len(batch)
+            progress_bar.update(len(batch))
+
+    return written
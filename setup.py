@@ -11,7 +11,7 @@ setup(
     description="Konveyor Tackle Data Gravity Insights",
     long_description=long_description,
     long_description_content_type="text/markdown",
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     include_package_data=True,
     install_requires=[
         "Click==8.1.3",
@@ -20,6 +20,7 @@ setup(
         "PyYAML==6.0",
         "ipdb==0.13.11",
         "pandas==1.5.3",
+        "pyarrow==15.0.2",
         "tqdm==4.65.0",
         "py2neo==2021.2.3",
         "minerva-cargo==1.1.0",
@@ -112,3 +112,32 @@ class TestS2GCLI(unittest.TestCase):
             result.output,
         )
         self.assertEqual(result.exit_code, 2)
+
+    def test_batch_size_must_be_positive(self):
+        """Test raise exception when --batch-size is not a positive number"""
+        result = self.runner.invoke(
+            cli,
+            [
+                "--validate",
+                "c2g",
+                "--batch-size=0",
+                "--doop-input=tests/fixtures/doop_out",
+            ],
+        )
+        self.assertIn("Invalid value for '--batch-size' / '-b'", result.output)
+        self.assertEqual(result.exit_code, 2)
+
+    def test_cache_dir_with_chunk_size(self):
+        """Test raise exception when --cache-dir is given with streamed facts, which are never cached"""
+        result = self.runner.invoke(
+            cli,
+            [
+                "--validate",
+                "c2g",
+                "--chunk-size=10",
+                "--cache-dir=facts-cache",
+                "--doop-input=tests/fixtures/doop_out",
+            ],
+        )
+        self.assertIn("--cache-dir can't be used with --chunk-size", result.output)
+        self.assertEqual(result.exit_code, 2)
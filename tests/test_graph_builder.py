@@ -0,0 +1,210 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Test cases for the code2graph graph builders
+"""
+import importlib.resources
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+from dgi.code2graph import ClassGraphBuilder, FullGraphBuilder, MethodGraphBuilder
+from dgi.code2graph.abstract_graph_builder import AbstractGraphBuilder
+from dgi.code2graph.node_registry import NodeRegistry
+from dgi.code2graph.process_facts import ConsumeFacts, aggregate_flows
+from dgi.models import ClassNode
+from dgi.models.relationships import HeapCarriedRelationship
+from dgi.utils.parse_config import Config
+
+######################################################################
+#  G R A P H   B U I L D E R   T E S T   C A S E S
+######################################################################
+
+
+class TestAggregateFlows(unittest.TestCase):
+    """Test Cases for pre-aggregating facts"""
+
+    def test_duplicate_facts_are_counted(self):
+        """Test repeated facts collapse into one weighted row"""
+        main = {"name": "main", "class": "a.Main", "return_type": "void"}
+        run = {"name": "run", "class": "a.Task", "return_type": "void"}
+        ctx = [{"class": None, "method": "<<immutable-context>>"}]
+        flows = pd.DataFrame(
+            {
+                "context": [ctx, list(ctx), ctx, [{}]],
+                "prev": [main, dict(main), run, main],
+                "next": [run, run, main, run],
+            }
+        )
+        aggregated = aggregate_flows(flows)
+        self.assertEqual(len(aggregated), 3)
+        self.assertEqual(aggregated.weight.tolist(), [2, 1, 1])
+        self.assertEqual(aggregated.prev[1], run)
+
+    def test_no_facts(self):
+        """Test aggregating an empty set of facts"""
+        flows = pd.DataFrame(columns=["context", "prev", "next"])
+        aggregated = aggregate_flows(flows)
+        self.assertTrue(aggregated.empty)
+        self.assertIn("weight", aggregated.columns)
+
+
+class TestNodeRegistry(unittest.TestCase):
+    """Test Cases for the node registry"""
+
+    def test_get_and_put(self):
+        """Test remembering node ids"""
+        registry = NodeRegistry(ClassNode, "node_short_name")
+        self.assertIsNone(registry.get("Main"))
+        registry.put("Main", 7)
+        self.assertEqual(registry.get("Main"), 7)
+        self.assertEqual((registry.hits, registry.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the registry stays within its size bound"""
+        registry = NodeRegistry(ClassNode, "node_short_name", max_size=2)
+        registry.update([("A", 1), ("B", 2)])
+        registry.get("A")
+        registry.put("C", 3)
+        self.assertEqual(len(registry), 2)
+        self.assertIn("A", registry)
+        self.assertNotIn("B", registry)
+
+    def test_shared_per_model(self):
+        """Test builders of the same node model share one registry"""
+        self.assertIs(
+            NodeRegistry.of(ClassNode, "node_short_name"),
+            NodeRegistry.of(ClassNode, "node_short_name"),
+        )
+
+
+class TestGraphWrites(unittest.TestCase):
+    """Test Cases for the statements the graph builders send to Neo4j"""
+
+    def setUp(self):
+        registries = patch.dict(NodeRegistry._registries, clear=True)
+        registries.start()
+        self.addCleanup(registries.stop)
+        self.builder = ClassGraphBuilder(SimpleNamespace(BATCH_SIZE=2))
+        self.builder.nodes.update([("Main", 1), ("Task", 2)])
+
+    @staticmethod
+    def cypher_query(query, params):
+        """Give every merged node an id"""
+        if "RETURN row.key, id(n)" in query:
+            return [[row["key"], 10 + index] for index, row in enumerate(params["rows"])], None
+        return [], None
+
+    def test_write_nodes(self):
+        """Test only the nodes that are not in the graph yet are merged"""
+        self.builder._register_node("Main", {"node_class": "a.Main", "node_short_name": "Main"})
+        self.builder._register_node("Job", {"node_class": "a.Job", "node_short_name": "Job"})
+        with patch("dgi.utils.batch_writer.db") as db:
+            db.cypher_query.side_effect = self.cypher_query
+            self.builder._write_nodes()
+
+        (query, params), _ = db.cypher_query.call_args
+        self.assertEqual(db.cypher_query.call_count, 1)
+        self.assertIn("MERGE (n:ClassNode {node_short_name: row.key})", query)
+        self.assertEqual([row["key"] for row in params["rows"]], ["Job"])
+        self.assertEqual(params["rows"][0]["props"]["node_class"], "a.Job")
+        self.assertEqual(self.builder.nodes.get("Job"), 10)
+
+    def test_edges_with_different_properties(self):
+        """Test edges are merged on exactly the properties their rows have"""
+        props = {"pmethod": "main", "nmethod": "run", "context": ["ctx"], "heap_object": {"id": 1}}
+        rows = [
+            AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Task", props, 2),
+            AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Task", {**props, "heap_object": None}),
+            AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Task", props),
+        ]
+        with patch("dgi.utils.batch_writer.db") as db:
+            db.cypher_query.return_value = ([], None)
+            self.builder._write_edges("HEAP_DEPENDENCY", rows)
+
+        statements = [(query, params["rows"]) for (query, params), _ in db.cypher_query.call_args_list]
+        self.assertEqual(len(statements), 2)
+        for query, batch in statements:
+            self.assertEqual(len(batch), 1)
+            for prop in batch[0]["props"]:
+                self.assertIn(f"{prop}: row.props.{prop}", query)
+            self.assertEqual((batch[0]["prev"], batch[0]["next"]), (1, 2))
+        with_heap, without_heap = statements
+        self.assertIn("heap_object: row.props.heap_object", with_heap[0])
+        self.assertEqual(with_heap[1][0]["weight"], 3)
+        self.assertNotIn("heap_object", without_heap[0])
+        self.assertEqual(without_heap[1][0]["weight"], 1)
+
+    def test_edges_with_unknown_nodes(self):
+        """Test edges whose nodes are not in the graph are skipped and reported"""
+        rows = [
+            AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Task", {"pmethod": "main"}),
+            AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Gone", {"pmethod": "main"}),
+        ]
+        with patch("dgi.utils.batch_writer.db") as db, patch("dgi.code2graph.node_registry.db") as registry_db, patch(
+            "dgi.code2graph.abstract_graph_builder.Log"
+        ) as logger:
+            db.cypher_query.return_value = ([], None)
+            registry_db.cypher_query.return_value = ([], None)
+            self.builder._write_edges("HEAP_DEPENDENCY", rows)
+
+        (_, params), _ = db.cypher_query.call_args
+        self.assertEqual([(row["prev"], row["next"]) for row in params["rows"]], [(1, 2)])
+        logger.warn.assert_called_once()
+        self.assertIn("Skipped 1 HEAP_DEPENDENCY edges", logger.warn.call_args.args[0])
+
+    def test_edges_without_properties(self):
+        """Test edges without any property are merged on their end points only"""
+        rows = [AbstractGraphBuilder._edge_row(HeapCarriedRelationship, "Main", "Task", {"heap_object": None})]
+        with patch("dgi.utils.batch_writer.db") as db:
+            db.cypher_query.return_value = ([], None)
+            self.builder._write_edges("HEAP_DEPENDENCY", rows)
+
+        (query, _), _ = db.cypher_query.call_args
+        self.assertIn("MERGE (p)-[r:HEAP_DEPENDENCY]->(n)", query)
+
+
+class TestFullGraphBuilder(unittest.TestCase):
+    """Test Cases for building the class and method graphs together"""
+
+    def test_facts_are_parsed_once(self):
+        """Test both builders get the same aggregated flows from a single parse"""
+        config = Config(config_file=importlib.resources.files("dgi.code2graph").joinpath("etc", "config.yml"))
+        config.load_config()
+        config.set_config(key="GRAPH_FACTS_DIR", val="tests/fixtures/doop_out")
+
+        populated = []
+
+        def populate(builder, **flows):
+            populated.append((type(builder), flows))
+
+        with patch.object(
+            ConsumeFacts, "process_and_get_facts_data", autospec=True, side_effect=ConsumeFacts.process_and_get_facts_data
+        ) as parse, patch.object(AbstractGraphBuilder, "prepare_graph"), patch.object(
+            AbstractGraphBuilder, "populate", autospec=True, side_effect=populate
+        ):
+            FullGraphBuilder(config).build_ddg()
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual([builder for builder, _ in populated], [ClassGraphBuilder, MethodGraphBuilder] * 3)
+        for (_, class_flows), (_, method_flows) in zip(populated[::2], populated[1::2]):
+            self.assertEqual(class_flows.keys(), method_flows.keys())
+            for kind, flows in class_flows.items():
+                self.assertIs(flows, method_flows[kind])
+                self.assertIn("weight", flows.columns)
@@ -0,0 +1,208 @@
+################################################################################
+# Copyright IBM Corporation 2021, 2022
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+"""
+Test cases for processing DOOP facts
+"""
+import importlib.resources
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+
+from dgi.code2graph.intern_table import InternTable
+from dgi.code2graph.process_facts import ConsumeFacts
+from dgi.utils.parse_config import Config
+
+######################################################################
+#  P R O C E S S   F A C T S   T E S T   C A S E S
+######################################################################
+
+FACTS_DIR = "tests/fixtures/doop_out"
+
+CONTEXTS = [
+    "[<<immutable-context>>, <<immutable-context>>]",
+    "[<<immutable-context>>, <com.acme.Main: void main(java.lang.String[])>/new java.util.ArrayList/0]",
+    "[<com.acme.Main: void <init>(int,int)>/new com.acme.Obj/3, <<string-builder>>]",
+    "[java.lang.Object::MockObject, <<immutable-hcontext>>]",
+]
+METHODS = [
+    "<com.acme.Main: void main(java.lang.String[])>",
+    "<com.acme.Obj: void <init>()>",
+    "<com.acme.Obj: int getX()>",
+    "<com.acme.Main: void main(java.lang.String[])>",
+]
+HEAP_OBJECTS = [
+    "<com.acme.Main: void main(java.lang.String[])>/new com.acme.Obj/0",
+    "<com.acme.Obj: void <init>()>/new java.util.ArrayList/12",
+    "<<string-constant>>",
+    "<com.acme.Main: void input(java.util.List)>/new com.acme.ReadVal extra/1/2",
+]
+
+
+class TestProcessFacts(unittest.TestCase):
+    """Test Cases for ConsumeFacts"""
+
+    def setUp(self):
+        config = Config(config_file=importlib.resources.files("dgi.code2graph").joinpath("etc", "config.yml"))
+        config.load_config()
+        config.set_config(key="GRAPH_FACTS_DIR", val=FACTS_DIR)
+        self.config = config
+
+    def assert_same_as_scalar(self, vectorized, scalar, values):
+        """Assert the vectorized parser agrees with the scalar one"""
+        series = pd.Series(values)
+        self.assertEqual(vectorized(series).tolist(), [scalar(value) for value in values])
+
+    def test_vectorized_methods(self):
+        """Test parsing method strings a column at a time"""
+        consume = ConsumeFacts(self.config)
+        self.assert_same_as_scalar(
+            consume._jsonify_method_strings, ConsumeFacts(self.config)._jsonify_method_string, METHODS
+        )
+
+    def test_vectorized_contexts(self):
+        """Test parsing contexts a column at a time"""
+        consume = ConsumeFacts(self.config)
+        scalar = ConsumeFacts(self.config)
+        self.assert_same_as_scalar(consume._jsonify_contexts, scalar._jsonify_context, CONTEXTS)
+        self.assertEqual(consume.contexts, scalar.contexts)
+
+    def test_vectorized_heap_objects(self):
+        """Test parsing heap objects a column at a time"""
+        consume = ConsumeFacts(self.config)
+        self.assert_same_as_scalar(consume._jsonify_heap_objs, ConsumeFacts._jsonify_heap_obj, HEAP_OBJECTS)
+
+    def test_fixture_facts(self):
+        """Test the fixture facts parse into the same flows as with the scalar parsers"""
+        heap_flows, data_flows, call_return_flows = ConsumeFacts(self.config).process_and_get_facts_data()
+        scalar = ConsumeFacts(self.config)
+        raw = pd.read_csv(f"{FACTS_DIR}/DependentInstructionsBetweenMethods.csv", header=None, delimiter="\t")
+        self.assertEqual(data_flows.context.tolist(), raw[0].apply(scalar._jsonify_context).tolist())
+        self.assertEqual(data_flows.prev.tolist(), raw[1].apply(scalar._jsonify_method_string).tolist())
+        self.assertEqual(len(heap_flows), 1)
+        self.assertEqual(len(call_return_flows), 11)
+
+    def test_equal_facts_share_parsed_values(self):
+        """Test repeated raw strings are parsed once and share one object and id"""
+        heap_flows, data_flows, _ = ConsumeFacts(self.config).process_and_get_facts_data()
+        self.assertIs(data_flows.context[0], data_flows.context[1])
+        self.assertEqual(data_flows.context_id[0], data_flows.context_id[1])
+        self.assertIs(heap_flows.prev[0], heap_flows.next[0])
+        self.assertEqual(heap_flows.prev_id[0], heap_flows.next_id[0])
+
+    def test_stream_facts(self):
+        """Test reading the facts a chunk at a time gives the same flows as reading them at once"""
+        whole = ConsumeFacts(self.config).process_and_get_facts_data()
+        streamed = ConsumeFacts(self.config).stream_facts_data(chunk_size=4)
+        for flows, chunks in zip(whole, streamed):
+            chunks = list(chunks)
+            self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+            streamed_flows = pd.concat(chunks)
+            id_columns = [column for column in flows.columns if column.endswith("_id")]
+            pd.testing.assert_frame_equal(flows.drop(columns=id_columns), streamed_flows.drop(columns=id_columns))
+            # Ids may be handed out in another order, but equal facts still share an id across chunks
+            for column in id_columns:
+                self.assertEqual(pd.factorize(flows[column])[0].tolist(), pd.factorize(streamed_flows[column])[0].tolist())
+
+    def test_parallel_parsing(self):
+        """Test parsing across worker processes gives the same flows, ids and tables as parsing serially"""
+        serial = ConsumeFacts(self.config)
+        serial_flows = serial.process_and_get_facts_data()
+        self.config.set_config(key="WORKERS", val=2)
+        parallel = ConsumeFacts(self.config)
+        with patch("dgi.code2graph.process_facts.MIN_STRINGS_PER_WORKER", 1):
+            parallel_flows = parallel.process_and_get_facts_data()
+        for flows, parallel_flows in zip(serial_flows, parallel_flows):
+            pd.testing.assert_frame_equal(flows, parallel_flows)
+        self.assertEqual(parallel.method_info, serial.method_info)
+        self.assertEqual(parallel.contexts, serial.contexts)
+
+    def test_facts_cache(self):
+        """Test parsed facts are reused from the cache until the facts files or the file mapping change"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.config.set_config(key="FACTS_CACHE_DIR", val=cache_dir)
+            parsed = ConsumeFacts(self.config)
+            parsed_flows = parsed.process_and_get_facts_data()
+
+            cached = ConsumeFacts(self.config)
+            with patch.object(ConsumeFacts, "_process_heap_carried_dependencies", side_effect=AssertionError):
+                cached_flows = cached.process_and_get_facts_data()
+            for flows, cached_flow in zip(parsed_flows, cached_flows):
+                pd.testing.assert_frame_equal(flows, cached_flow)
+            self.assertEqual(cached.method_info, parsed.method_info)
+            heap_flows = cached_flows[0]
+            self.assertIs(heap_flows.prev[0], heap_flows.next[0])
+
+            # Entries are Arrow and JSON files, nothing that could run code when loaded
+            entries = list(Path(cache_dir).iterdir())
+            self.assertEqual(len(entries), 1)
+            self.assertEqual({path.suffix for path in entries[0].iterdir()}, {".arrow", ".json"})
+
+            # Reading the return dependencies from another file must parse the facts again
+            self.config.set_config(key="RETURN_DEPENDENCY_FILE", val="CallDependency.csv")
+            with patch.object(ConsumeFacts, "_process_heap_carried_dependencies", side_effect=AssertionError):
+                with self.assertRaises(AssertionError):
+                    ConsumeFacts(self.config).process_and_get_facts_data()
+
+
+    def test_aggregated_facts_cache(self):
+        """Test aggregated facts are cached as such, so that a cache hit neither parses nor aggregates"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.config.set_config(key="FACTS_CACHE_DIR", val=cache_dir)
+            parsed = ConsumeFacts(self.config).process_and_get_facts_data(aggregate=True)
+            with patch.object(ConsumeFacts, "_process_heap_carried_dependencies", side_effect=AssertionError), patch(
+                "dgi.code2graph.process_facts.aggregate_flows", side_effect=AssertionError
+            ):
+                cached = ConsumeFacts(self.config).process_and_get_facts_data(aggregate=True)
+            for flows, cached_flows in zip(parsed, cached):
+                self.assertIn("weight", cached_flows.columns)
+                pd.testing.assert_frame_equal(flows, cached_flows)
+            # Unaggregated facts are kept apart
+            self.assertEqual(len(ConsumeFacts(self.config).process_and_get_facts_data()[1]), 4)
+
+
+class TestInternTable(unittest.TestCase):
+    """Test Cases for the intern table"""
+
+    def test_parse_only_new_strings(self):
+        """Test only distinct strings that are not interned yet get parsed"""
+        parsed = []
+
+        def parse(raw):
+            parsed.extend(raw)
+            return raw.str.upper()
+
+        table = InternTable()
+        values, ids = table.intern(pd.Series(["a", "b", "a"]), parse)
+        self.assertEqual(values.tolist(), ["A", "B", "A"])
+        self.assertEqual(ids.tolist(), [0, 1, 0])
+        _, ids = table.intern(pd.Series(["b", "c"]), parse)
+        self.assertEqual(ids.tolist(), [1, 2])
+        self.assertEqual(parsed, ["a", "b", "c"])
+
+    def test_bounded(self):
+        """Test the least recently used strings are forgotten"""
+        table = InternTable(max_size=2)
+        table.add("a", 1)
+        table.add("b", 2)
+        table.lookup("a")
+        table.add("c", 3)
+        self.assertEqual(len(table), 2)
+        self.assertIn("a", table)
+        self.assertNotIn("b", table)
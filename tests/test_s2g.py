@@ -19,12 +19,19 @@ Test cases for S2G CLI
 """
 from cmath import log
 import os
+import json
 import logging
+import tempfile
 from pathlib import Path
 import unittest
+from unittest.mock import patch
 from py2neo import Graph
 from click.testing import CliRunner
+from simple_ddl_parser import parse_from_file
 from dgi.cli import cli
+from dgi.schema2graph import ddl_parser, schema_loader
+from dgi.schema2graph.ddl_parser import parse_ddl, parse_ddl_file, split_statements
+from dgi.schema2graph.schema_cache import SchemaCache
 
 logging.disable(logging.CRITICAL)
 
@@ -48,6 +55,13 @@ class TestS2GCLI(unittest.TestCase):
 
     def setUp(self):
         self.runner = CliRunner()
+        # Keep the parsed schemas s2g caches by default out of the home directory of whoever runs the tests
+        cache_home = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_home.cleanup)
+        environ = patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home.name})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.cache_home = cache_home.name
 
     def test_help(self):
         """Test help command"""
@@ -90,6 +104,17 @@ class TestS2GCLI(unittest.TestCase):
         # TODO: Fix this. Does not work with logging, i.e., result.output is an empty string.
         # assert "File [tests/fixtures/test-schema.ddl] validated." in result.output
 
+    def test_cache(self):
+        """Test a second run is served from the cache, and --no-cache parses again"""
+        args = ["--validate", "s2g", "--input", "tests/fixtures/test-schema.ddl"]
+        with patch.object(ddl_parser, "parse_ddl", side_effect=ddl_parser.parse_ddl) as parse:
+            self.assertEqual(self.runner.invoke(cli, args).exit_code, 0)
+            self.assertEqual(self.runner.invoke(cli, args).exit_code, 0)
+            self.assertEqual(parse.call_count, 1)
+            self.assertEqual(len(list(Path(self.cache_home).joinpath("dgi", "s2g").iterdir())), 1)
+            self.assertEqual(self.runner.invoke(cli, args + ["--no-cache"]).exit_code, 0)
+            self.assertEqual(parse.call_count, 2)
+
     def test_output_file(self):
         """Test writing output file"""
         result = self.runner.invoke(
@@ -180,3 +205,242 @@ class TestS2GCLI(unittest.TestCase):
         cursor_foreign = TestS2GCLI.graph.run(cypher_foreign).data()
         data_foreign = [n["name"] for n in cursor_foreign]
         self.assertIn("SYMBOL", data_foreign)
+
+
+class TestSchemaLoader(unittest.TestCase):
+    """Test Cases for the batched schema loader"""
+
+    @staticmethod
+    def cypher_query(query, params):
+        """A mocked database where every column looked up or merged gets an id"""
+        if "RETURN row.table, row.name, id(c)" in query:
+            return [[row["table"], row["name"], hash((row["table"], row["name"]))] for row in params["rows"]], None
+        return [], None
+
+    def load(self, batch_size=10000):
+        """Load the fixture schema against a mocked database and return the statements run"""
+        result = parse_from_file("tests/fixtures/test-schema.ddl", group_by_type=True)
+        with patch("dgi.utils.batch_writer.db") as db, patch("dgi.schema2graph.schema_loader.install_labels"):
+            db.cypher_query.side_effect = self.cypher_query
+            schema_loader.load_graph(result, batch_size)
+        return [call.args for call in db.cypher_query.call_args_list]
+
+    def test_schema_rows(self):
+        """Test the parsed schema is flattened into table, column and foreign key rows"""
+        result = parse_from_file("tests/fixtures/test-schema.ddl", group_by_type=True)
+        tables, columns, foreign_keys = schema_loader.schema_rows(result)
+        self.assertEqual(len(tables), 6)
+        self.assertIn({"name": "QUOTEEJB", "props": {"name": "QUOTEEJB", "schema": None, "primary_key": ["SYMBOL"]}},
+                      tables)
+        self.assertEqual(len(columns), 36)
+        self.assertIn({"table": "QUOTEEJB", "name": "SYMBOL", "datatype": "VARCHAR", "is_primary": True}, columns)
+        self.assertIn({"table": "QUOTEEJB", "name": "LOW", "datatype": "DECIMAL", "is_primary": False}, columns)
+        self.assertEqual(foreign_keys, [("ORDEREJB", "QUOTE_SYMBOL", "QUOTEEJB", "SYMBOL")])
+
+    def test_batched_writes(self):
+        """Test tables, columns and foreign keys are written with one UNWIND statement per batch"""
+        statements = self.load()
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(all(query.startswith("UNWIND $rows AS row") for query, _ in statements))
+        self.assertEqual([len(params["rows"]) for _, params in statements], [6, 36, 1])
+        # The foreign key is resolved against the columns just loaded
+        self.assertEqual(
+            statements[-1][1]["rows"],
+            [{"start": hash(("ORDEREJB", "QUOTE_SYMBOL")), "end": hash(("QUOTEEJB", "SYMBOL"))}],
+        )
+
+        statements = self.load(batch_size=10)
+        self.assertEqual([len(params["rows"]) for _, params in statements], [6, 10, 10, 10, 6, 1])
+
+    def test_unresolved_foreign_keys(self):
+        """Test columns that were not just loaded are looked up once, and unresolved foreign keys reported once"""
+        foreign_keys = [("A", "X", "B", "Y"), ("A", "X", "C", "Z"), ("D", "W", "B", "Y")]
+        with patch("dgi.utils.batch_writer.db") as db, patch("dgi.schema2graph.schema_loader.Log") as logger:
+            db.cypher_query.side_effect = lambda query, params: (
+                [row for row in self.cypher_query(query, params)[0] if row[0] != "C"], None
+            )
+            schema_loader.process_foreign_keys(foreign_keys, {("A", "X"): 1})
+        (lookup, params), (_, edges) = [call.args for call in db.cypher_query.call_args_list]
+        self.assertIn("MATCH (:SQLTable", lookup)
+        self.assertCountEqual(params["rows"], [{"table": "B", "name": "Y"}, {"table": "C", "name": "Z"},
+                                               {"table": "D", "name": "W"}])
+        self.assertEqual(
+            edges["rows"],
+            [{"start": 1, "end": hash(("B", "Y"))}, {"start": hash(("D", "W")), "end": hash(("B", "Y"))}],
+        )
+        logger.warn.assert_called_once()
+        self.assertIn("A.X -> C.Z (reference column)", logger.warn.call_args.args[0])
+
+    def diff(self, graph, ddl, cypher_query=None):
+        """Diff a schema against a mocked graph, return the summary and the statements written"""
+        with patch("dgi.schema2graph.schema_loader.db") as read_db, patch("dgi.utils.batch_writer.db") as db, patch(
+            "dgi.schema2graph.schema_loader.install_labels"
+        ):
+            read_db.cypher_query.side_effect = lambda query: (
+                [rows for prefix, rows in graph.items() if query.startswith(prefix)][0], None
+            )
+            db.cypher_query.side_effect = cypher_query or self.cypher_query
+            summary = schema_loader.diff_graph(parse_ddl(ddl))
+        return summary, [call.args for call in db.cypher_query.call_args_list]
+
+    @staticmethod
+    def written(statements, fragment):
+        """The rows written by the statements containing a fragment"""
+        return [row for query, params in statements if fragment in query for row in params["rows"]]
+
+    def test_diff(self):
+        """Test only what differs from the graph is written, and what is no longer in the schema removed"""
+        graph = {
+            "MATCH (t:SQLTable) RETURN": [
+                ["A", None, ["X"]], ["B", None, []], ["OLD", None, []], ["holdingejb", None, None],
+            ],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn) RETURN": [
+                ["A", "X", 1, "INTEGER", True], ["A", "Y", 2, "INTEGER", False], ["B", "Z", 3, "INTEGER", None],
+                ["B", "GONE", 4, "INTEGER", False], ["OLD", "W", 5, "INTEGER", False],
+            ],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn)-[r:FOREIGN_KEY]": [
+                ["B", "Z", "A", "X", 100], ["B", "GONE", "A", "X", 101], ["A", "Y", "B", "Z", 102],
+            ],
+        }
+        ddl = """CREATE TABLE A (X INTEGER NOT NULL PRIMARY KEY, Y VARCHAR(10));
+CREATE TABLE B (Z INTEGER, N INTEGER, FOREIGN KEY (N) REFERENCES A(X));
+CREATE TABLE C (Q INTEGER);
+"""
+        summary, statements = self.diff(graph, ddl)
+
+        self.assertEqual(
+            summary,
+            {"tables_added": 1, "tables_changed": 0, "tables_removed": 1, "columns_added": 2, "columns_changed": 1,
+             "columns_removed": 1, "foreign_keys_added": 1, "foreign_keys_removed": 2},
+        )
+        self.assertCountEqual(self.written(statements, "MATCH ()-[r:FOREIGN_KEY]->()"), [{"id": 100}, {"id": 102}])
+        self.assertEqual(self.written(statements, "MATCH (c:SQLColumn) WHERE"), [{"id": 4}])
+        # The table tx2g created, without any columns, is not s2g's to remove
+        self.assertEqual(self.written(statements, "DETACH DELETE c, t"), [{"name": "OLD"}])
+        self.assertEqual([row["name"] for row in self.written(statements, "MERGE (t:SQLTable")], ["C"])
+        self.assertEqual(
+            [(row["table"], row["name"], row["datatype"]) for row in self.written(statements, "MERGE (t)-[:CONTAINS]")],
+            [("B", "N", "INTEGER"), ("C", "Q", "INTEGER"), ("A", "Y", "VARCHAR")],
+        )
+        self.assertEqual(self.written(statements, "MERGE (s)-[:FOREIGN_KEY]"), [{"start": hash(("B", "N")), "end": 1}])
+
+    def test_diff_reference_to_removed_column(self):
+        """Test a new foreign key to a column that was just removed is reported instead of using its stale id"""
+        graph = {
+            "MATCH (t:SQLTable) RETURN": [["B", None, []]],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn) RETURN": [
+                ["B", "Z", 3, "INTEGER", False], ["B", "GONE", 4, "INTEGER", False],
+            ],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn)-[r:FOREIGN_KEY]": [],
+        }
+        ddl = "CREATE TABLE B (Z INTEGER, FOREIGN KEY (Z) REFERENCES B(GONE));\n"
+
+        def cypher_query(query, params):
+            # The removed column is no longer in the graph
+            if query.startswith("UNWIND $rows AS row MATCH (:SQLTable"):
+                return [], None
+            return self.cypher_query(query, params)
+
+        with patch("dgi.schema2graph.schema_loader.Log") as logger:
+            summary, statements = self.diff(graph, ddl, cypher_query)
+
+        self.assertEqual((summary["columns_removed"], summary["foreign_keys_added"]), (1, 1))
+        self.assertEqual(self.written(statements, "MATCH (c:SQLColumn) WHERE"), [{"id": 4}])
+        self.assertEqual(self.written(statements, "MERGE (s)-[:FOREIGN_KEY]"), [])
+        logger.warn.assert_called_once()
+        self.assertIn("B.Z -> B.GONE (reference column)", logger.warn.call_args.args[0])
+
+    def test_diff_unchanged(self):
+        """Test diffing a schema that is already in the graph writes nothing"""
+        graph = {
+            "MATCH (t:SQLTable) RETURN": [["A", None, ["X"]], ["B", None, []]],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn) RETURN": [
+                ["A", "X", 1, "INTEGER", True], ["A", "Y", 2, "VARCHAR", False],
+                ["B", "Z", 3, "INTEGER", False], ["B", "N", 4, "INTEGER", False],
+            ],
+            "MATCH (t:SQLTable)-[:CONTAINS]->(c:SQLColumn)-[r:FOREIGN_KEY]": [["B", "N", "A", "X", 100]],
+        }
+        ddl = """CREATE TABLE A (X INTEGER NOT NULL PRIMARY KEY, Y VARCHAR(10));
+CREATE TABLE B (Z INTEGER, N INTEGER, FOREIGN KEY (N) REFERENCES A(X));
+"""
+        summary, statements = self.diff(graph, ddl)
+
+        self.assertEqual(set(summary.values()), {0})
+        self.assertEqual(statements, [])
+
+
+class TestDDLParser(unittest.TestCase):
+    """Test Cases for the statement level DDL parser"""
+
+    DDL = """-- Accounts;
+CREATE TABLE A (X INTEGER NOT NULL PRIMARY KEY, /* not the end; */
+  Y VARCHAR(10));
+CREATE TABLE B (Z INTEGER);
+SET SCHEMA = S;
+CREATE INDEX I ON B(Z);
+ALTER TABLE B ADD CONSTRAINT FK FOREIGN KEY (Z) REFERENCES A (X);
+"""
+
+    def test_split_statements(self):
+        """Test statements end at the semicolons that end a line outside comments and SET statements"""
+        statements = split_statements(self.DDL)
+        self.assertEqual(len(statements), 4)
+        self.assertTrue(statements[0].endswith("Y VARCHAR(10));"))
+        self.assertTrue(statements[2].endswith("CREATE INDEX I ON B(Z);"))
+        self.assertEqual("\n".join(statements), self.DDL.rstrip())
+
+    def test_same_as_serial(self):
+        """Test parsing runs of statements in worker processes gives what parsing the whole script does"""
+        with patch("dgi.schema2graph.ddl_parser.MIN_STATEMENTS_PER_TASK", 1):
+            self.assertEqual(parse_ddl(self.DDL, workers=2), parse_ddl(self.DDL))
+            self.assertEqual(
+                parse_ddl_file("tests/fixtures/test-schema.ddl", workers=3),
+                parse_from_file("tests/fixtures/test-schema.ddl", group_by_type=True),
+            )
+            result = parse_ddl(self.DDL, workers=2)
+        # The ALTER statement parsed by another worker is still attached to its table
+        table_b = [table for table in result["tables"] if table["table_name"] == "B"][0]
+        self.assertEqual(table_b["alter"]["columns"][0]["references"]["table"], "A")
+        self.assertEqual(table_b["index"][0]["index_name"], "I")
+
+    def test_fixture_same_as_parse_from_file(self):
+        """Test the fixture schema parsed by several worker processes equals simple_ddl_parser's own parse"""
+        with open("tests/fixtures/test-schema.ddl", "r", encoding="utf-8") as file_obj:
+            statements = split_statements(file_obj.read())
+        with patch("dgi.schema2graph.ddl_parser.MIN_STATEMENTS_PER_TASK", 5):
+            # The statements are spread over more than one task
+            self.assertGreater(len(statements), 5)
+            parsed = parse_ddl_file("tests/fixtures/test-schema.ddl", workers=2)
+        self.assertEqual(parsed, parse_from_file("tests/fixtures/test-schema.ddl", group_by_type=True))
+
+
+class TestSchemaCache(unittest.TestCase):
+    """Test Cases for the parsed schema cache"""
+
+    def test_reused_while_unchanged(self):
+        """Test a DDL is parsed again only when it or the parser version changes"""
+        with tempfile.TemporaryDirectory() as tmp_dir, patch.object(
+            ddl_parser, "parse_ddl", side_effect=ddl_parser.parse_ddl
+        ) as parse:
+            cache = SchemaCache(os.path.join(tmp_dir, "cache"))
+            ddl_file = os.path.join(tmp_dir, "schema.ddl")
+            with open("tests/fixtures/test-schema.ddl", "r", encoding="utf-8") as source, open(
+                ddl_file, "w", encoding="utf-8"
+            ) as target:
+                target.write(source.read())
+
+            parsed = parse_ddl_file(ddl_file, cache=cache)
+            cached = parse_ddl_file(ddl_file, cache=cache)
+            self.assertEqual(parse.call_count, 1)
+            self.assertEqual(cached["tables"], json.loads(json.dumps(parsed["tables"])))
+
+            with patch("dgi.schema2graph.schema_cache.parser_version", return_value="0.0.0"):
+                parse_ddl_file(ddl_file, cache=cache)
+            self.assertEqual(parse.call_count, 2)
+
+            with open(ddl_file, "a", encoding="utf-8") as target:
+                target.write("CREATE TABLE EXTRAEJB (X INTEGER);\n")
+            self.assertEqual(len(parse_ddl_file(ddl_file, cache=cache)["tables"]), 7)
+            parse_ddl_file(ddl_file)
+            self.assertEqual(parse.call_count, 4)
+            self.assertEqual(len(os.listdir(cache.cache_dir)), 3)
@@ -17,12 +17,31 @@
 """
 Test cases for TX2G CLI
 """
+import io
 import os
+import json
 import logging
+import tempfile
+from collections import OrderedDict
 import unittest
 from unittest.mock import patch
 from click.testing import CliRunner
 from dgi.cli import cli
+from dgi.tx2graph import ClassTransactionLoader, FullTransactionLoader, MethodTransactionLoader
+from dgi.tx2graph.abstract_transaction_loader import AbstractTransactionLoader
+from dgi.tx2graph.utils import (
+    ParseBudget,
+    ParseBudgetExceeded,
+    RWSetCache,
+    SlowQueryLog,
+    iter_json_array,
+    scan_rwset,
+    simple_rwset,
+    sqlexp,
+)
+from dgi.tx2graph.utils.peg import choice, current_input, match, name_rules, parse, pegop, profiling, seq, val
+from dgi.tx2graph.utils.rwset_cache import cache_version
+from dgi.tx2graph.utils.sqlparse import Tokens
 from py2neo import Graph
 import logging
 
@@ -145,3 +164,409 @@ class TestTX2GCLI(unittest.TestCase):
             result.output,
         )
         self.assertEqual(result.exit_code, 2)
+
+    def test_force_clear_every_abstraction(self):
+        """Test --force-clear is passed on to the loader of every abstraction level"""
+        for abstraction, loader in (
+            ("full", FullTransactionLoader),
+            ("class", ClassTransactionLoader),
+            ("method", MethodTransactionLoader),
+        ):
+            with patch.object(loader, "load_transactions") as load_transactions:
+                result = self.runner.invoke(
+                    cli,
+                    ["tx2g", f"--abstraction={abstraction}", "--force-clear",
+                     "--input=tests/fixtures/daytrader_transaction.json"],
+                )
+            self.assertEqual(result.exit_code, 0)
+            self.assertTrue(load_transactions.call_args.kwargs["force_clear"])
+
+
+class TestTransactionLoaders(unittest.TestCase):
+    """Test Cases for the batched transaction loaders"""
+
+    @staticmethod
+    def load(*loaders):
+        """Run the loaders against a mocked database and return the rows written, by statement"""
+        written = {}
+        with patch("dgi.utils.batch_writer.db") as db, patch("dgi.tx2graph.abstract_transaction_loader.install_labels"):
+            db.cypher_query.return_value = ([], None)
+            for loader in loaders:
+                loader.load_transactions("tests/fixtures/daytrader_transaction.json", clear=False)
+        for call in db.cypher_query.call_args_list:
+            query, params = call.args
+            for row in params["rows"]:
+                # Node ids are random
+                row["props"].pop("node_id", None)
+                written.setdefault(query, []).append(json.dumps(row, sort_keys=True))
+        return written
+
+    def test_full_loader_analyzes_once(self):
+        """Test the full loader analyzes every entry once and writes what the class and method loaders write"""
+        with patch.object(
+            AbstractTransactionLoader, "analyze", autospec=True, side_effect=AbstractTransactionLoader.analyze
+        ) as analyze:
+            full = self.load(FullTransactionLoader())
+        self.assertEqual(analyze.call_count, 2080)
+
+        separate = self.load(ClassTransactionLoader(), MethodTransactionLoader())
+        self.assertEqual(full.keys(), separate.keys())
+        for query, rows in full.items():
+            self.assertCountEqual(rows, separate[query])
+
+    def test_parallel_analysis(self):
+        """Test analyzing the entries across worker processes writes what analyzing them in this process does"""
+        with patch("dgi.tx2graph.abstract_transaction_loader.ENTRIES_PER_TASK", 100):
+            loader = FullTransactionLoader(workers=2)
+            parallel = self.load(loader)
+        serial = self.load(FullTransactionLoader())
+        self.assertEqual(parallel.keys(), serial.keys())
+        for query, rows in parallel.items():
+            self.assertCountEqual(rows, serial[query])
+        # The statements the workers parsed made it back to the cache of this process
+        rwset_cache = loader.loaders[0].rwset_cache
+        self.assertEqual(len(rwset_cache), 49)
+        self.assertEqual(rwset_cache.hits + rwset_cache.misses, 569)
+
+    def test_edges_are_written_in_batches(self):
+        """Test nodes and edges are queued, deduplicated and written with a few UNWIND statements"""
+        with patch("dgi.utils.batch_writer.db") as db, patch("dgi.tx2graph.abstract_transaction_loader.install_labels"):
+            db.cypher_query.return_value = ([], None)
+            MethodTransactionLoader(batch_size=1000).load_transactions(
+                "tests/fixtures/daytrader_transaction.json", clear=False
+            )
+
+        statements = [call.args for call in db.cypher_query.call_args_list]
+        self.assertTrue(all(query.startswith("UNWIND $rows AS row") for query, _ in statements))
+        edges = {}
+        for query, params in statements:
+            for row in params["rows"]:
+                if "start" in row:
+                    edges.setdefault(query, set()).add((row["start"], row["end"]))
+        self.assertEqual(
+            {query.split("[r:")[1].split("]")[0] for query in edges},
+            {"TRANSACTION_READ", "TRANSACTION_WRITE", "TRANSACTIONAL_TRACE"},
+        )
+        # Every edge is sent once, in one statement per type
+        self.assertEqual(len(statements), 5)
+        self.assertEqual(
+            sum(len(params["rows"]) for query, params in statements if query in edges),
+            sum(len(pairs) for pairs in edges.values()),
+        )
+
+
+class TestRWSetCache(unittest.TestCase):
+    """Test Cases for the SQL read/write set cache"""
+
+    def test_same_as_uncached(self):
+        """Test the cached read and write sets equal those of parsing every statement"""
+        loader = MethodTransactionLoader(rwset_cache=RWSetCache(max_size=10))
+        with open("tests/fixtures/daytrader_transaction.json", "r", encoding="utf-8") as file_obj:
+            statements = [
+                operand["sql"]
+                for entry in json.load(file_obj)
+                for txn in entry["transactions"]
+                for operand in txn["transaction"]
+                if operand["sql"] not in ("BEGIN", "COMMIT", "ROLLBACK")
+            ]
+        for sql in statements:
+            resp = sqlexp(sql.lower())
+            expected = loader.crud0(resp[1]) if resp else [set(), set()]
+            self.assertEqual(loader.crud(sql), expected)
+        self.assertEqual(loader.rwset_cache.hits + loader.rwset_cache.misses, len(statements))
+        self.assertGreater(loader.rwset_cache.hits, loader.rwset_cache.misses)
+        self.assertEqual(len(loader.rwset_cache), 10)
+
+    def test_normalized_keys(self):
+        """Test statements differing only in case and whitespace share an entry, and cached sets can't be changed"""
+        cache = RWSetCache()
+        loader = ClassTransactionLoader(rwset_cache=cache)
+        read, write = loader.crud("SELECT *\n  FROM orderejb WHERE orderid = ?")
+        self.assertEqual((read, write), ({"orderejb"}, set()))
+        read.add("accountejb")
+        self.assertEqual(loader.crud("select * from OrderEJB where orderid = ?"), [{"orderejb"}, set()])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIn("Select * FROM orderejb where orderid = ?", cache)
+
+    def test_saved_between_runs(self):
+        """Test a saved cache is loaded back, and loading a missing file leaves the cache empty"""
+        cache = RWSetCache()
+        cache.put("update orderejb set x = ?", [{"orderejb"}, {"orderejb"}])
+        cache.put("select 1", [set(), set()])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache", "rwsets.json")
+            loaded = RWSetCache()
+            loaded.load(path)
+            self.assertEqual(len(loaded), 0)
+            cache.save(path)
+            loaded.load(path)
+        self.assertEqual(loaded.get("update orderejb set x = ?"), [{"orderejb"}, {"orderejb"}])
+        self.assertEqual(loaded.get("select 1"), [set(), set()])
+
+    def test_saved_by_another_version(self):
+        """Test files saved by another version, in the old format or unreadable are ignored"""
+        cache = RWSetCache()
+        cache.put("select 1", [set(), set()])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "rwsets.json")
+            cache.save(path)
+            with open(path, "r", encoding="utf-8") as file_obj:
+                saved = json.load(file_obj)
+            self.assertEqual(saved["version"], cache_version())
+            for contents in ({**saved, "version": "0 0.0.0"}, saved["rwsets"], "{"):
+                with open(path, "w", encoding="utf-8") as file_obj:
+                    file_obj.write(contents if isinstance(contents, str) else json.dumps(contents))
+                loaded = RWSetCache()
+                loaded.load(path)
+                self.assertEqual(len(loaded), 0)
+
+    def test_raw_and_normalized_statements(self):
+        """Test get, put and membership all normalize the statement"""
+        cache = RWSetCache()
+        cache.put("SELECT *\n FROM OrderEJB", [{"orderejb"}, set()])
+        self.assertIn("select * from orderejb", cache)
+        self.assertEqual(cache.get("select * from orderejb"), [{"orderejb"}, set()])
+        self.assertEqual(cache.get("Select *  FROM orderejb"), [{"orderejb"}, set()])
+        cache.put("select * from orderejb", [{"orderejb"}, {"orderejb"}])
+        self.assertEqual(len(cache), 1)
+
+
+class TestPeg(unittest.TestCase):
+    """Test Cases for the PEG combinators"""
+
+    @staticmethod
+    def counted_word(calls):
+        """A rule matching a letter that records the position it is evaluated at"""
+
+        @pegop
+        def word(i):
+            s = current_input()
+            calls.append(i)
+            return (i + 1, [s[i]]) if i < len(s) and s[i].isalpha() else ()
+
+        return word()
+
+    def test_packrat_memoization(self):
+        """Test a rule is evaluated once per position within a parse, and again in the next parse"""
+        calls = []
+        rule = self.counted_word(calls)
+        grammar = choice(seq(rule, rule, val("!")), seq(rule, rule, val("?")), seq(rule, val("?")))
+        self.assertEqual(grammar("ab?"), ("", ["a", "b"]))
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(grammar("ab?"), ("", ["a", "b"]))
+        self.assertEqual(calls, [0, 1, 0, 1])
+
+    def test_nested_parse(self):
+        """Test parsing another text from within a rule keeps the memo tables of the outer parse"""
+        calls = []
+        rule = self.counted_word(calls)
+        nested = match(rule, lambda s, v: s + [parse(rule, "xyz")])
+        grammar = choice(seq(nested, val("!")), seq(rule, val("?")))
+        self.assertEqual(grammar("a?"), ("", ["a"]))
+        self.assertEqual(calls, [0, 0])
+
+    def test_budget(self):
+        """Test a parse stops once it evaluates more rules than its budget allows, nested parses included"""
+        calls = []
+        rule = self.counted_word(calls)
+        grammar = seq(rule, rule, rule, val("!"))
+        # seq, three words and val
+        self.assertEqual(parse(grammar, "abc!", ParseBudget(steps=5)), ("", ["a", "b", "c"]))
+        with self.assertRaises(ParseBudgetExceeded):
+            parse(grammar, "abc!", ParseBudget(steps=4))
+        nested = match(rule, lambda s, v: s + [parse(grammar, "xyz!")])
+        with self.assertRaises(ParseBudgetExceeded):
+            parse(seq(nested, val("?")), "a?", ParseBudget(steps=5))
+        self.assertEqual(parse(grammar, "abc!", ParseBudget(seconds=60)), ("", ["a", "b", "c"]))
+
+    def test_profiling(self):
+        """Test calls, memo hits and time are counted per rule name while profiling, and only then"""
+        calls = []
+        word = self.counted_word(calls)
+        grammar = choice(seq(word, val("!")), seq(word, val("?")))
+        name_rules({"word": word, "grammar": grammar})
+        with profiling() as stats:
+            self.assertEqual(grammar("a?"), ("", ["a"]))
+        self.assertEqual({rule_name: stats[rule_name][:2] for rule_name in stats},
+                         {"grammar": [1, 0], "seq": [2, 0], "word": [2, 1], "val": [2, 0]})
+        self.assertGreaterEqual(stats["grammar"][2], stats["word"][2])
+        grammar("a?")
+        self.assertEqual(stats["grammar"][0], 1)
+
+
+class TestSqlParse(unittest.TestCase):
+    """Test Cases for the SQL parser"""
+
+    def test_tokens(self):
+        """Test statements are tokenized once, with reserved words used as names quoted"""
+        tokens = Tokens("select t.from, x  from  t where a <> 'b c' and t.n(+) = 1.5")
+        self.assertEqual(
+            tokens.values,
+            ["select", "t", ".", '"from"', ",", "x", "from", "t", "where", "a", "<>", "'b c'", "and", "t", ".", "n",
+             "(+)", "=", "1.5", None],
+        )
+        self.assertEqual(tokens[5:8], " x  from  t")
+        self.assertEqual(tokens[17:], " = 1.5")
+
+    def test_ast(self):
+        """Test the AST of a statement"""
+        self.assertEqual(
+            sqlexp("select a.x, b.y as z from a, (select y from c) b where a.i = b.i for update"),
+            (
+                "",
+                [
+                    "select",
+                    {"x": ("a.x",)},
+                    {"z": ("b.y",)},
+                    {":from": ["a", {"b": ["select", {"y": ("y",)}, {":from": ["c"]}]}]},
+                    ("a.i",),
+                    ("b.i",),
+                ],
+            ),
+        )
+
+
+class TestSimpleSql(unittest.TestCase):
+    """Test Cases for the single table statement fast path"""
+
+    @staticmethod
+    def fixture_statements():
+        """The distinct normalized statements of the DiVA fixtures"""
+        statements = set()
+        for file_name in ("tests/fixtures/daytrader_transaction.json", "tests/fixtures/trading_app_transactions.json"):
+            with open(file_name, "r", encoding="utf-8") as file_obj:
+                for entry in json.load(file_obj):
+                    for txn in entry["transactions"]:
+                        statements.update(
+                            RWSetCache.normalize(operand["sql"])
+                            for operand in txn["transaction"]
+                            if operand["sql"] not in ("BEGIN", "COMMIT", "ROLLBACK")
+                        )
+        return sorted(statements)
+
+    def test_same_as_grammar(self):
+        """Test the fast path finds the tables the full grammar finds, for all fixture statements it takes"""
+        loader = MethodTransactionLoader()
+        statements = self.fixture_statements()
+        simple = 0
+        for sql in statements:
+            rwset = simple_rwset(sql)
+            if rwset is not None:
+                simple += 1
+                resp = sqlexp(sql)
+                self.assertEqual(rwset, loader.crud0(resp[1]) if resp else [set(), set()], sql)
+        self.assertEqual((simple, len(statements)), (51, 65))
+
+    def test_shapes(self):
+        """Test which statements take the fast path"""
+        self.assertEqual(simple_rwset("select a, count(*) from s.t x where a in (1, 2) for update"), [{"s.t"}, set()])
+        self.assertEqual(simple_rwset("insert into t(a, b) values (?, 'x')"), [set(), {"t"}])
+        self.assertEqual(simple_rwset("update t as u set a = ?, b = b + 1 where c = ?"), [set(), {"t"}])
+        self.assertEqual(simple_rwset("delete t where c = ?;"), [set(), {"t"}])
+        for sql in (
+            "select * from t, u",
+            "select * from t join u on t.a = u.a",
+            "select * from t where a in (select a from u)",
+            "select * from t union select * from u",
+            "with v as (select * from t) select * from v",
+            "insert into t select * from u",
+            "delete from order where a = ?",
+            "select * from t where",
+        ):
+            self.assertIsNone(simple_rwset(sql), sql)
+
+    def test_scan(self):
+        """Test the tables found by the fallback scan of statements that go over the parse budget"""
+        self.assertEqual(
+            scan_rwset("select * from a x, b as y left outer join c on x.i = c.i where x.j in (select j from s.d)"),
+            [{"a", "b", "c", "s.d"}, set()],
+        )
+        self.assertEqual(scan_rwset("delete from t where a in (select b from u join v on u.i = v.i)"), [{"u", "v"}, {"t"}])
+        self.assertEqual(scan_rwset("update t set a = (select max(b) from u)"), [{"u"}, {"t"}])
+        self.assertEqual(scan_rwset("insert into t select * from u, w"), [{"u", "w"}, {"t"}])
+        self.assertEqual(scan_rwset("values (1)"), [set(), set()])
+
+
+class TestSlowQueries(unittest.TestCase):
+    """Test Cases for the parse budget and the slow query report"""
+
+    def test_fallback(self):
+        """Test statements over the parse budget are scanned instead, and reported"""
+        slow_queries = SlowQueryLog()
+        loader = MethodTransactionLoader(parse_budget=ParseBudget(steps=10), slow_queries=slow_queries)
+        sql = "select * from a, b where a.i = b.i and b.j in (select j from c)"
+        self.assertEqual(loader.crud(sql), [{"a", "b", "c"}, set()])
+        # Single table statements don't go through the grammar
+        self.assertEqual(loader.crud("select * from a where i = ?"), [{"a"}, set()])
+        self.assertEqual(list(slow_queries.over_budget), [sql])
+        self.assertEqual(slow_queries.parsed, 1)
+
+        loader = MethodTransactionLoader(slow_queries=slow_queries)
+        loader.crud("select * from a, b")
+        self.assertEqual((slow_queries.parsed, len(slow_queries.over_budget)), (2, 1))
+
+    def test_fallback_not_saved(self):
+        """Test scanned read and write sets are reused within a run but not saved, also when a worker scanned them"""
+        cache = RWSetCache()
+        loader = MethodTransactionLoader(rwset_cache=cache, parse_budget=ParseBudget(steps=10))
+        scanned, parsed = "select * from a, b where a.i = b.i and b.j in (select j from c)", "select * from a, b"
+        loader.crud(scanned)
+        worker_cache = RWSetCache()
+        worker_cache.added = {}
+        MethodTransactionLoader(rwset_cache=worker_cache, parse_budget=ParseBudget(steps=10)).crud(scanned + " or 1")
+        MethodTransactionLoader(rwset_cache=worker_cache).crud(parsed)
+        loader._merge_worker_results([], worker_cache.added, 0, 0, SlowQueryLog())
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(loader.crud(scanned), [{"a", "b", "c"}, set()])
+        self.assertEqual(cache.hits, 1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "rwsets.json")
+            cache.save(path)
+            loaded = RWSetCache()
+            loaded.load(path)
+        self.assertEqual(len(loaded), 1)
+        self.assertIn(parsed, loaded)
+
+    def test_report(self):
+        """Test only the slowest statements are kept, across merged logs, and saved slowest first"""
+        slow_queries, other = SlowQueryLog(max_slowest=2), SlowQueryLog()
+        slow_queries.record("a", 1.0)
+        slow_queries.record("b", 3.0, over_budget=True)
+        other.record("c", 2.0)
+        other.record("d", 0.5)
+        slow_queries.merge(other)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "slow.json")
+            slow_queries.save(path)
+            with open(path, "r", encoding="utf-8") as file_obj:
+                report = json.load(file_obj)
+        self.assertEqual(report["parsed"], 4)
+        self.assertEqual(report["seconds"], 6.5)
+        self.assertEqual(report["slowest"], [{"sql": "b", "seconds": 3.0}, {"sql": "c", "seconds": 2.0}])
+        self.assertEqual(report["over_budget"], [{"sql": "b", "seconds": 3.0}])
+
+
+class TestJsonStream(unittest.TestCase):
+    """Test Cases for reading DiVA captures one entry at a time"""
+
+    def test_same_as_json_load(self):
+        """Test the streamed entries equal the loaded ones, however little is read at a time"""
+        file_name = "tests/fixtures/trading_app_transactions.json"
+        with open(file_name, "r", encoding="utf-8") as file_obj:
+            expected = json.load(file_obj, object_pairs_hook=OrderedDict)
+        for read_size in (1, 7, 4096):
+            with open(file_name, "r", encoding="utf-8") as file_obj:
+                self.assertEqual(list(iter_json_array(file_obj, OrderedDict, read_size)), expected)
+
+    def test_values_split_across_reads(self):
+        """Test numbers, literals and strings cut off by a read are decoded whole"""
+        text = ' [ 12345, 2.5e3 ,"a, ]", [1, [2]], {"x": "}"}, true, null ] '
+        for read_size in (1, 2, 3):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), read_size=read_size)), json.loads(text))
+        self.assertEqual(list(iter_json_array(io.StringIO("[]"))), [])
+
+    def test_malformed(self):
+        """Test malformed arrays raise a decode error"""
+        for text in ("", "{}", "[1 2]", "[1,", "[2.x]"):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json_array(io.StringIO(text), read_size=2))